@@ -7,4 +7,5 @@ opentelemetry-instrument uvicorn iaEditais.app:app \
   --port 8000 \
   --workers 4 \
   --proxy-headers \
+  --ws-per-message-deflate true \
   --forwarded-allow-ips="127.0.0.1,10.0.0.1"
@@ -23,6 +23,7 @@ from iaEditais.routers.check_tree import (
 )
 from iaEditais.routers.docs import docs, kanban, messages, releases
 from iaEditais.routers.docs import ws as docs_ws
+from iaEditais.services import anonymization_service
 
 PROJECT_FILE = Path(__file__).parent.parent / 'pyproject.toml'
 
@@ -57,6 +58,8 @@ async def lifespan(app: FastAPI):
     app.state.redis = redis_instance
     app.state.socket_manager = socket_manager
     yield
+    await socket_manager.close()
+    anonymization_service.shutdown()
 
 
 app = FastAPI(
@@ -1,8 +1,40 @@
 import asyncio
+import contextlib
+import logging
+from typing import Optional
+from uuid import UUID
 
 import redis.asyncio as aioredis
 from fastapi import Request, WebSocket
 from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from iaEditais.core.settings import Settings
+from iaEditais.core.ws_events import JSON, WSEvent, drop_superseded, encode
+from iaEditais.core.ws_replay import parse_event_id, read_since
+
+SETTINGS = Settings()
+
+logger = logging.getLogger(__name__)
+
+# Código de fechamento para clientes que não acompanham o ritmo das
+# mensagens (RFC 6455: "Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+READER_RETRY_DELAY = 1
+
+# Tópicos que o cliente assina pelo socket, no formato '<tipo>:<uuid>'
+TOPIC_KINDS = ('doc', 'unit', 'user')
+
+
+def topic_channel(kind: str, topic_id: UUID) -> str:
+    return f'ws:{kind}:{topic_id}'
+
+
+def parse_topic(topic: str) -> tuple[str, UUID]:
+    kind, _, topic_id = topic.partition(':')
+    if kind not in TOPIC_KINDS:
+        raise ValueError(f'Unknown topic: {topic}')
+    return kind, UUID(topic_id)
 
 
 class PubSubManager:
@@ -11,34 +43,204 @@ class PubSubManager:
         self.pubsub = None
 
     async def connect(self) -> None:
-        self.pubsub = self.redis_connection.pubsub()
+        # Uma única conexão de pub/sub por processo
+        if self.pubsub is None:
+            self.pubsub = self.redis_connection.pubsub()
 
     async def _publish(self, channel_id: str, message: str) -> None:
         await self.redis_connection.publish(channel_id, message)
 
     async def subscribe(self, channel_id: str):
+        await self.connect()
         await self.pubsub.subscribe(channel_id)
         return self.pubsub
 
     async def unsubscribe(self, channel_id: str) -> None:
         await self.pubsub.unsubscribe(channel_id)
 
+    async def close(self) -> None:
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+            self.pubsub = None
+
+
+class SocketConnection:
+    """
+    Fila de envio de um socket.
+
+    O leitor do pub/sub só enfileira (sem esperar o cliente); uma task por
+    socket faz os envios, então um cliente lento não atrasa os demais. A
+    cada envio a task esvazia a fila e descarta eventos de estado já
+    substituídos por outro mais novo. Com `batch_window`, espera esse
+    intervalo e manda tudo o que acumulou num só quadro (lista de
+    eventos); em msgpack os quadros são binários.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int,
+        batch_window: float = 0,
+        encoding: str = JSON,
+    ):
+        self.websocket = websocket
+        self.queue: asyncio.Queue[WSEvent] = asyncio.Queue(max_queue)
+        self.batch_window = batch_window
+        self.encoding = encoding
+        self.task = asyncio.create_task(self._sender())
+
+    async def _next_events(self) -> list[WSEvent]:
+        events = [await self.queue.get()]
+        if self.batch_window:
+            await asyncio.sleep(self.batch_window)
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return drop_superseded(events)
+
+    async def _send(self, frame: str | bytes) -> None:
+        if isinstance(frame, bytes):
+            await self.websocket.send_bytes(frame)
+        else:
+            await self.websocket.send_text(frame)
+
+    async def _sender(self) -> None:
+        while True:
+            events = await self._next_events()
+            if self.batch_window:
+                frames = [encode(events, self.encoding, batch=True)]
+            else:
+                frames = [
+                    encode([event], self.encoding, batch=False)
+                    for event in events
+                ]
+            try:
+                for frame in frames:
+                    await self._send(frame)
+            except Exception as e:
+                # Cliente desconectado: o endpoint remove o socket ao
+                # receber a desconexão
+                logger.debug('Websocket send failed: %s', e)
+                return
+
+    def push(self, event: WSEvent) -> bool:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def close(self, code: Optional[int] = None) -> None:
+        self.task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self.task
+        if code is not None:
+            with contextlib.suppress(Exception):
+                await self.websocket.close(code=code)
+
 
 class WebSocketManager:
-    def __init__(self, client: aioredis.Redis):
-        self.channels: dict = {}
+    """
+    Distribui as mensagens do Redis para os sockets do processo.
+
+    Há um único leitor de pub/sub por processo, bloqueado na leitura
+    enquanto não chegam mensagens. Cada mensagem é enfileirada na fila
+    limitada de cada socket do canal; o socket cuja fila enche é
+    desconectado em vez de segurar os outros.
+    """
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        max_queue: int = SETTINGS.WS_SEND_QUEUE_SIZE,
+    ):
+        self.channels: dict[str, set[WebSocket]] = {}
+        self.connections: dict[WebSocket, SocketConnection] = {}
+        self.max_queue = max_queue
         self.pubsub_client = PubSubManager(client)
+        self._reader: Optional[asyncio.Task] = None
+        # Eventos ao vivo retidos enquanto o socket recebe o replay do canal
+        self._replaying: dict[tuple[str, WebSocket], list[WSEvent]] = {}
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        batch_window: float = 0,
+        subprotocol: Optional[str] = None,
+    ) -> None:
+        # A codificação é o subprotocolo negociado ('json' ou 'msgpack');
+        # sem subprotocolo, JSON
+        await websocket.accept(subprotocol=subprotocol)
+        self.connections[websocket] = SocketConnection(
+            websocket, self.max_queue, batch_window, subprotocol or JSON
+        )
 
     async def add_user_to_channel(self, channel_id: str, websocket: WebSocket):
-        await websocket.accept()
+        if websocket not in self.connections:
+            await self.connect(websocket)
+
         if channel_id in self.channels:
-            self.channels[channel_id].append(websocket)
-        else:
-            self.channels[channel_id] = [websocket]
+            self.channels[channel_id].add(websocket)
+            return
+
+        self.channels[channel_id] = {websocket}
+        pubsub_subscriber = await self.pubsub_client.subscribe(channel_id)
+        if self._reader is None:
+            self._reader = asyncio.create_task(
+                self._pubsub_data_reader(pubsub_subscriber)
+            )
 
-            await self.pubsub_client.connect()
-            pubsub_subscriber = await self.pubsub_client.subscribe(channel_id)
-            asyncio.create_task(self._pubsub_data_reader(pubsub_subscriber))
+    async def resume_channel(
+        self, channel_id: str, websocket: WebSocket, last_event_id: str
+    ) -> tuple[int, bool]:
+        """
+        Assina o canal e envia antes os eventos posteriores ao id.
+
+        Eventos ao vivo que chegam durante a leitura do stream ficam
+        retidos e são enviados depois do replay, sem repetir os que o
+        replay já trouxe. Retorna quantos eventos foram reenviados e se a
+        sequência está completa.
+        """
+        key = (channel_id, websocket)
+        self._replaying[key] = []
+        try:
+            await self.add_user_to_channel(channel_id, websocket)
+            replayed, complete = await read_since(
+                self.pubsub_client.redis_connection, channel_id, last_event_id
+            )
+        finally:
+            held = self._replaying.pop(key)
+
+        events = [WSEvent(data) for data in replayed]
+        last_id = parse_event_id(
+            events[-1].message['id'] if events else last_event_id
+        )
+        events += [
+            event
+            for event in held
+            if not event.event_id or parse_event_id(event.event_id) > last_id
+        ]
+        for event in events:
+            self.send_event(websocket, event)
+        return len(replayed), complete
+
+    def send_event(self, websocket: WebSocket, event: WSEvent) -> None:
+        connection = self.connections.get(websocket)
+        if connection:
+            connection.push(event)
+
+    def send(self, websocket: WebSocket, message: str) -> None:
+        # Resposta direta ao socket, sem passar pelo Redis
+        self.send_event(websocket, WSEvent(message))
+
+    async def disconnect(self, websocket: WebSocket) -> None:
+        # Fim do socket: sai de todos os canais e encerra a fila de envio
+        for channel_id in [
+            c for c, sockets in self.channels.items() if websocket in sockets
+        ]:
+            await self.remove_user_from_channel(channel_id, websocket)
+        connection = self.connections.pop(websocket, None)
+        if connection:
+            await connection.close()
 
     async def broadcast_to_channel(self, channel_id: str, message: str):
         await self.pubsub_client._publish(channel_id, message)
@@ -46,22 +248,64 @@ class WebSocketManager:
     async def remove_user_from_channel(
         self, channel_id: str, websocket: WebSocket
     ):
-        self.channels[channel_id].remove(websocket)
-        if len(self.channels[channel_id]) == 0:
+        sockets = self.channels.get(channel_id)
+        if sockets is None or websocket not in sockets:
+            return
+        sockets.discard(websocket)
+        if not sockets:
             del self.channels[channel_id]
             await self.pubsub_client.unsubscribe(channel_id)
 
+    async def _drop(self, websocket: WebSocket) -> None:
+        logger.warning('Dropping slow websocket consumer')
+        connection = self.connections.pop(websocket, None)
+        await self.disconnect(websocket)
+        if connection:
+            await connection.close(code=SLOW_CONSUMER_CLOSE_CODE)
+
+    async def dispatch(self, channel_id: str, data: str) -> None:
+        event = WSEvent(data)
+        slow = []
+        for websocket in self.channels.get(channel_id, ()):
+            held = self._replaying.get((channel_id, websocket))
+            if held is not None:
+                held.append(event)
+            elif not self.connections[websocket].push(event):
+                slow.append(websocket)
+        for websocket in slow:
+            await self._drop(websocket)
+
     async def _pubsub_data_reader(self, pubsub_subscriber):
         while True:
-            message = await pubsub_subscriber.get_message(
-                ignore_subscribe_messages=True
+            try:
+                message = await pubsub_subscriber.get_message(
+                    ignore_subscribe_messages=True, timeout=None
+                )
+            except RedisError as e:
+                logger.warning('Websocket pub/sub reader failed: %s', e)
+                await asyncio.sleep(READER_RETRY_DELAY)
+                continue
+            if message is None:
+                continue
+            await self.dispatch(
+                message['channel'].decode('utf-8'),
+                message['data'].decode('utf-8'),
             )
-            if message is not None:
-                channel_id = message['channel'].decode('utf-8')
-                all_sockets = self.channels[channel_id]
-                for socket in all_sockets:
-                    data = message['data'].decode('utf-8')
-                    await socket.send_text(data)
+            # Cede a vez às tasks de envio antes da próxima mensagem de uma
+            # rajada, para que as filas não encham só por falta de turno
+            await asyncio.sleep(0)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._reader
+            self._reader = None
+        for connection in self.connections.values():
+            await connection.close()
+        self.connections.clear()
+        self.channels.clear()
+        await self.pubsub_client.close()
 
 
 def get_socket_manager(websocket: WebSocket) -> WebSocketManager:
@@ -7,6 +7,7 @@ from langchain_core.vectorstores import VectorStore
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from iaEditais.core.database import get_session
+from iaEditais.core.job_queue import JobQueue, get_job_queue
 from iaEditais.core.llm import get_model
 from iaEditais.core.security import get_current_user
 from iaEditais.core.storage_provider import (
@@ -22,3 +23,4 @@ OAuth2Form = Annotated[OAuth2PasswordRequestForm, Depends()]
 VStore = Annotated[VectorStore, Depends(get_vectorstore)]
 Model = Annotated[BaseChatModel, Depends(get_model)]
 Storage = Annotated[StorageProvider, Depends(get_storage_provider)]
+Queue = Annotated[JobQueue, Depends(get_job_queue)]
@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import re
+from array import array
+
+import redis.asyncio as aioredis
+from langchain_core.embeddings import Embeddings
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = 'embedding_cache:stats'
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+
+def _encode(vector: list[float]) -> bytes:
+    return array('d', vector).tobytes()
+
+
+def _decode(raw: bytes) -> list[float]:
+    return array('d', raw).tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Cache de embeddings endereçado por conteúdo, guardado no Redis.
+
+    A chave é o hash do texto normalizado (já anonimizado) e do nome do
+    modelo, de modo que chunks inalterados entre releases não voltam a ser
+    enviados para a API de embeddings.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        client: aioredis.Redis,
+        ttl: int | None = None,
+        namespace: str = 'embedding_cache',
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.client = client
+        self.ttl = ttl
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, text: str) -> str:
+        digest = hashlib.sha256(
+            f'{self.model_name}\x00{normalize_text(text)}'.encode('utf-8')
+        ).hexdigest()
+        return f'{self.namespace}:{self.model_name}:{digest}'
+
+    # Os caminhos síncronos não são usados pela aplicação (PGVector roda em
+    # async_mode), então apenas delegam para o modelo original.
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        vectors = await self.aembed_documents([text])
+        return vectors[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+
+        keys = [self.key_for(text) for text in texts]
+        try:
+            cached = await self.client.mget(keys)
+        except RedisError as e:
+            logger.warning('Embedding cache unavailable: %s', e)
+            return await self.underlying.aembed_documents(texts)
+
+        vectors: list[list[float] | None] = [
+            _decode(raw) if raw is not None else None for raw in cached
+        ]
+
+        # Textos repetidos no mesmo lote são embedados uma única vez
+        missing: dict[str, list[int]] = {}
+        for index, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[index], []).append(index)
+
+        if missing:
+            missing_texts = [texts[idx[0]] for idx in missing.values()]
+            computed = await self.underlying.aembed_documents(missing_texts)
+            for indices, vector in zip(missing.values(), computed):
+                for index in indices:
+                    vectors[index] = vector
+
+        await self._store(missing, vectors)
+        return vectors
+
+    async def _store(
+        self, missing: dict[str, list[int]], vectors: list[list[float]]
+    ) -> None:
+        misses = sum(len(indices) for indices in missing.values())
+        hits = len(vectors) - misses
+        self.hits += hits
+        self.misses += misses
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, indices in missing.items():
+                    pipe.set(key, _encode(vectors[indices[0]]), ex=self.ttl)
+                pipe.hincrby(STATS_KEY, 'hits', hits)
+                pipe.hincrby(STATS_KEY, 'misses', misses)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning('Embedding cache write failed: %s', e)
+
+
+async def get_cache_stats(client: aioredis.Redis) -> dict:
+    raw = await client.hgetall(STATS_KEY)
+    stats = {
+        (k.decode() if isinstance(k, bytes) else k): int(v)
+        for k, v in raw.items()
+    }
+    hits = stats.get('hits', 0)
+    misses = stats.get('misses', 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import logging
+
+import redis.asyncio as aioredis
+from langchain_core.language_models import BaseChatModel
+from redis.exceptions import RedisError
+
+from iaEditais.core.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Entradas do prompt de análise que determinam a resposta do modelo
+KEY_FIELDS = ('document', 'source', 'requirement', 'expected_session', 'query')
+RESULT_FIELDS = ('feedback', 'fulfilled', 'score')
+
+
+def model_name(model: BaseChatModel) -> str:
+    underlying = getattr(model, 'underlying', model)
+    return getattr(underlying, 'model_name', None) or underlying._llm_type
+
+
+class EvalCache:
+    """
+    Cache das avaliações de ramos, guardado no Redis.
+
+    A chave é o hash das entradas já formatadas do prompt (contexto
+    anonimizado, requisito, seção esperada, fontes e pergunta), do nome do
+    modelo e da versão do prompt. Ramos reenviados sem mudança em nenhum
+    desses itens reaproveitam a resposta anterior sem chamar o modelo. As
+    entradas expiram pelo TTL (e pela política LRU do Redis, se houver).
+    """
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        model_name: str,
+        prompt_version: str,
+        ttl: int | None = None,
+        namespace: str = 'eval_cache',
+    ):
+        self.client = client
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def key_for(self, item: dict) -> str:
+        parts = [self.model_name, self.prompt_version] + [
+            normalize_text(str(item.get(field) or '')) for field in KEY_FIELDS
+        ]
+        digest = hashlib.sha256('\x00'.join(parts).encode('utf-8'))
+        return f'{self.namespace}:{digest.hexdigest()}'
+
+    async def apply(self, items: list[dict]) -> list[dict]:
+        """Preenche os ramos em cache e retorna os que ainda faltam."""
+        if not items:
+            return []
+        try:
+            cached = await self.client.mget([
+                self.key_for(item) for item in items
+            ])
+        except RedisError as e:
+            logger.warning('Eval cache unavailable: %s', e)
+            return items
+
+        missing = []
+        for item, raw in zip(items, cached):
+            if raw is None:
+                missing.append(item)
+                continue
+            item.update(json.loads(raw))
+            item['cache_hit'] = True
+        return missing
+
+    async def store(self, items: list[dict]) -> None:
+        evaluated = [item for item in items if 'score' in item]
+        if not evaluated:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for item in evaluated:
+                    result = {
+                        field: item.get(field) for field in RESULT_FIELDS
+                    }
+                    pipe.set(
+                        self.key_for(item), json.dumps(result), ex=self.ttl
+                    )
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning('Eval cache write failed: %s', e)
@@ -0,0 +1,314 @@
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from functools import lru_cache
+from itertools import count
+from typing import NamedTuple, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
+
+from iaEditais.core.settings import Settings
+
+SETTINGS = Settings()
+
+RELEASE_STREAM = 'jobs:releases'
+RELEASE_GROUP = 'release-workers'
+
+logger = logging.getLogger(__name__)
+
+
+class Job(NamedTuple):
+    id: str
+    payload: dict
+    attempts: int = 0
+    last_error: Optional[str] = None
+
+
+class JobQueue(ABC):
+    """
+    Fila de jobs com confirmação explícita.
+
+    Um job entregue fica "em voo" até `ack` ou `retry`. Se o worker morrer
+    sem confirmar (ou parar de chamar `touch`) por mais que
+    `visibility_timeout` segundos, o job volta para a fila contando como
+    uma tentativa. Depois de `max_attempts` tentativas ele vai para a fila
+    de mortos.
+    """
+
+    def __init__(
+        self,
+        visibility_timeout: float = SETTINGS.JOB_VISIBILITY_TIMEOUT,
+        max_attempts: int = SETTINGS.JOB_MAX_ATTEMPTS,
+        retry_delay: float = SETTINGS.JOB_RETRY_DELAY,
+    ):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def backoff(self, attempts: int) -> float:
+        return self.retry_delay * 2 ** (attempts - 1)
+
+    @abstractmethod
+    async def enqueue(self, payload: dict) -> str:
+        pass
+
+    @abstractmethod
+    async def fetch(
+        self, consumer: str, count: int = 1, block: float = 5
+    ) -> list[Job]:
+        pass
+
+    @abstractmethod
+    async def ack(self, job: Job) -> None:
+        pass
+
+    @abstractmethod
+    async def retry(self, job: Job, error: str) -> None:
+        pass
+
+    @abstractmethod
+    async def touch(self, job: Job, consumer: str) -> None:
+        pass
+
+    @abstractmethod
+    async def dead_letters(self) -> list[Job]:
+        pass
+
+
+def _encode(payload: dict, attempts: int, error: Optional[str]) -> dict:
+    return {
+        'payload': json.dumps(payload),
+        'attempts': attempts,
+        'last_error': error or '',
+    }
+
+
+def _decode(job_id, fields: dict) -> Job:
+    fields = {
+        (k.decode() if isinstance(k, bytes) else k): (
+            v.decode() if isinstance(v, bytes) else v
+        )
+        for k, v in fields.items()
+    }
+    return Job(
+        id=job_id.decode() if isinstance(job_id, bytes) else job_id,
+        payload=json.loads(fields['payload']),
+        attempts=int(fields.get('attempts', 0)),
+        last_error=fields.get('last_error') or None,
+    )
+
+
+# Move para o stream os retries cujo backoff já passou. O ZREM e o XADD
+# rodam juntos no Redis: um worker que cair no meio não perde o retry, e
+# só um worker movimenta cada item.
+RELEASE_DUE_SCRIPT = """
+local due = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], 0, ARGV[1], 'LIMIT', 0, ARGV[2]
+)
+for _, member in ipairs(due) do
+    redis.call('ZREM', KEYS[1], member)
+    local fields = {}
+    for field, value in pairs(cjson.decode(member)) do
+        table.insert(fields, field)
+        table.insert(fields, tostring(value))
+    end
+    redis.call('XADD', KEYS[2], '*', unpack(fields))
+end
+return #due
+"""
+RELEASE_DUE_BATCH = 100
+
+
+class RedisJobQueue(JobQueue):
+    """Fila sobre Redis Streams com consumer group."""
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        stream: str = RELEASE_STREAM,
+        group: str = RELEASE_GROUP,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.client = client
+        self.stream = stream
+        self.group = group
+        self.delayed_key = f'{stream}:delayed'
+        self.dead_stream = f'{stream}:dead'
+        self._group_ready = False
+        self._release_due_script = client.register_script(RELEASE_DUE_SCRIPT)
+
+    async def _ensure_group(self) -> None:
+        if self._group_ready:
+            return
+        try:
+            await self.client.xgroup_create(
+                self.stream, self.group, id='0', mkstream=True
+            )
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._group_ready = True
+
+    async def enqueue(self, payload: dict) -> str:
+        job_id = await self.client.xadd(self.stream, _encode(payload, 0, None))
+        return job_id.decode() if isinstance(job_id, bytes) else job_id
+
+    async def _release_due(self) -> None:
+        await self._release_due_script(
+            keys=[self.delayed_key, self.stream],
+            args=[time.time(), RELEASE_DUE_BATCH],
+        )
+
+    async def _reclaim_expired(self, consumer: str, count: int) -> None:
+        _, claimed, *_ = await self.client.xautoclaim(
+            self.stream,
+            self.group,
+            consumer,
+            min_idle_time=int(self.visibility_timeout * 1000),
+            start_id='0-0',
+            count=count,
+        )
+        for job_id, fields in claimed:
+            if not fields:
+                continue
+            job = _decode(job_id, fields)
+            logger.warning('Job %s passou do visibility timeout', job.id)
+            await self.retry(job, 'visibility timeout')
+
+    async def fetch(
+        self, consumer: str, count: int = 1, block: float = 5
+    ) -> list[Job]:
+        await self._ensure_group()
+        await self._release_due()
+        await self._reclaim_expired(consumer, count)
+
+        response = await self.client.xreadgroup(
+            self.group,
+            consumer,
+            {self.stream: '>'},
+            count=count,
+            block=int(block * 1000),
+        )
+        return [
+            _decode(job_id, fields)
+            for _, entries in response or []
+            for job_id, fields in entries
+        ]
+
+    async def ack(self, job: Job) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, job.id)
+            pipe.xdel(self.stream, job.id)
+            await pipe.execute()
+
+    async def retry(self, job: Job, error: str) -> None:
+        attempts = job.attempts + 1
+        fields = _encode(job.payload, attempts, error)
+        async with self.client.pipeline(transaction=True) as pipe:
+            if attempts >= self.max_attempts:
+                pipe.xadd(self.dead_stream, fields)
+            else:
+                member = json.dumps({**fields, 'origin': job.id})
+                pipe.zadd(
+                    self.delayed_key,
+                    {member: time.time() + self.backoff(attempts)},
+                )
+            pipe.xack(self.stream, self.group, job.id)
+            pipe.xdel(self.stream, job.id)
+            await pipe.execute()
+
+    async def touch(self, job: Job, consumer: str) -> None:
+        # Zera o tempo ocioso da entrega, adiando o visibility timeout
+        await self.client.xclaim(
+            self.stream,
+            self.group,
+            consumer,
+            min_idle_time=0,
+            message_ids=[job.id],
+            justid=True,
+        )
+
+    async def dead_letters(self) -> list[Job]:
+        entries = await self.client.xrange(self.dead_stream)
+        return [_decode(job_id, fields) for job_id, fields in entries]
+
+
+class MemoryJobQueue(JobQueue):
+    """Fila em processo com a mesma semântica, para testes e uso local."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.ready: deque[Job] = deque()
+        self.in_flight: dict[str, tuple[Job, float]] = {}
+        self.delayed: list[tuple[float, Job]] = []
+        self.dead: list[Job] = []
+        self._ids = count(1)
+        self._event = asyncio.Event()
+
+    def _push(self, payload, attempts=0, error=None) -> str:
+        job = Job(str(next(self._ids)), payload, attempts, error)
+        self.ready.append(job)
+        self._event.set()
+        return job.id
+
+    async def enqueue(self, payload: dict) -> str:
+        return self._push(payload)
+
+    async def fetch(
+        self, consumer: str, count: int = 1, block: float = 5
+    ) -> list[Job]:
+        now = time.monotonic()
+        for available_at, job in list(self.delayed):
+            if available_at <= now:
+                self.delayed.remove((available_at, job))
+                self._push(job.payload, job.attempts, job.last_error)
+        for job, deadline in list(self.in_flight.values()):
+            if deadline <= now:
+                await self.retry(job, 'visibility timeout')
+
+        if not self.ready:
+            self._event.clear()
+            try:
+                await asyncio.wait_for(self._event.wait(), block)
+            except TimeoutError:
+                return []
+
+        jobs = []
+        while self.ready and len(jobs) < count:
+            job = self.ready.popleft()
+            self.in_flight[job.id] = (job, now + self.visibility_timeout)
+            jobs.append(job)
+        return jobs
+
+    async def ack(self, job: Job) -> None:
+        self.in_flight.pop(job.id, None)
+
+    async def retry(self, job: Job, error: str) -> None:
+        self.in_flight.pop(job.id, None)
+        attempts = job.attempts + 1
+        retried = job._replace(attempts=attempts, last_error=error)
+        if attempts >= self.max_attempts:
+            self.dead.append(retried)
+        else:
+            available_at = time.monotonic() + self.backoff(attempts)
+            self.delayed.append((available_at, retried))
+
+    async def touch(self, job: Job, consumer: str) -> None:
+        if job.id in self.in_flight:
+            deadline = time.monotonic() + self.visibility_timeout
+            self.in_flight[job.id] = (job, deadline)
+
+    async def dead_letters(self) -> list[Job]:
+        return list(self.dead)
+
+
+@lru_cache
+def get_job_queue() -> JobQueue:
+    if SETTINGS.JOB_QUEUE_BACKEND == 'MEMORY':
+        return MemoryJobQueue()
+    return RedisJobQueue(aioredis.Redis.from_url(SETTINGS.CACHE_URL))
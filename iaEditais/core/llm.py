@@ -1,12 +1,48 @@
 from langchain_openai import ChatOpenAI
+from openai import APIConnectionError
+from redis.asyncio import Redis
 
+from iaEditais.core.llm_limiter import (
+    AdaptiveLimiter,
+    RateLimitedChatModel,
+    RedisTokenBucket,
+    TokenBucket,
+)
 from iaEditais.core.settings import Settings
 
 settings = Settings()
-model = ChatOpenAI(
-    model='gpt-5-mini',
-    api_key=settings.OPENAI_API_KEY,
-    temperature=0.1,
+client = Redis.from_url(settings.CACHE_URL)
+
+if settings.LLM_RATE_LIMIT_BACKEND == 'REDIS':
+    requests_bucket = RedisTokenBucket(
+        client, 'requests', settings.LLM_REQUESTS_PER_MINUTE
+    )
+    tokens_bucket = RedisTokenBucket(
+        client, 'tokens', settings.LLM_TOKENS_PER_MINUTE
+    )
+else:
+    requests_bucket = TokenBucket(settings.LLM_REQUESTS_PER_MINUTE)
+    tokens_bucket = TokenBucket(settings.LLM_TOKENS_PER_MINUTE)
+
+limiter = AdaptiveLimiter(
+    requests_bucket,
+    tokens_bucket,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    latency_target=settings.LLM_LATENCY_TARGET,
+    client=client,
+)
+model = RateLimitedChatModel(
+    # Sem retries internos: os 429 precisam chegar ao limitador, que repete
+    # também 5xx e falhas de conexão/timeout (APITimeoutError é subclasse)
+    underlying=ChatOpenAI(
+        model='gpt-5-mini',
+        api_key=settings.OPENAI_API_KEY,
+        temperature=0.1,
+        max_retries=0,
+    ),
+    limiter=limiter,
+    max_retries=settings.LLM_MAX_RETRIES,
+    retry_on=(APIConnectionError,),
 )
 
 
@@ -0,0 +1,330 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+from http import HTTPStatus
+from typing import Any, List, Optional
+
+import redis.asyncio as aioredis
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from redis.exceptions import RedisError
+
+from iaEditais.core.tokenizer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+STATS_PREFIX = 'llm_limiter:stats'
+BUCKET_PREFIX = 'llm_limiter:bucket'
+STATS_TTL = 5 * 60
+
+
+class TokenBucket:
+    """Balde de fichas local ao processo, reabastecido por minuto."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    async def consume(self, amount: float) -> None:
+        # Débito sem espera (pode deixar o saldo negativo); não há await
+        # entre a leitura e a escrita, então dispensa o lock
+        self._refill()
+        self.tokens -= amount
+
+
+# Retorna quantos segundos faltam para haver `amount` fichas (0 quando o
+# débito foi feito). O relógio é o do Redis, comum a todos os workers.
+BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = capacity / 60
+local amount = tonumber(ARGV[2])
+local force = ARGV[3] == '1'
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+
+local wait = 0
+if force or tokens >= amount then
+    tokens = tokens - amount
+else
+    wait = (amount - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], 120)
+return tostring(wait)
+"""
+
+
+class RedisTokenBucket:
+    """Balde de fichas compartilhado entre workers via script Lua."""
+
+    def __init__(self, client: aioredis.Redis, name: str, per_minute: int):
+        self.client = client
+        self.key = f'{BUCKET_PREFIX}:{name}'
+        self.capacity = per_minute
+        self.script = client.register_script(BUCKET_SCRIPT)
+
+    async def _call(self, amount: float, force: bool) -> float:
+        wait = await self.script(
+            keys=[self.key], args=[self.capacity, amount, int(force)]
+        )
+        return float(wait)
+
+    async def acquire(self, amount: float) -> None:
+        amount = min(amount, self.capacity)
+        while wait := await self._call(amount, force=False):
+            await asyncio.sleep(wait)
+
+    async def consume(self, amount: float) -> None:
+        await self._call(amount, force=True)
+
+
+class AdaptiveLimiter:
+    """
+    Limita as chamadas ao modelo no processo.
+
+    A concorrência segue AIMD: cresce de forma aditiva (cerca de +1 por
+    janela de `limit` respostas bem-sucedidas) e cai pela metade a cada
+    429 ou resposta acima de `latency_target`. Quedas provocadas por
+    requisições que já estavam em andamento na última queda são ignoradas,
+    para que uma rajada de 429 não derrube o limite até o mínimo. Além
+    disso, cada chamada passa pelos baldes de requisições e tokens por
+    minuto, que podem ser compartilhados via Redis.
+    """
+
+    MIN_CONCURRENCY = 1
+    DECREASE_FACTOR = 0.5
+
+    def __init__(
+        self,
+        requests: TokenBucket | RedisTokenBucket,
+        tokens: TokenBucket | RedisTokenBucket,
+        max_concurrency: int,
+        latency_target: float = 30,
+        client: Optional[aioredis.Redis] = None,
+    ):
+        self.requests = requests
+        self.tokens = tokens
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.limit = float(max(self.MIN_CONCURRENCY, max_concurrency // 2))
+        self.in_flight = 0
+        self.queued = 0
+        self.client = client
+        self.process = f'{socket.gethostname()}-{os.getpid()}'
+        self._slots = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'concurrency_limit': int(self.limit),
+        }
+
+    async def _publish(self) -> None:
+        if self.client is None:
+            return
+        key = f'{STATS_PREFIX}:{self.process}'
+        try:
+            await self.client.set(key, json.dumps(self.stats()), ex=STATS_TTL)
+        except RedisError as e:
+            logger.warning('LLM limiter stats unavailable: %s', e)
+
+    async def acquire(self, tokens: float) -> float:
+        """Espera vaga e fichas; retorna o instante de início da chamada."""
+        self.queued += 1
+        await self._publish()
+        try:
+            async with self._cond:
+                await self._cond.wait_for(
+                    lambda: self._slots < int(self.limit)
+                )
+                self._slots += 1
+            try:
+                await self.requests.acquire(1)
+                await self.tokens.acquire(tokens)
+            except BaseException:
+                await self._free_slot()
+                raise
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        await self._publish()
+        return time.monotonic()
+
+    async def _free_slot(self) -> None:
+        async with self._cond:
+            self._slots -= 1
+            self._cond.notify_all()
+
+    async def release(
+        self,
+        started_at: float,
+        rate_limited: bool = False,
+        extra_tokens: float = 0,
+    ) -> None:
+        latency = time.monotonic() - started_at
+        if rate_limited or latency > self.latency_target:
+            if started_at >= self._last_decrease:
+                self.limit = max(
+                    self.MIN_CONCURRENCY, self.limit * self.DECREASE_FACTOR
+                )
+                self._last_decrease = time.monotonic()
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+        if extra_tokens:
+            await self.tokens.consume(extra_tokens)
+
+        self.in_flight -= 1
+        await self._free_slot()
+        await self._publish()
+
+
+def estimate_tokens(messages: List[BaseMessage], completion: int) -> int:
+    # Estimativa feita antes da resposta; o consumo real é debitado do
+    # balde quando a API devolve o uso de tokens
+    prompt = sum(count_tokens(str(message.content)) for message in messages)
+    return prompt + completion
+
+
+def _used_tokens(result: ChatResult) -> Optional[int]:
+    usage = (result.llm_output or {}).get('token_usage') or {}
+    if usage.get('total_tokens'):
+        return usage['total_tokens']
+    for generation in result.generations:
+        metadata = getattr(generation.message, 'usage_metadata', None)
+        if metadata:
+            return metadata.get('total_tokens')
+    return None
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, 'status_code', None)
+    return status == HTTPStatus.TOO_MANY_REQUESTS
+
+
+def _is_transient(
+    error: Exception, retry_on: tuple[type[Exception], ...]
+) -> bool:
+    # Erros do servidor e de conexão/timeout também são repetidos, mas sem
+    # reduzir a concorrência: não indicam excesso de requisições
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status >= HTTPStatus.INTERNAL_SERVER_ERROR
+    return isinstance(error, retry_on)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    try:
+        return float(headers.get('retry-after')) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """
+    Envolve o modelo de chat com o `AdaptiveLimiter`.
+
+    Os 429 chegam aqui (o cliente interno não deve repetir sozinho) e são
+    repetidos com backoff exponencial e jitter, ou pelo `retry-after` da
+    API, depois de reduzir a concorrência. Erros 5xx e os de `retry_on`
+    (conexão, timeout) são repetidos com o mesmo backoff.
+    """
+
+    underlying: BaseChatModel
+    limiter: AdaptiveLimiter
+    completion_tokens: int = 1000
+    max_retries: int = 3
+    retry_delay: float = 1
+    retry_on: tuple[type[Exception], ...] = ()
+
+    @property
+    def _llm_type(self) -> str:
+        return f'rate-limited-{self.underlying._llm_type}'
+
+    # Caminho síncrono não é usado pelo pipeline; apenas delega
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self.underlying._generate(messages, stop=stop, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        estimate = estimate_tokens(messages, self.completion_tokens)
+        for attempt in range(self.max_retries + 1):
+            started_at = await self.limiter.acquire(estimate)
+            try:
+                result = await self.underlying._agenerate(
+                    messages, stop=stop, **kwargs
+                )
+            except Exception as e:
+                rate_limited = _is_rate_limited(e)
+                await self.limiter.release(started_at, rate_limited)
+                retryable = rate_limited or _is_transient(e, self.retry_on)
+                if not retryable or attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e) or (
+                    self.retry_delay * 2**attempt * random.uniform(0.5, 1.5)
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            used = _used_tokens(result)
+            extra = used - estimate if used else 0
+            await self.limiter.release(started_at, extra_tokens=extra)
+            return result
+
+
+async def get_limiter_stats(client: aioredis.Redis) -> dict:
+    """Soma os contadores publicados por todos os processos."""
+    totals = {'in_flight': 0, 'queued': 0, 'concurrency_limit': 0}
+    processes = 0
+    async for key in client.scan_iter(match=f'{STATS_PREFIX}:*'):
+        raw = await client.get(key)
+        if raw is None:
+            continue
+        processes += 1
+        for field, value in json.loads(raw).items():
+            totals[field] = totals.get(field, 0) + value
+    return {**totals, 'processes': processes}
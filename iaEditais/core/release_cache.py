@@ -0,0 +1,67 @@
+import logging
+from typing import Optional
+from uuid import UUID
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class ReleaseTreeCache:
+    """
+    JSON público das releases concluídas, guardado no Redis.
+
+    Depois de concluída, a árvore de verificação de uma release não muda,
+    então a serialização (e a carga de todo o grafo de tipificações,
+    taxonomias, ramos e fontes) é feita uma vez e servida do cache até a
+    release ou o documento ser excluído ou a entrada expirar. A árvore é
+    guardada ainda anonimizada: os dados reais nunca vão para o Redis.
+    """
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        ttl: int | None = None,
+        namespace: str = 'release_tree',
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def key_for(self, doc_id: UUID, release_id: UUID) -> str:
+        return f'{self.namespace}:{doc_id}:{release_id}'
+
+    async def get(self, doc_id: UUID, release_id: UUID) -> Optional[bytes]:
+        try:
+            return await self.client.get(self.key_for(doc_id, release_id))
+        except RedisError as e:
+            logger.warning('Release tree cache unavailable: %s', e)
+            return None
+
+    async def set(self, doc_id: UUID, release_id: UUID, data: str) -> None:
+        try:
+            await self.client.set(
+                self.key_for(doc_id, release_id), data, ex=self.ttl
+            )
+        except RedisError as e:
+            logger.warning('Release tree cache write failed: %s', e)
+
+    async def invalidate(self, doc_id: UUID, release_id: UUID) -> None:
+        try:
+            await self.client.delete(self.key_for(doc_id, release_id))
+        except RedisError as e:
+            logger.warning('Release tree cache invalidation failed: %s', e)
+
+    async def invalidate_document(self, doc_id: UUID) -> None:
+        try:
+            keys = [
+                key
+                async for key in self.client.scan_iter(
+                    match=f'{self.namespace}:{doc_id}:*'
+                )
+            ]
+            if keys:
+                await self.client.delete(*keys)
+        except RedisError as e:
+            logger.warning('Release tree cache invalidation failed: %s', e)
@@ -1,21 +1,50 @@
+import hashlib
 import os
 from abc import ABC, abstractmethod
 from functools import lru_cache
+from http import HTTPStatus
 from pathlib import Path
+from typing import NamedTuple
+from uuid import uuid4
 
 from aiofiles import open as aio_open
-from fastapi import UploadFile
+from fastapi import HTTPException, UploadFile
 
 from iaEditais.core.settings import Settings
 
 SETTINGS = Settings()
 UPLOAD_DIRECTORY = SETTINGS.UPLOAD_DIRECTORY
 STORAGE_PROVIDER = SETTINGS.STORAGE_PROVIDER
+UPLOAD_BUFFER_SIZE = SETTINGS.UPLOAD_BUFFER_SIZE
+UPLOAD_MAX_SIZE = SETTINGS.UPLOAD_MAX_SIZE
+
+
+class StoredFile(NamedTuple):
+    url: str
+    sha256: str
+    size: int
+
+
+def _file_too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+        detail=f'File exceeds the maximum size of {max_size} bytes',
+    )
 
 
 class StorageProvider(ABC):
-    @abstractmethod
     async def save(self, file: UploadFile, filename: str) -> str:
+        stored = await self.store(file, filename)
+        return stored.url
+
+    @abstractmethod
+    async def store(self, file: UploadFile, filename: str) -> StoredFile:
+        pass
+
+    @abstractmethod
+    async def store_by_content(
+        self, file: UploadFile, suffix: str = ''
+    ) -> StoredFile:
         pass
 
     @abstractmethod
@@ -33,18 +62,64 @@ class StorageProvider(ABC):
 
 class LocalStorage(StorageProvider):
     def __init__(
-        self, storage_dir: str = UPLOAD_DIRECTORY, base_url: str = '/uploads'
+        self,
+        storage_dir: str = UPLOAD_DIRECTORY,
+        base_url: str = '/uploads',
+        buffer_size: int = UPLOAD_BUFFER_SIZE,
+        max_size: int = UPLOAD_MAX_SIZE,
     ):
         self.storage_dir = Path(storage_dir)
         self.base_url = base_url.rstrip('/')
+        self.buffer_size = buffer_size
+        self.max_size = max_size
         self.storage_dir.mkdir(parents=True, exist_ok=True)
 
-    async def save(self, file: UploadFile, filename: str) -> str:
+    async def store(self, file: UploadFile, filename: str) -> StoredFile:
+        # Quando o tamanho já é conhecido, recusa antes de escrever
+        if file.size is not None and file.size > self.max_size:
+            raise _file_too_large(self.max_size)
+
         file_path = self.storage_dir / filename
+        digest = hashlib.sha256()
+        try:
+            size = await self._copy(file, file_path, digest)
+        except BaseException:
+            file_path.unlink(missing_ok=True)
+            raise
+
+        return StoredFile(
+            url=await self.get_url(filename),
+            sha256=digest.hexdigest(),
+            size=size,
+        )
+
+    async def _copy(self, file: UploadFile, file_path: Path, digest) -> int:
+        # Copia em blocos: a memória usada não depende do tamanho do arquivo
+        size = 0
         async with aio_open(file_path, 'wb') as out_file:
-            content = await file.read()
-            await out_file.write(content)
-        return await self.get_url(filename)
+            while chunk := await file.read(self.buffer_size):
+                size += len(chunk)
+                if size > self.max_size:
+                    raise _file_too_large(self.max_size)
+                digest.update(chunk)
+                await out_file.write(chunk)
+        return size
+
+    async def store_by_content(
+        self, file: UploadFile, suffix: str = ''
+    ) -> StoredFile:
+        temp_name = f'.{uuid4()}.part'
+        stored = await self.store(file, temp_name)
+
+        # Mesmo conteúdo, mesmo nome: cada arquivo é gravado uma única vez
+        filename = f'{stored.sha256}{suffix.lower()}'
+        temp_path = self.storage_dir / temp_name
+        if await self.exists(filename):
+            temp_path.unlink(missing_ok=True)
+        else:
+            os.replace(temp_path, self.storage_dir / filename)
+
+        return stored._replace(url=await self.get_url(filename))
 
     async def delete(self, filename: str) -> bool:
         file_path = self.storage_dir / filename
@@ -65,7 +140,12 @@ class LocalStorage(StorageProvider):
 
 
 class S3Storage(StorageProvider):
-    async def save(self, file: UploadFile, filename: str) -> str:
+    async def store(self, file: UploadFile, filename: str) -> StoredFile:
+        raise NotImplementedError('S3 Storage not implemented yet')
+
+    async def store_by_content(
+        self, file: UploadFile, suffix: str = ''
+    ) -> StoredFile:
         raise NotImplementedError('S3 Storage not implemented yet')
 
     async def delete(self, filename: str) -> bool:
@@ -0,0 +1,41 @@
+import logging
+import math
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
+from iaEditais.core.settings import Settings
+
+SETTINGS = Settings()
+
+# Aproximação usada quando o arquivo do encoding não está disponível
+CHARS_PER_TOKEN = 4
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache
+def get_encoding() -> Optional[tiktoken.Encoding]:
+    # O tiktoken baixa o encoding na primeira vez (ou lê de
+    # TIKTOKEN_CACHE_DIR); sem ele, a contagem cai para a aproximação
+    try:
+        return tiktoken.get_encoding(SETTINGS.TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning('Tokenizer unavailable, estimating tokens: %s', e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    encoding = get_encoding()
+    if encoding is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[:max_tokens])
@@ -1,14 +1,22 @@
 from langchain_openai import OpenAIEmbeddings
 from langchain_postgres import PGVector
+from redis.asyncio import Redis
 
+from iaEditais.core.embedding_cache import CachedEmbeddings
 from iaEditais.core.settings import Settings
 
 settings = Settings()
-vectorstore = PGVector(
-    embeddings=OpenAIEmbeddings(
-        model='text-embedding-3-small',
+embeddings = CachedEmbeddings(
+    underlying=OpenAIEmbeddings(
+        model=settings.EMBEDDING_MODEL,
         api_key=settings.OPENAI_API_KEY,
     ),
+    model_name=settings.EMBEDDING_MODEL,
+    client=Redis.from_url(settings.CACHE_URL),
+    ttl=settings.EMBEDDING_CACHE_TTL,
+)
+vectorstore = PGVector(
+    embeddings=embeddings,
     connection=settings.DATABASE_URL,
     use_jsonb=True,
     async_mode=True,
@@ -0,0 +1,94 @@
+import json
+import struct
+from functools import cached_property
+from typing import Optional
+
+try:
+    # Vem com o langgraph; sem ele, o websocket fica só com JSON
+    import ormsgpack
+except ImportError:
+    ormsgpack = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+
+# Limites dos cabeçalhos de array do msgpack (fixarray e array 16)
+FIXARRAY_SIZE = 16
+ARRAY16_SIZE = 2**16
+
+# Eventos de estado: só o mais recente de cada release interessa ao
+# cliente, então os anteriores ainda na fila são descartados
+STATE_EVENTS = {'doc.release.update'}
+
+
+def supported_encodings() -> list[str]:
+    return [MSGPACK, JSON] if ormsgpack is not None else [JSON]
+
+
+class WSEvent:
+    """
+    Mensagem do pub/sub, interpretada uma vez para todos os sockets.
+
+    As codificações (texto JSON ou msgpack) são calculadas sob demanda e
+    reaproveitadas entre os sockets que recebem o mesmo evento.
+    """
+
+    def __init__(self, data: str):
+        self.data = data
+        try:
+            self.message = json.loads(data)
+            self.json = data
+        except ValueError:
+            # Texto puro publicado no canal segue como string JSON
+            self.message = data
+            self.json = json.dumps(data)
+
+    @cached_property
+    def event_id(self) -> Optional[str]:
+        # Id no stream de replay do tópico, quando o evento passou por lá
+        if isinstance(self.message, dict):
+            return self.message.get('id')
+        return None
+
+    @cached_property
+    def state_key(self) -> Optional[tuple]:
+        if not isinstance(self.message, dict):
+            return None
+        event = self.message.get('event')
+        if event not in STATE_EVENTS:
+            return None
+        payload = self.message.get('payload') or {}
+        return event, payload.get('id')
+
+    @cached_property
+    def packed(self) -> bytes:
+        return ormsgpack.packb(self.message)
+
+
+def drop_superseded(events: list[WSEvent]) -> list[WSEvent]:
+    latest = {event.state_key: event for event in events if event.state_key}
+    return [
+        event
+        for event in events
+        if not event.state_key or latest[event.state_key] is event
+    ]
+
+
+def _msgpack_array_header(size: int) -> bytes:
+    if size < FIXARRAY_SIZE:
+        return bytes([0x90 | size])
+    if size < ARRAY16_SIZE:
+        return b'\xdc' + struct.pack('>H', size)
+    return b'\xdd' + struct.pack('>I', size)
+
+
+def encode(events: list[WSEvent], encoding: str, batch: bool) -> str | bytes:
+    """Um quadro com um evento ou, em lote, com a lista dos eventos."""
+    if encoding == MSGPACK:
+        if not batch:
+            return events[0].packed
+        header = _msgpack_array_header(len(events))
+        return header + b''.join(event.packed for event in events)
+    if not batch:
+        return events[0].data
+    return '[' + ','.join(event.json for event in events) + ']'
@@ -0,0 +1,102 @@
+import logging
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from iaEditais.core.settings import Settings
+from iaEditais.schemas import WSMessage
+
+SETTINGS = Settings()
+
+logger = logging.getLogger(__name__)
+
+
+def stream_key(channel_id: str) -> str:
+    return f'{channel_id}:stream'
+
+
+def parse_event_id(event_id: str) -> tuple[int, int]:
+    """Converte o id do stream ('<ms>-<seq>') para comparação."""
+    ms, _, seq = event_id.partition('-')
+    return int(ms), int(seq or 0)
+
+
+def _decode(value: bytes | str) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _with_topic(channel_id: str, message: WSMessage, event_id: str) -> str:
+    topic = channel_id.removeprefix('ws:')
+    return message.model_copy(
+        update={'id': event_id, 'topic': topic}
+    ).model_dump_json()
+
+
+async def publish_event(
+    client: aioredis.Redis, channel_id: str, message: WSMessage
+) -> str:
+    """
+    Guarda o evento no stream do tópico e o publica no pub/sub.
+
+    O stream é limitado (`WS_REPLAY_MAXLEN`, aproximado) e expira depois
+    de `WS_REPLAY_TTL` sem eventos novos. O id gerado pelo stream vai na
+    mensagem publicada, para o cliente retomar a partir dele.
+    """
+    key = stream_key(channel_id)
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.xadd(
+            key,
+            {'data': message.model_dump_json()},
+            maxlen=SETTINGS.WS_REPLAY_MAXLEN,
+            approximate=True,
+        )
+        pipe.expire(key, SETTINGS.WS_REPLAY_TTL)
+        event_id, _ = await pipe.execute()
+    event_id = _decode(event_id)
+    await client.publish(
+        channel_id, _with_topic(channel_id, message, event_id)
+    )
+    return event_id
+
+
+async def read_since(
+    client: aioredis.Redis, channel_id: str, last_event_id: str
+) -> tuple[list[str], bool]:
+    """
+    Eventos do tópico posteriores a `last_event_id`.
+
+    Retorna também se a sequência está completa: quando o stream já
+    descartou eventos posteriores ao id informado (ou o Redis falhou), o
+    cliente precisa recarregar o estado completo.
+    """
+    key = stream_key(channel_id)
+    try:
+        entries = await client.xrange(key, min=f'({last_event_id}')
+        if not entries:
+            # Stream expirado: pode ter havido eventos que já se perderam
+            return [], bool(await client.exists(key))
+        info = await client.xinfo_stream(key)
+    except RedisError as e:
+        logger.warning('Websocket replay unavailable: %s', e)
+        return [], False
+
+    # O XADD com MAXLEN apara o início do stream sem registrar nada em
+    # `max-deleted-entry-id`; a sequência só está completa se o stream
+    # ainda começa antes do último evento visto ou nunca foi aparado
+    # (`entries-added` existe a partir do Redis 7)
+    first_id = _decode(info['first-entry'][0])
+    complete = (
+        parse_event_id(first_id) <= parse_event_id(last_event_id)
+        or info.get('entries-added') == info['length']
+    )
+    events = [
+        _with_topic(
+            channel_id,
+            WSMessage.model_validate_json(
+                fields.get(b'data') or fields.get('data')
+            ),
+            _decode(event_id),
+        )
+        for event_id, fields in entries
+    ]
+    return events, complete
@@ -9,6 +9,7 @@ from sqlalchemy import (
     Index,
     Text,
     column,
+    false,
     func,
 )
 from sqlalchemy.dialects.postgresql import (
@@ -127,7 +128,7 @@ class Unit(AuditMixin):
         default_factory=list,
         init=False,
         foreign_keys='Document.unit_id',
-        lazy='selectin',
+        lazy='noload',
     )
 
     __table_args__ = (
@@ -193,7 +194,7 @@ class User(AuditMixin):
 
     editable_documents: Mapped[List['Document']] = relationship(
         'Document',
-        lazy='selectin',
+        lazy='noload',
         secondary='document_editors',
         primaryjoin='User.id==DocumentEditor.user_id',
         secondaryjoin='Document.id==DocumentEditor.document_id',
@@ -340,7 +341,7 @@ class Typification(AuditMixin):
     )
     documents: Mapped[List['Document']] = relationship(
         'Document',
-        lazy='selectin',
+        lazy='noload',
         secondary='document_typifications',
         back_populates='typifications',
         default_factory=list,
@@ -570,15 +571,17 @@ class Document(AuditMixin):
     unit_id: Mapped[UUID] = mapped_column(
         ForeignKey('units.id'), nullable=False
     )
+    # Relacionamentos em 'raise': cada consulta declara o que carrega (ver
+    # os perfis em `doc_repo`), em vez de trazer mensagens e árvores inteiras
     unit: Mapped['Unit'] = relationship(
         back_populates='documents',
-        lazy='selectin',
+        lazy='raise',
         init=False,
     )
 
     history: Mapped[List['DocumentHistory']] = relationship(
         back_populates='document',
-        lazy='selectin',
+        lazy='raise',
         init=False,
         default_factory=list,
         order_by='desc(DocumentHistory.created_at)',
@@ -586,7 +589,7 @@ class Document(AuditMixin):
 
     typifications: Mapped[List['Typification']] = relationship(
         'Typification',
-        lazy='selectin',
+        lazy='raise',
         secondary='document_typifications',
         back_populates='documents',
         default_factory=list,
@@ -595,7 +598,7 @@ class Document(AuditMixin):
 
     editors: Mapped[List['User']] = relationship(
         'User',
-        lazy='selectin',
+        lazy='raise',
         secondary='document_editors',
         primaryjoin='Document.id==DocumentEditor.document_id',
         secondaryjoin='User.id==DocumentEditor.user_id',
@@ -606,7 +609,7 @@ class Document(AuditMixin):
     messages: Mapped[List['DocumentMessage']] = relationship(
         'DocumentMessage',
         back_populates='document',
-        lazy='selectin',
+        lazy='raise',
         default_factory=list,
         init=False,
         cascade='all, delete-orphan',
@@ -618,7 +621,7 @@ class Document(AuditMixin):
     bundle: Mapped[Optional['Bundle']] = relationship(
         'Bundle',
         init=False,
-        lazy='selectin',
+        lazy='raise',
     )
     generation_id: Mapped[Optional[UUID]] = mapped_column(
         nullable=True, default=None
@@ -686,6 +689,11 @@ class DocumentRelease(AuditMixin):
     )
 
     file_path: Mapped[str] = mapped_column(nullable=False)
+    # `file_path` é endereçado pelo hash do conteúdo; o nome enviado pelo
+    # usuário fica aqui para exibição e download
+    original_filename: Mapped[Optional[str]] = mapped_column(
+        nullable=True, default=None
+    )
 
     check_tree: Mapped[List['AppliedTypification']] = relationship(
         'AppliedTypification',
@@ -699,6 +707,14 @@ class DocumentRelease(AuditMixin):
         nullable=True, default=None
     )
 
+    # Checkpoint do pipeline: última etapa concluída e o que ela produziu
+    pipeline_stage: Mapped[Optional[str]] = mapped_column(
+        nullable=True, default=None
+    )
+    pipeline_state: Mapped[Optional[dict]] = mapped_column(
+        JSONB, nullable=True, default=None
+    )
+
     messages: Mapped[List['DocumentMessage']] = relationship(
         'DocumentMessage',
         back_populates='release',
@@ -974,6 +990,15 @@ class AppliedBranch:
         nullable=True, default=None
     )
 
+    # Avaliação reaproveitada do cache, sem nova chamada ao modelo
+    cache_hit: Mapped[bool] = mapped_column(
+        default=False, server_default=false()
+    )
+    # Tamanho do prompt enviado ao modelo (vazio quando veio do cache)
+    prompt_tokens: Mapped[Optional[int]] = mapped_column(
+        nullable=True, default=None
+    )
+
     created_at: Mapped[datetime] = mapped_column(
         init=False, server_default=func.now()
     )
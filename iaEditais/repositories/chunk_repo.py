@@ -0,0 +1,161 @@
+from contextlib import asynccontextmanager
+
+from langchain_core.documents import Document
+from langchain_postgres import PGVector
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Integer, column, func, select, table, text, tuple_
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+ChunkKey = tuple[str, int]
+
+# Tabelas gerenciadas pelo langchain_postgres (fora do table_registry)
+collection_table = table(
+    'langchain_pg_collection',
+    column('uuid', UUID),
+    column('name'),
+)
+embedding_table = table(
+    'langchain_pg_embedding',
+    column('id'),
+    column('collection_id', UUID),
+    column('document'),
+    column('cmetadata', JSONB),
+    column('embedding', Vector),
+)
+
+source_expression = embedding_table.c.cmetadata['source'].astext
+chunk_index_expression = embedding_table.c.cmetadata[
+    'chunk_index'
+].astext.cast(Integer)
+
+
+# Mesmo índice da migração 5f2c8e1a9b3d, que só o cria se a tabela já
+# existir; numa instalação nova ela surge depois, com o PGVector
+CHUNK_WINDOW_INDEX = text(
+    """
+    CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_source_chunk_index
+    ON langchain_pg_embedding (
+        (cmetadata ->> 'source'),
+        ((cmetadata ->> 'chunk_index')::integer)
+    )
+    """
+)
+
+
+async def ensure_indexes(vstore: PGVector) -> None:
+    """Cria as tabelas do PGVector, se preciso, e o índice de janelas."""
+    if vstore.create_extension:
+        await vstore.acreate_vector_extension()
+    await vstore.acreate_tables_if_not_exists()
+    async with vstore.session_maker() as session:
+        await session.execute(CHUNK_WINDOW_INDEX)
+        await session.commit()
+
+
+def _collection_filter(vstore: PGVector):
+    return collection_table.c.name == vstore.collection_name
+
+
+@asynccontextmanager
+async def source_lock(vstore: PGVector, source: str):
+    """
+    Serializa a vetorização de um mesmo arquivo entre workers.
+
+    O lock de transação fica preso enquanto o bloco roda e é liberado no
+    commit ou rollback, mesmo se o bloco falhar.
+    """
+    async with vstore.session_maker() as session, session.begin():
+        await session.execute(
+            select(func.pg_advisory_xact_lock(func.hashtext(source)))
+        )
+        yield
+
+
+async def has_chunks(vstore: PGVector, source: str) -> bool:
+    stmt = (
+        select(embedding_table.c.id)
+        .join(
+            collection_table,
+            collection_table.c.uuid == embedding_table.c.collection_id,
+        )
+        .where(_collection_filter(vstore), source_expression == source)
+        .limit(1)
+    )
+
+    async with vstore.session_maker() as session:
+        return await session.scalar(stmt) is not None
+
+
+async def get_chunks_by_keys(
+    vstore: PGVector, keys: set[ChunkKey]
+) -> dict[ChunkKey, Document]:
+    # Servido pelo índice ix_langchain_pg_embedding_source_chunk_index
+    if not keys:
+        return {}
+
+    stmt = (
+        select(
+            embedding_table.c.id,
+            embedding_table.c.document,
+            embedding_table.c.cmetadata,
+        )
+        .join(
+            collection_table,
+            collection_table.c.uuid == embedding_table.c.collection_id,
+        )
+        .where(
+            _collection_filter(vstore),
+            tuple_(source_expression, chunk_index_expression).in_(list(keys)),
+        )
+    )
+
+    async with vstore.session_maker() as session:
+        result = await session.execute(stmt)
+        rows = result.all()
+
+    chunks = {}
+    for row in rows:
+        metadata = row.cmetadata or {}
+        key = (metadata.get('source'), metadata.get('chunk_index'))
+        chunks.setdefault(
+            key,
+            Document(
+                id=str(row.id), page_content=row.document, metadata=metadata
+            ),
+        )
+    return chunks
+
+
+async def get_chunks_with_embeddings(
+    vstore: PGVector, source: str
+) -> list[tuple[Document, list[float]]]:
+    stmt = (
+        select(
+            embedding_table.c.id,
+            embedding_table.c.document,
+            embedding_table.c.cmetadata,
+            embedding_table.c.embedding,
+        )
+        .join(
+            collection_table,
+            collection_table.c.uuid == embedding_table.c.collection_id,
+        )
+        .where(_collection_filter(vstore), source_expression == source)
+        .order_by(chunk_index_expression)
+    )
+
+    async with vstore.session_maker() as session:
+        result = await session.execute(stmt)
+        rows = result.all()
+
+    return [
+        (
+            Document(
+                id=str(row.id),
+                page_content=row.document,
+                metadata=row.cmetadata or {},
+            ),
+            [float(value) for value in row.embedding],
+        )
+        for row in rows
+    ]
@@ -3,19 +3,48 @@ from uuid import UUID
 
 from sqlalchemy import select, true
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import aliased, selectinload
 
 from iaEditais.models import Document, DocumentHistory, Typification, User
 from iaEditais.repositories import util
 from iaEditais.schemas import DocumentFilter
 
+# Perfil de carga do DocumentPublic; unidade, pacote e mensagens ficam de
+# fora (os relacionamentos do Document são 'raise' por padrão)
+PUBLIC_LOAD = (
+    selectinload(Document.history),
+    selectinload(Document.typifications),
+    selectinload(Document.editors),
+)
+
 
 async def get_by_id(session: AsyncSession, doc_id: UUID) -> Optional[Document]:
-    stmt = select(Document).where(Document.id == doc_id)
+    # `populate_existing` recarrega os relacionamentos depois de um commit
+    stmt = (
+        select(Document)
+        .where(Document.id == doc_id)
+        .options(*PUBLIC_LOAD)
+        .execution_options(populate_existing=True)
+    )
     result = await session.execute(stmt)
     return result.scalar_one_or_none()
 
 
+async def get_by_ids(
+    session: AsyncSession, ids: list[UUID]
+) -> Sequence[Document]:
+    if not ids:
+        return []
+    stmt = (
+        select(Document)
+        .where(Document.id.in_(ids))
+        .options(*PUBLIC_LOAD)
+        .execution_options(populate_existing=True)
+    )
+    result = await session.scalars(stmt)
+    return result.all()
+
+
 async def get_by_identifier(
     session: AsyncSession, identifier: str, exclude_id: UUID = None
 ) -> Optional[Document]:
@@ -44,6 +73,7 @@ async def list_all(
         .join(last_history, true())
         .where(Document.deleted_at.is_(None))
         .order_by(last_history.status.asc(), last_history.created_at.asc())
+        .options(*PUBLIC_LOAD)
     )
 
     if filters.unit_id:
@@ -3,21 +3,8 @@ from uuid import UUID
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from iaEditais.models import Document, DocumentHistory, User
-
-
-async def get_with_editors(
-    session: AsyncSession, doc_id: UUID
-) -> Optional[Document]:
-    stmt = (
-        select(Document)
-        .options(selectinload(Document.editors))
-        .where(Document.id == doc_id)
-    )
-    result = await session.execute(stmt)
-    return result.scalar_one_or_none()
+from iaEditais.models import DocumentHistory, User
 
 
 async def get_user(session: AsyncSession, user_id: UUID) -> Optional[User]:
@@ -1,11 +1,12 @@
 from typing import Optional
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from iaEditais.models import (
+    AppliedBranch,
     AppliedTaxonomy,
     AppliedTypification,
     Branch,
@@ -33,12 +34,32 @@ async def get_release_with_details(
     return result.scalar_one_or_none()
 
 
-async def get_full_branch(
-    session: AsyncSession, branch_id: UUID
-) -> Optional[Branch]:
+async def get_previous_release(
+    session: AsyncSession, db_release: DocumentRelease
+) -> Optional[DocumentRelease]:
+    stmt = (
+        select(DocumentRelease)
+        .join(DocumentHistory)
+        .where(
+            DocumentHistory.document_id == db_release.history.document_id,
+            DocumentRelease.id != db_release.id,
+            DocumentRelease.created_at < db_release.created_at,
+            DocumentRelease.deleted_at.is_(None),
+        )
+        .order_by(DocumentRelease.created_at.desc())
+        .limit(1)
+    )
+    return await session.scalar(stmt)
+
+
+async def get_full_branches(
+    session: AsyncSession, branch_ids: list[UUID]
+) -> list[Branch]:
+    if not branch_ids:
+        return []
     stmt = (
         select(Branch)
-        .where(Branch.id == branch_id)
+        .where(Branch.id.in_(branch_ids))
         .options(
             selectinload(Branch.taxonomy).selectinload(Taxonomy.sources),
             selectinload(Branch.taxonomy)
@@ -46,31 +67,58 @@ async def get_full_branch(
             .selectinload(Typification.sources),
         )
     )
-    return await session.scalar(stmt)
+    result = await session.scalars(stmt)
+    return result.all()
+
+
+async def get_applied_typification_ids(
+    session: AsyncSession, release_id: UUID
+) -> dict[UUID, UUID]:
+    stmt = select(
+        AppliedTypification.original_id, AppliedTypification.id
+    ).where(AppliedTypification.applied_release_id == release_id)
+    result = await session.execute(stmt)
+    return dict(result.all())
 
 
-async def get_applied_typification(
-    session: AsyncSession, original_id: UUID, release_id: UUID
-) -> Optional[AppliedTypification]:
-    stmt = select(AppliedTypification).where(
-        AppliedTypification.original_id == original_id,
-        AppliedTypification.applied_release_id == release_id,
+async def get_applied_taxonomy_ids(
+    session: AsyncSession, release_id: UUID
+) -> dict[tuple[UUID, UUID], UUID]:
+    stmt = (
+        select(
+            AppliedTaxonomy.applied_typification_id,
+            AppliedTaxonomy.original_id,
+            AppliedTaxonomy.id,
+        )
+        .join(AppliedTypification)
+        .where(AppliedTypification.applied_release_id == release_id)
     )
-    return await session.scalar(stmt)
+    result = await session.execute(stmt)
+    return {(typ_id, original_id): id for typ_id, original_id, id in result}
 
 
-async def get_applied_taxonomy(
-    session: AsyncSession, original_id: UUID, typification_id: UUID
-) -> Optional[AppliedTaxonomy]:
-    stmt = select(AppliedTaxonomy).where(
-        AppliedTaxonomy.original_id == original_id,
-        AppliedTaxonomy.applied_typification_id == typification_id,
+async def get_branch_mappings(
+    session: AsyncSession, release_id: UUID
+) -> list[str]:
+    stmt = (
+        select(AppliedBranch.presidio_mapping)
+        .join(AppliedTaxonomy)
+        .join(AppliedTypification)
+        .where(
+            AppliedTypification.applied_release_id == release_id,
+            AppliedBranch.presidio_mapping.is_not(None),
+        )
+        .distinct()
     )
-    return await session.scalar(stmt)
+    result = await session.scalars(stmt)
+    return result.all()
 
 
-def add_applied_entity(session: AsyncSession, entity) -> None:
-    session.add(entity)
+async def bulk_insert(
+    session: AsyncSession, model: type, rows: list[dict]
+) -> None:
+    if rows:
+        await session.execute(insert(model), rows)
 
 
 def add_document(session: AsyncSession, doc: Document) -> None:
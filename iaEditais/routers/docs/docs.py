@@ -3,8 +3,11 @@ from typing import Annotated
 from uuid import UUID
 
 from fastapi import APIRouter, Depends
+from redis.asyncio import Redis
 
+from iaEditais.core.cache import get_redis
 from iaEditais.core.dependencies import CurrentUser, Session
+from iaEditais.core.release_cache import ReleaseTreeCache
 from iaEditais.schemas import (
     DocumentCreate,
     DocumentFilter,
@@ -58,7 +61,11 @@ async def toggle_archive(
     status_code=HTTPStatus.NO_CONTENT,
 )
 async def delete_doc(
-    doc_id: UUID, session: Session, current_user: CurrentUser
+    doc_id: UUID,
+    session: Session,
+    current_user: CurrentUser,
+    redis: Redis = Depends(get_redis),
 ):
     await doc_service.delete_doc(session, current_user, doc_id)
+    await ReleaseTreeCache(redis).invalidate_document(doc_id)
     return {'message': 'Doc deleted successfully'}
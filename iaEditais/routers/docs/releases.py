@@ -1,26 +1,31 @@
+import logging
+import os
 from http import HTTPStatus
-from uuid import UUID, uuid4
+from uuid import UUID
 
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     File,
     HTTPException,
+    Response,
     UploadFile,
 )
 from fastapi.responses import FileResponse
-from redis import Redis
-from sqlalchemy import select
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
 
 from iaEditais.core.cache import get_redis
 from iaEditais.core.dependencies import (
     CurrentUser,
-    Model,
+    Queue,
     Session,
     Storage,
-    VStore,
 )
+from iaEditais.core.job_queue import JobQueue
+from iaEditais.core.release_cache import ReleaseTreeCache
 from iaEditais.core.settings import Settings
 from iaEditais.models import (
     Document,
@@ -30,20 +35,50 @@ from iaEditais.models import (
 from iaEditais.schemas import (
     DocumentReleaseList,
     DocumentReleasePublic,
+    ReleasePipelineStage,
 )
 from iaEditais.schemas.document import DocumentProcessingStatus
-from iaEditais.services import audit_service, report_service
-from iaEditais.workers.docs.releases import release_pipeline
+from iaEditais.services import (
+    audit_service,
+    deanonymization_service,
+    report_service,
+)
 
 SETTINGS = Settings()
 BROKER_URL = SETTINGS.BROKER_URL
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix='/doc/{doc_id}/release',
     tags=['verificação dos documentos, versões'],
 )
 
 
+async def _enqueue_release(
+    session: Session, queue: JobQueue, doc_id: UUID, release_id: UUID
+) -> None:
+    # O status QUEUED já foi gravado; se a fila falhar o documento volta
+    # para FAILED, senão ficaria preso sem job e sem como retomar
+    try:
+        await queue.enqueue({'release_id': str(release_id)})
+    except RedisError as e:
+        logger.error('Release %s not enqueued: %s', release_id, e)
+        await session.execute(
+            update(Document)
+            .where(
+                Document.id == doc_id,
+                Document.processing_status == DocumentProcessingStatus.QUEUED,
+            )
+            .values(processing_status=DocumentProcessingStatus.FAILED)
+        )
+        await session.commit()
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Release queue unavailable, resume it later.',
+        )
+
+
 @router.post(
     '',
     status_code=HTTPStatus.CREATED,
@@ -54,14 +89,16 @@ async def create_release(
     session: Session,
     current_user: CurrentUser,
     storage: Storage,
-    background_tasks: BackgroundTasks,
-    model: Model,
-    vstore: VStore,
-    redis: Redis = Depends(get_redis),
+    queue: Queue,
     file: UploadFile = File(...),
 ):
     result = await session.execute(
-        select(Document).where(Document.id == doc_id)
+        select(Document)
+        .where(Document.id == doc_id)
+        .options(
+            selectinload(Document.history),
+            selectinload(Document.typifications),
+        )
     )
     db_doc = result.scalar_one_or_none()
     if not db_doc or db_doc.deleted_at:
@@ -76,13 +113,16 @@ async def create_release(
             detail='The document sent has integrity issues.',
         )
     latest_history = db_doc.history[0]
-    unique_filename = f'{uuid4()}_{file.filename}'
-    file_path = await storage.save(file, unique_filename)
+    stored = await storage.store_by_content(
+        file, os.path.splitext(file.filename or '')[1]
+    )
+    file_path = stored.url
 
     db_release = DocumentRelease(
         history_id=latest_history.id,
         file_path=file_path,
         created_by=current_user.id,
+        original_filename=file.filename,
     )
 
     session.add(db_release)
@@ -102,18 +142,72 @@ async def create_release(
 
     await session.commit()
 
-    background_tasks.add_task(
-        release_pipeline,
-        release_id=db_release.id,
-        session=session,
-        model=model,
-        vstore=vstore,
-        redis=redis,
-    )
+    await _enqueue_release(session, queue, doc_id, db_release.id)
 
     return db_release
 
 
+@router.post(
+    '/{release_id}/resume',
+    status_code=HTTPStatus.ACCEPTED,
+    response_model=DocumentReleasePublic,
+)
+async def resume_release(
+    doc_id: UUID,
+    release_id: UUID,
+    session: Session,
+    current_user: CurrentUser,
+    queue: Queue,
+):
+    query = (
+        select(DocumentRelease)
+        .join(DocumentHistory)
+        .where(
+            DocumentRelease.id == release_id,
+            DocumentHistory.document_id == doc_id,
+            DocumentRelease.deleted_at.is_(None),
+        )
+    )
+    db_release = await session.scalar(query)
+
+    if not db_release:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='File not found or does not belong to this document.',
+        )
+
+    if db_release.pipeline_stage == ReleasePipelineStage.COMPLETED:
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT,
+            detail='Release already processed.',
+        )
+
+    # O pipeline retoma da última etapa concluída (pipeline_stage). A
+    # troca de status é condicional para que dois pedidos simultâneos não
+    # enfileirem a mesma release duas vezes
+    claimed = await session.execute(
+        update(Document)
+        .where(
+            Document.id == doc_id,
+            Document.processing_status.in_([
+                DocumentProcessingStatus.FAILED,
+                DocumentProcessingStatus.IDLE,
+            ]),
+        )
+        .values(processing_status=DocumentProcessingStatus.QUEUED)
+    )
+    if not claimed.rowcount:
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT,
+            detail='Release is already queued or processing.',
+        )
+    await session.commit()
+
+    await _enqueue_release(session, queue, doc_id, db_release.id)
+
+    return deanonymization_service.release_to_public(db_release)
+
+
 @router.get('', response_model=DocumentReleaseList)
 async def read_releases(doc_id: UUID, session: Session):
     query = (
@@ -128,7 +222,63 @@ async def read_releases(doc_id: UUID, session: Session):
 
     result = await session.scalars(query)
     releases = result.all()
-    return {'releases': releases}
+    return {
+        'releases': [
+            deanonymization_service.release_to_public(release)
+            for release in releases
+        ]
+    }
+
+
+@router.get('/{release_id}', response_model=DocumentReleasePublic)
+async def read_release(
+    doc_id: UUID,
+    release_id: UUID,
+    session: Session,
+    redis: Redis = Depends(get_redis),
+):
+    # A árvore completa fica fora dos eventos do websocket; releases
+    # concluídas são servidas do cache. O cache guarda a árvore ainda
+    # anonimizada e os dados reais só são restaurados na resposta
+    cache = ReleaseTreeCache(redis, SETTINGS.RELEASE_TREE_CACHE_TTL)
+    cached = await cache.get(doc_id, release_id)
+    if cached is not None:
+        release_public = DocumentReleasePublic.model_validate_json(cached)
+        deanonymizer = await deanonymization_service.load_release_deanonymizer(
+            session, release_id
+        )
+    else:
+        query = (
+            select(DocumentRelease)
+            .join(DocumentHistory)
+            .where(
+                DocumentRelease.id == release_id,
+                DocumentHistory.document_id == doc_id,
+                DocumentRelease.deleted_at.is_(None),
+            )
+        )
+        db_release = await session.scalar(query)
+
+        if not db_release:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='File not found or does not belong to this document.',
+            )
+
+        release_public = DocumentReleasePublic.model_validate(db_release)
+        if db_release.pipeline_stage == ReleasePipelineStage.COMPLETED:
+            await cache.set(
+                doc_id, release_id, release_public.model_dump_json()
+            )
+        deanonymizer = deanonymization_service.get_release_deanonymizer(
+            db_release
+        )
+
+    deanonymization_service.deanonymize_public(release_public, deanonymizer)
+    return Response(
+        content=release_public.model_dump_json(),
+        media_type='application/json',
+    )
 
 
 @router.delete('/{release_id}', status_code=HTTPStatus.NO_CONTENT)
@@ -137,6 +287,7 @@ async def delete_release(
     release_id: UUID,
     session: Session,
     current_user: CurrentUser,
+    redis: Redis = Depends(get_redis),
 ):
     query = (
         select(DocumentRelease)
@@ -171,6 +322,7 @@ async def delete_release(
     )
 
     await session.commit()
+    await ReleaseTreeCache(redis).invalidate(doc_id, release_id)
 
     return {'message': 'File deleted successfully'}
 
@@ -1,20 +1,76 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from pydantic import ValidationError
 
-from iaEditais.core.cache import WebSocketManager, get_socket_manager
-from iaEditais.schemas import WSMessage
+from iaEditais.core.cache import (
+    WebSocketManager,
+    get_socket_manager,
+    parse_topic,
+    topic_channel,
+)
+from iaEditais.core.ws_events import supported_encodings
+from iaEditais.schemas import WSCommand, WSMessage
 
 router = APIRouter(prefix='/ws', tags=['websockets'])
 
+MAX_BATCH_MS = 1000
 
-@router.websocket('/{subscriber_id}')
-async def websocket_endpoint(
+
+async def _handle_command(
+    socket_manager: WebSocketManager,
     websocket: WebSocket,
     subscriber_id: UUID,
-    socket_manager: WebSocketManager = Depends(get_socket_manager),
-):
-    channel_id = 'ws:broadcast'
+    data: str,
+) -> WSMessage:
+    try:
+        command = WSCommand.model_validate_json(data)
+        kind, topic_id = parse_topic(command.topic)
+    except (ValidationError, ValueError) as e:
+        return WSMessage(event='ws.error', message=str(e), payload={})
+
+    # Cada usuário só recebe as próprias notificações
+    if kind == 'user' and topic_id != subscriber_id:
+        return WSMessage(
+            event='ws.error',
+            message=f'Not allowed to subscribe to {command.topic}',
+            payload={'topic': command.topic},
+        )
+
+    channel_id = topic_channel(kind, topic_id)
+    payload = {'topic': command.topic}
+    if command.action == 'unsubscribe':
+        await socket_manager.remove_user_from_channel(channel_id, websocket)
+    elif command.last_event_id:
+        # Reconexão: os eventos perdidos chegam antes da confirmação; sem
+        # `complete`, o cliente deve recarregar o estado pela API
+        replayed, complete = await socket_manager.resume_channel(
+            channel_id, websocket, command.last_event_id
+        )
+        payload |= {'replayed': replayed, 'complete': complete}
+    else:
+        await socket_manager.add_user_to_channel(channel_id, websocket)
+    return WSMessage(
+        event=f'ws.{command.action}d',
+        message=command.topic,
+        payload=payload,
+    )
+
+
+async def _serve(
+    socket_manager: WebSocketManager,
+    websocket: WebSocket,
+    subscriber_id: UUID,
+) -> None:
+    # O cliente recebe só os tópicos que assinar ('doc:<id>', 'unit:<id>')
+    # além do próprio canal de usuário
+    channel_id = topic_channel('user', subscriber_id)
     await socket_manager.add_user_to_channel(channel_id, websocket)
 
     message = WSMessage(
@@ -26,20 +82,38 @@ async def websocket_endpoint(
         channel_id, message.model_dump_json()
     )
 
+    while True:
+        data = await websocket.receive_text()
+        reply = await _handle_command(
+            socket_manager, websocket, subscriber_id, data
+        )
+        socket_manager.send(websocket, reply.model_dump_json())
+
+
+@router.websocket('/{subscriber_id}')
+async def websocket_endpoint(
+    websocket: WebSocket,
+    subscriber_id: UUID,
+    socket_manager: WebSocketManager = Depends(get_socket_manager),
+    batch_ms: int = Query(0, ge=0, le=MAX_BATCH_MS),
+):
+    # Subprotocolo 'msgpack' para quadros binários; `batch_ms` agrupa os
+    # eventos de cada janela num só quadro
+    subprotocol = next(
+        (
+            protocol
+            for protocol in websocket.scope.get('subprotocols', [])
+            if protocol in supported_encodings()
+        ),
+        None,
+    )
+    await socket_manager.connect(websocket, batch_ms / 1000, subprotocol)
+
+    # A fila de envio vive enquanto o endpoint roda, mesmo sem canais; a
+    # limpeza acontece em qualquer saída, não só na desconexão do cliente
     try:
-        while True:
-            data = await websocket.receive_text()
-            message = WSMessage(event='user.connect', message=data, payload={})
-            await socket_manager.broadcast_to_channel(
-                channel_id, message.model_dump_json()
-            )
+        await _serve(socket_manager, websocket, subscriber_id)
     except WebSocketDisconnect:
-        await socket_manager.remove_user_from_channel(channel_id, websocket)
-        message = WSMessage(
-            event='user.disconnect',
-            message=f'User {subscriber_id} disconnected to channel - {channel_id}',
-            payload={},
-        )
-        await socket_manager.broadcast_to_channel(
-            channel_id, message.model_dump_json()
-        )
+        pass
+    finally:
+        await socket_manager.disconnect(websocket)
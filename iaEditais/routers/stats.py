@@ -1,10 +1,14 @@
 from typing import List
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel
+from redis.asyncio import Redis
 from sqlalchemy import desc, func, join, select
 
+from iaEditais.core.cache import get_redis
 from iaEditais.core.dependencies import Session
+from iaEditais.core.embedding_cache import get_cache_stats
+from iaEditais.core.llm_limiter import get_limiter_stats
 from iaEditais.models import (
     AppliedTypification,
     Document,
@@ -58,6 +62,23 @@ class UserMessageActivityList(BaseModel):
     stats: List[UserMessageActivity]
 
 
+class EmbeddingCacheStats(BaseModel):
+    """Contadores do cache de embeddings."""
+
+    hits: int
+    misses: int
+    hit_rate: float
+
+
+class LLMLimiterStats(BaseModel):
+    """Estado do limitador de chamadas ao modelo, somado entre processos."""
+
+    in_flight: int
+    queued: int
+    concurrency_limit: int
+    processes: int
+
+
 router = APIRouter(
     prefix='/stats', tags=['operações de sistema, estatísticas']
 )
@@ -196,3 +217,29 @@ async def get_user_message_activity(session: Session):
     stats = result.mappings().all()
 
     return {'stats': stats}
+
+
+@router.get(
+    '/embedding-cache',
+    response_model=EmbeddingCacheStats,
+    summary='Acertos e falhas do cache de embeddings',
+)
+async def get_embedding_cache_stats(redis: Redis = Depends(get_redis)):
+    """
+    Retorna os contadores acumulados (entre todos os workers) do cache de
+    embeddings usado na vetorização dos documentos.
+    """
+    return await get_cache_stats(redis)
+
+
+@router.get(
+    '/llm-limiter',
+    response_model=LLMLimiterStats,
+    summary='Chamadas ao modelo em andamento e na fila',
+)
+async def get_llm_limiter_stats(redis: Redis = Depends(get_redis)):
+    """
+    Retorna as chamadas ao modelo em andamento e aguardando vaga, e o
+    limite de concorrência atual, somados entre os workers ativos.
+    """
+    return await get_limiter_stats(redis)
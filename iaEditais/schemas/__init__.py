@@ -19,7 +19,7 @@ from .bundle import (
     BundleSchema,
     BundleUpdate,
 )
-from .common import FilterPage, Message, Token, WSMessage
+from .common import FilterPage, Message, Token, WSCommand, WSMessage
 from .document import (
     DocumentCreate,
     DocumentFilter,
@@ -49,6 +49,9 @@ from .document_release import (
     DocumentReleaseFeedback,
     DocumentReleaseList,
     DocumentReleasePublic,
+    DocumentReleaseStatus,
+    ReleaseBranchEvaluated,
+    ReleasePipelineStage,
 )
 from .source import (
     SourceCreate,
@@ -112,6 +115,7 @@ __all__ = [
     'FilterPage',
     'Message',
     'Token',
+    'WSCommand',
     'WSMessage',
     'DocumentCreate',
     'DocumentFilter',
@@ -130,6 +134,9 @@ __all__ = [
     'DocumentReleaseFeedback',
     'DocumentReleaseList',
     'DocumentReleasePublic',
+    'DocumentReleaseStatus',
+    'ReleaseBranchEvaluated',
+    'ReleasePipelineStage',
     'SourceCreate',
     'SourceList',
     'SourcePublic',
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -21,3 +21,13 @@ class WSMessage(BaseModel):
     event: str
     message: str
     payload: Optional[dict]
+    # Preenchidos para eventos guardados no stream de replay do tópico
+    id: Optional[str] = None
+    topic: Optional[str] = None
+
+
+class WSCommand(BaseModel):
+    action: Literal['subscribe', 'unsubscribe']
+    topic: str
+    # Retoma o tópico a partir do último evento recebido
+    last_event_id: Optional[str] = Field(None, pattern=r'^\d+-\d+$')
@@ -1,4 +1,5 @@
 from datetime import datetime
+from enum import Enum
 from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict, Field
@@ -9,6 +10,14 @@ from iaEditais.schemas.taxonomy import TaxonomySchema
 from iaEditais.schemas.typification import TypificationSchema
 
 
+class ReleasePipelineStage(str, Enum):
+    VECTORIZED = 'VECTORIZED'
+    RETRIEVED = 'RETRIEVED'
+    EVALUATED = 'EVALUATED'
+    SAVED = 'SAVED'
+    COMPLETED = 'COMPLETED'
+
+
 class DocumentReleaseFeedback(BaseModel):
     feedback: str = Field(
         description=(
@@ -32,6 +41,27 @@ class DocumentReleaseFeedback(BaseModel):
     )
 
 
+class ReleaseBranchEvaluated(BaseModel):
+    release_id: UUID
+    document_id: UUID
+    branch_id: UUID
+    score: int
+    fulfilled: bool
+    evaluated: int
+    total: int
+
+
+class DocumentReleaseStatus(BaseModel):
+    id: UUID
+    document_id: UUID
+    status: str
+    pipeline_stage: ReleasePipelineStage | None = None
+    branches_total: int = 0
+    branches_evaluated: int = 0
+    created_at: datetime
+    emitted_at: datetime
+
+
 class DocumentReleaseFeedbackPublic(DocumentReleaseFeedback):
     score: int = Field(...)
 
@@ -39,6 +69,8 @@ class DocumentReleaseFeedbackPublic(DocumentReleaseFeedback):
 class AppliedBranchPublic(BranchSchema):
     id: UUID
     evaluation: DocumentReleaseFeedbackPublic
+    cache_hit: bool = False
+    prompt_tokens: int | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -62,7 +94,9 @@ class AppliedTypificationPublic(TypificationSchema):
 class DocumentReleasePublic(BaseModel):
     id: UUID
     file_path: str
+    original_filename: str | None = None
     description: str | None
+    pipeline_stage: ReleasePipelineStage | None = None
     check_tree: list[AppliedTypificationPublic]
 
     created_at: datetime
@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
+
+from langchain_core.documents import Document
+from presidio_anonymizer.entities import RecognizerResult
+
+from iaEditais.core.settings import Settings
+from iaEditais.utils import PresidioAnonymizer as presidio
+
+SETTINGS = Settings()
+
+EntitySpan = tuple[str, int, int, float]
+
+
+def _warm_up(engine: str) -> None:
+    presidio.get_batch_analyzer(engine)
+
+
+def _analyze_texts(texts: List[str], engine: str) -> List[List[EntitySpan]]:
+    # Executado nos workers do pool (ou numa thread): só tipos simples
+    # atravessam a fronteira do processo
+    return [
+        [(r.entity_type, r.start, r.end, r.score) for r in results]
+        for results in presidio.analyze_texts(texts, engine=engine)
+    ]
+
+
+@lru_cache
+def get_executor() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=SETTINGS.ANONYMIZER_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_warm_up,
+        initargs=(SETTINGS.ANONYMIZER_ENGINE,),
+    )
+
+
+def shutdown() -> None:
+    if get_executor.cache_info().currsize:
+        get_executor().shutdown(wait=False, cancel_futures=True)
+        get_executor.cache_clear()
+
+
+def _split(texts: List[str], parts: int) -> List[List[str]]:
+    size = max(1, -(-len(texts) // parts))
+    return [texts[i : i + size] for i in range(0, len(texts), size)]
+
+
+async def analyze_texts(texts: List[str]) -> List[List[EntitySpan]]:
+    engine = SETTINGS.ANONYMIZER_ENGINE
+    if SETTINGS.ANONYMIZER_BACKEND == 'THREAD':
+        return await asyncio.to_thread(_analyze_texts, texts, engine)
+
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    batches = await asyncio.gather(*[
+        loop.run_in_executor(executor, _analyze_texts, batch, engine)
+        for batch in _split(texts, SETTINGS.ANONYMIZER_WORKERS)
+    ])
+    return [results for batch in batches for results in batch]
+
+
+async def anonymize_chunks(
+    chunks: List[Document], existing_mapping: Optional[dict] = None
+) -> List[Document]:
+    if not chunks:
+        return chunks
+
+    spans = await analyze_texts([chunk.page_content for chunk in chunks])
+    analyzer_results = [
+        [RecognizerResult(*span) for span in chunk_spans]
+        for chunk_spans in spans
+    ]
+
+    # A substituição é barata e sequencial, na ordem dos chunks, para que o
+    # existing_presidio_mapping continue consistente entre eles
+    anonymizer = presidio.PresidioAnonymizer()
+    if existing_mapping:
+        anonymizer.existing_presidio_mapping = existing_mapping
+    return await asyncio.to_thread(
+        anonymizer.anonymize_chunks,
+        chunks,
+        analyzer_results=analyzer_results,
+    )
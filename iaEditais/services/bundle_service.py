@@ -318,7 +318,8 @@ async def generate_docs_from_bundle(
 
     await session.commit()
 
-    for doc in created_docs:
-        await session.refresh(doc)
-
-    return created_docs
+    # Uma única consulta recarrega todos os documentos gerados, na ordem
+    # dos documentos do pacote
+    ids = [doc.id for doc in created_docs]
+    loaded = {doc.id: doc for doc in await doc_repo.get_by_ids(session, ids)}
+    return [loaded[doc_id] for doc_id in ids]
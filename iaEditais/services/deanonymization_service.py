@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from iaEditais.models import DocumentRelease
+from iaEditais.repositories import release_repo
+from iaEditais.schemas.document_release import (
+    DocumentReleasePublic,
+    ReleasePipelineStage,
+)
+from iaEditais.utils.PresidioDeanonymizer import (
+    PresidioDeanonymizer,
+    parse_mapping,
+)
+
+DEANONYMIZER_CACHE_SIZE = 128
+
+_deanonymizers: OrderedDict[tuple[UUID, str], PresidioDeanonymizer] = (
+    OrderedDict()
+)
+
+
+def _build_deanonymizer(raw_mappings: Iterable[str]) -> PresidioDeanonymizer:
+    # Os placeholders são únicos dentro de uma release, então os mapeamentos
+    # de todos os ramos formam um só dicionário
+    deanonymizer = PresidioDeanonymizer()
+    for raw in dict.fromkeys(raw_mappings):
+        deanonymizer.add_mapping(parse_mapping(raw))
+    return deanonymizer
+
+
+def _cache_get(key: tuple[UUID, str]) -> Optional[PresidioDeanonymizer]:
+    deanonymizer = _deanonymizers.get(key)
+    if deanonymizer is not None:
+        _deanonymizers.move_to_end(key)
+    return deanonymizer
+
+
+def _cache_put(
+    key: tuple[UUID, str], deanonymizer: PresidioDeanonymizer
+) -> None:
+    _deanonymizers[key] = deanonymizer
+    if len(_deanonymizers) > DEANONYMIZER_CACHE_SIZE:
+        _deanonymizers.popitem(last=False)
+
+
+def get_release_deanonymizer(
+    db_release: DocumentRelease,
+) -> PresidioDeanonymizer:
+    raw_mappings = (
+        branch.presidio_mapping
+        for typification in db_release.check_tree
+        for taxonomy in typification.taxonomies
+        for branch in taxonomy.branches
+        if branch.presidio_mapping
+    )
+    # Só a árvore de uma release concluída não muda mais; ela é montada uma
+    # vez e reusada, com a chave (id, etapa) em vez dos mapeamentos
+    if db_release.pipeline_stage != ReleasePipelineStage.COMPLETED:
+        return _build_deanonymizer(raw_mappings)
+
+    key = (db_release.id, db_release.pipeline_stage)
+    deanonymizer = _cache_get(key)
+    if deanonymizer is None:
+        deanonymizer = _build_deanonymizer(raw_mappings)
+        _cache_put(key, deanonymizer)
+    return deanonymizer
+
+
+async def load_release_deanonymizer(
+    session: AsyncSession, release_id: UUID
+) -> PresidioDeanonymizer:
+    # Para a árvore servida do cache: só os mapeamentos vêm do banco
+    key = (release_id, ReleasePipelineStage.COMPLETED.value)
+    deanonymizer = _cache_get(key)
+    if deanonymizer is None:
+        deanonymizer = _build_deanonymizer(
+            await release_repo.get_branch_mappings(session, release_id)
+        )
+        _cache_put(key, deanonymizer)
+    return deanonymizer
+
+
+def deanonymize_public(
+    release_public: DocumentReleasePublic,
+    deanonymizer: PresidioDeanonymizer,
+) -> DocumentReleasePublic:
+    if not deanonymizer.placeholders:
+        return release_public
+
+    release_public.description = deanonymizer.deanonymize(
+        release_public.description
+    )
+    for typification in release_public.check_tree:
+        for taxonomy in typification.taxonomies:
+            for branch in taxonomy.branches:
+                branch.evaluation.feedback = deanonymizer.deanonymize(
+                    branch.evaluation.feedback
+                )
+    return release_public
+
+
+def release_to_public(db_release: DocumentRelease) -> DocumentReleasePublic:
+    return deanonymize_public(
+        DocumentReleasePublic.model_validate(db_release),
+        get_release_deanonymizer(db_release),
+    )
@@ -71,8 +71,7 @@ async def create_doc(
     )
 
     await session.commit()
-    await session.refresh(db_doc)
-    return db_doc
+    return await doc_repo.get_by_id(session, db_doc.id)
 
 
 async def get_docs(
@@ -143,8 +142,7 @@ async def update_doc(
     )
 
     await session.commit()
-    await session.refresh(db_doc)
-    return db_doc
+    return await doc_repo.get_by_id(session, db_doc.id)
 
 
 async def toggle_archive(
@@ -169,8 +167,7 @@ async def toggle_archive(
     )
 
     await session.commit()
-    await session.refresh(db_doc)
-    return db_doc
+    return await doc_repo.get_by_id(session, db_doc.id)
 
 
 async def delete_doc(
@@ -6,7 +6,7 @@ from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from iaEditais.models import Document, DocumentHistory, User
-from iaEditais.repositories import kanban_repo
+from iaEditais.repositories import doc_repo, kanban_repo
 from iaEditais.schemas import DocumentPublic, DocumentStatus
 from iaEditais.schemas.document_history import DocumentHistoryPublic
 from iaEditais.services import audit_service
@@ -111,7 +111,7 @@ async def update_document_status(
     doc_id: UUID,
     new_status: DocumentStatus,
 ) -> Document:
-    doc = await kanban_repo.get_with_editors(session, doc_id)
+    doc = await doc_repo.get_by_id(session, doc_id)
     if not doc or doc.deleted_at:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Document not found'
@@ -151,7 +151,7 @@ async def update_document_status(
     )
 
     await session.commit()
-    await session.refresh(doc)
+    doc = await doc_repo.get_by_id(session, doc.id)
 
     await _publish_notification(session, target_user_ids, doc.name, new_status)
 
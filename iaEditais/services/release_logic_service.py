@@ -1,15 +1,48 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import re
+from typing import Awaitable, Callable, Optional
+
+from langchain_core.documents import Document
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables.base import RunnableLambda
 
 from iaEditais import prompts as PROMPTS
 from iaEditais.core.dependencies import Model, VStore
+from iaEditais.core.settings import Settings
+from iaEditais.core.tokenizer import count_tokens, truncate_tokens
 from iaEditais.models import DocumentRelease, Typification
+from iaEditais.repositories import chunk_repo
 from iaEditais.schemas import DocumentReleaseFeedback
 from iaEditais.schemas.typification import TypificationList
 
+SETTINGS = Settings()
+
 MAX_CHUNKS = 3
 MARGIN_SIZE = 2
+MAX_CONCURRENT_SEARCHES = 8
+
+# Muda sempre que o prompt de análise ou o schema da resposta mudam,
+# invalidando as avaliações guardadas no cache
+PROMPT_VERSION = hashlib.sha256(
+    (
+        PROMPTS.DOCUMENT_ANALYSIS_PROMPT
+        + json.dumps(DocumentReleaseFeedback.model_json_schema())
+    ).encode('utf-8')
+).hexdigest()[:16]
+
+# Chamado com cada ramo avaliado com sucesso, assim que a resposta chega
+OnResult = Callable[[dict], Awaitable[None]]
+
+FORMAT_INSTRUCTIONS = JsonOutputParser(
+    pydantic_object=DocumentReleaseFeedback
+).get_format_instructions()
+
+logger = logging.getLogger(__name__)
 
 # --- Funções de Iteração e Filtros ---
 
@@ -38,45 +71,99 @@ def iter_branches(taxonomy: dict):
 # --- Funções de Busca Vetorial ---
 
 
+def _branch_window_keys(branch: dict) -> set[chunk_repo.ChunkKey]:
+    keys = set()
+    for chunk in branch.get('sessions') or []:
+        source = chunk.metadata.get('source')
+        current_idx = chunk.metadata.get('chunk_index')
+        if source is None or current_idx is None:
+            continue
+
+        start = max(0, current_idx - MARGIN_SIZE)
+        end = current_idx + MARGIN_SIZE + 1
+        for i in range(start, end):
+            keys.add((source, i))
+    return keys
+
+
 async def expand_branch_sessions(vstore: VStore, eval_args: dict):
+    branch_keys = []
     for typification in iter_typifications(eval_args):
         for taxonomy in iter_taxonomies(typification):
             for branch in iter_branches(taxonomy):
-                original_chunks = branch.get('sessions', [])
-                if not original_chunks:
-                    continue
-
-                docs_indices_map = {}
-                for chunk in original_chunks:
-                    source = chunk.metadata.get('source')
-                    current_idx = chunk.metadata.get('chunk_index')
-                    if source is None or current_idx is None:
-                        continue
-                    if source not in docs_indices_map:
-                        docs_indices_map[source] = set()
-
-                    start = max(0, current_idx - MARGIN_SIZE)
-                    end = current_idx + MARGIN_SIZE + 1
-                    for i in range(start, end):
-                        docs_indices_map[source].add(i)
-
-                expanded_chunks = []
-                for source, indices_set in docs_indices_map.items():
-                    indices_list = list(indices_set)
-                    filter_dict = {
-                        'source': source,
-                        'chunk_index': {'$in': indices_list},
+                keys = _branch_window_keys(branch)
+                if keys:
+                    # Guarda quais chunks vieram da busca, antes da expansão
+                    branch['hit_keys'] = {
+                        _chunk_key(chunk) for chunk in branch['sessions']
                     }
-                    found_chunks = await vstore.asimilarity_search(
-                        '', k=len(indices_list), filter=filter_dict
-                    )
-                    expanded_chunks.extend(found_chunks)
+                    branch_keys.append((branch, keys))
+
+    all_keys = set().union(*(keys for _, keys in branch_keys))
+    chunks_by_key = await chunk_repo.get_chunks_by_keys(vstore, all_keys)
+
+    # Ramos com janelas sobrepostas compartilham os mesmos objetos Document
+    for branch, keys in branch_keys:
+        expanded_chunks = [
+            chunks_by_key[key] for key in keys if key in chunks_by_key
+        ]
+        if expanded_chunks:
+            expanded_chunks.sort(
+                key=lambda x: x.metadata.get('chunk_index', 0)
+            )
+            branch['sessions'] = expanded_chunks
+
+
+def _build_branch_query(taxonomy: dict, branch: dict) -> str:
+    t_title = (taxonomy.get('title') or '').strip()
+    b_title = (branch.get('title') or '').strip()
+    b_desc = (branch.get('description') or '').strip()
+    query_text = f'{b_title}: {b_desc}'
+    return PROMPTS.QUERY.format(section=t_title, query=query_text)
+
+
+def iter_branch_queries(eval_args: dict):
+    for typification in iter_typifications(eval_args):
+        for taxonomy in iter_taxonomies(typification):
+            for branch in iter_branches(taxonomy):
+                yield branch, _build_branch_query(taxonomy, branch)
+
+
+async def _get_branch_sessions_sequential(
+    vstore: VStore,
+    branch_queries: list[tuple[dict, str]],
+    base_filter: dict,
+    max_chunks: int,
+):
+    for branch, query in branch_queries:
+        chunks = await vstore.asimilarity_search(
+            query, k=max_chunks, filter=base_filter
+        )
+        branch['sessions'] = chunks
+
+
+async def _get_branch_sessions_batched(
+    vstore: VStore,
+    branch_queries: list[tuple[dict, str]],
+    base_filter: dict,
+    max_chunks: int,
+):
+    # Um único round trip de embeddings para todas as queries da árvore
+    queries = [query for _, query in branch_queries]
+    embeddings = await vstore.embeddings.aembed_documents(queries)
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
 
-                if expanded_chunks:
-                    expanded_chunks.sort(
-                        key=lambda x: x.metadata.get('chunk_index', 0)
-                    )
-                    branch['sessions'] = expanded_chunks
+    async def _search(branch: dict, embedding: list[float]):
+        async with semaphore:
+            branch['sessions'] = await vstore.asimilarity_search_by_vector(
+                embedding, k=max_chunks, filter=base_filter
+            )
+
+    await asyncio.gather(*[
+        _search(branch, embedding)
+        for (branch, _), embedding in zip(branch_queries, embeddings)
+    ])
 
 
 async def get_branch_sessions(
@@ -84,21 +171,21 @@ async def get_branch_sessions(
     eval_args: dict,
     base_filter: dict,
     max_chunks: int = MAX_CHUNKS,
+    batched: bool = True,
 ):
-    for typification in iter_typifications(eval_args):
-        for taxonomy in iter_taxonomies(typification):
-            taxonomy_title = taxonomy.get('title')
-            for branch in iter_branches(taxonomy):
-                t_title = (taxonomy_title or '').strip()
-                b_title = (branch.get('title') or '').strip()
-                b_desc = (branch.get('description') or '').strip()
-                query_text = f'{b_title}: {b_desc}'
-                query = PROMPTS.QUERY.format(section=t_title, query=query_text)
+    branch_queries = list(iter_branch_queries(eval_args))
+    if not branch_queries:
+        return
+
+    if not batched:
+        await _get_branch_sessions_sequential(
+            vstore, branch_queries, base_filter, max_chunks
+        )
+        return
 
-                chunks = await vstore.asimilarity_search(
-                    query, k=max_chunks, filter=base_filter
-                )
-                branch['sessions'] = chunks
+    await _get_branch_sessions_batched(
+        vstore, branch_queries, base_filter, max_chunks
+    )
 
 
 async def get_eval_args(
@@ -121,7 +208,7 @@ async def get_eval_args(
 
 def get_chain(model: Model):
     parser = JsonOutputParser(pydantic_object=DocumentReleaseFeedback)
-    fmt = {'format_instructions': parser.get_format_instructions()}
+    fmt = {'format_instructions': FORMAT_INSTRUCTIONS}
     prompt = PromptTemplate(
         template=PROMPTS.DOCUMENT_ANALYSIS_PROMPT,
         input_variables=[
@@ -136,33 +223,107 @@ def get_chain(model: Model):
     return prompt | model | parser
 
 
-def _format_context(branch: dict) -> str:
-    sessions = branch.get('sessions') or []
-    sessions.sort(key=lambda x: x.metadata.get('chunk_index', 0))
-    formatted_parts = []
-    current_section = None
-    for doc in sessions:
-        section_title = doc.metadata.get('section_title', '').strip()
-        content = getattr(
-            doc, 'page_content', getattr(doc, 'content', str(doc))
+# --- Montagem do contexto ---
+
+# Cabeçalho gravado no início de cada chunk pela vetorização
+SECTION_HEADER = re.compile(r'^SECTION: [^\n]*\n\n')
+# O splitter repete até 50 caracteres entre chunks vizinhos; a busca vai
+# um pouco além porque placeholders podem ser maiores que o texto original
+MIN_OVERLAP = 8
+MAX_OVERLAP = 200
+
+
+def _chunk_key(doc: Document) -> chunk_repo.ChunkKey:
+    return doc.metadata.get('source'), doc.metadata.get('chunk_index', 0)
+
+
+def _chunk_text(doc: Document) -> str:
+    content = getattr(doc, 'page_content', getattr(doc, 'content', str(doc)))
+    return SECTION_HEADER.sub('', content, count=1).strip()
+
+
+def _strip_overlap(previous: str, text: str) -> str:
+    longest = min(len(previous), len(text), MAX_OVERLAP)
+    for size in range(longest, MIN_OVERLAP - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:].lstrip()
+    return text
+
+
+def _hit_distance(doc: Document, hit_keys: set) -> int:
+    # Chunks encontrados pela busca vêm primeiro, depois os vizinhos mais
+    # próximos deles
+    source, index = _chunk_key(doc)
+    distances = [abs(index - i) for s, i in hit_keys if s == source]
+    return min(distances, default=0 if not hit_keys else MARGIN_SIZE + 1)
+
+
+def _render_context(chunks: list[Document]) -> str:
+    parts = []
+    previous_key = previous_text = current_section = None
+    for doc in sorted(chunks, key=_chunk_key):
+        key = _chunk_key(doc)
+        section = (doc.metadata.get('section_title') or '').strip()
+        raw_text = text = _chunk_text(doc)
+        contiguous = previous_key is not None and key == (
+            previous_key[0],
+            previous_key[1] + 1,
         )
-        header_pattern = f'SECTION: {section_title}\n\n'
 
-        if content.startswith(header_pattern):
-            clean_text = content[len(header_pattern) :]
+        if previous_key is None or section != current_section:
+            if parts:
+                parts.append('\n\n---\n\n')
+            if section:
+                parts.append(f'## CONTEXTO DA SESSÃO: {section}\n')
+            current_section = section
+        elif contiguous:
+            # Trechos vizinhos viram um só, sem a sobreposição do splitter
+            text = _strip_overlap(previous_text, text)
+            parts.append(' ')
         else:
-            clean_text = content
+            parts.append('\n\n[...]\n\n')
+
+        parts.append(text)
+        previous_key, previous_text = key, raw_text
+    return ''.join(parts).strip()
+
+
+def pack_context(
+    chunks: list[Document],
+    hit_keys: Optional[set] = None,
+    max_tokens: int = SETTINGS.EVAL_CONTEXT_TOKENS,
+) -> str:
+    """
+    Monta o contexto de um ramo dentro de `max_tokens`.
+
+    Chunks repetidos entram uma vez, vizinhos contíguos são emendados sem
+    a sobreposição do splitter e o cabeçalho SECTION de cada chunk é
+    trocado por um título por seção. Se o orçamento não comporta tudo, os
+    vizinhos mais distantes dos chunks encontrados saem primeiro.
+    """
+    hit_keys = hit_keys or set()
+    unique = {_chunk_key(doc): doc for doc in chunks}
+    by_priority = sorted(
+        unique.values(),
+        key=lambda doc: (_hit_distance(doc, hit_keys), _chunk_key(doc)),
+    )
+
+    selected, used = [], 0
+    for doc in by_priority:
+        tokens = count_tokens(_chunk_text(doc))
+        if used + tokens <= max_tokens:
+            selected.append(doc)
+            used += tokens
+
+    context = _render_context(selected)
+    # Os títulos de seção também contam; remove o menos relevante até caber
+    while len(selected) > 1 and count_tokens(context) > max_tokens:
+        selected.pop()
+        context = _render_context(selected)
 
-        if section_title != current_section:
-            if current_section is not None:
-                formatted_parts.append('\n\n---\n\n')
-            if section_title:
-                formatted_parts.append(
-                    f'## CONTEXTO DA SESSÃO: {section_title}\n'
-                )
-            current_section = section_title
-        formatted_parts.append(clean_text)
-    return ''.join(formatted_parts).strip()
+    if by_priority and (not selected or count_tokens(context) > max_tokens):
+        return truncate_tokens(_render_context(by_priority[:1]), max_tokens)
+    return context
 
 
 def _create_eval_payload(taxonomy: dict, branch: dict) -> dict:
@@ -184,7 +345,9 @@ def _create_eval_payload(taxonomy: dict, branch: dict) -> dict:
             full_mapping[category].update(entities)
 
     return {
-        'document': _format_context(branch),
+        'document': pack_context(
+            branch.get('sessions') or [], branch.get('hit_keys')
+        ),
         'source': source_names,
         'requirement': f'{req_title}: {req_desc}'
         if req_title and req_desc
@@ -207,22 +370,89 @@ async def simplify_eval_args(eval_args: dict) -> list[dict]:
     return payloads
 
 
-async def apply_tree(chain: RunnableLambda, eval_args: list[dict]):
-    last_exception = None
+def _validate_feedback(result) -> dict:
+    # Resposta fora do schema conta como falha do ramo, igual a um JSON
+    # inválido, em vez de quebrar a release mais adiante
+    if isinstance(result, Exception):
+        raise result
+    return DocumentReleaseFeedback.model_validate(result).model_dump()
+
+
+async def apply_tree(
+    chain: RunnableLambda,
+    eval_args: list[dict],
+    max_attempts: int = SETTINGS.EVAL_MAX_ATTEMPTS,
+    retry_delay: float = SETTINGS.EVAL_RETRY_DELAY,
+    failure_budget: float = SETTINGS.EVAL_FAILURE_BUDGET,
+    *,
+    on_result: Optional[OnResult] = None,
+) -> list[dict]:
+    """
+    Avalia os ramos, repetindo apenas os que falharam.
+
+    Cada ramo recebe `attempts` (a tentativa em que foi avaliado),
+    `prompt_tokens` (tamanho do prompt enviado) e, se continuar falhando,
+    `error`. As respostas são tratadas na ordem em que chegam e
+    `on_result` é chamado com cada ramo avaliado. As falhas somadas de
+    todas as tentativas não podem passar de `failure_budget` (fração dos
+    ramos): esgotado o orçamento, não há novas tentativas e os ramos
+    restantes ficam sem nota. Retorna o registro de cada tentativa.
+    """
     PROMPT = PROMPTS.DOCUMENT_ANALYSIS_PROMPT
-    for _ in range(3):
-        try:
-            # LangChain batch execution
-            response = await chain.abatch(eval_args)
-            for item, result in zip(eval_args, response):
-                # Guarda o prompt formatado para debug/log
-                item['prompt'] = PROMPT.format(**item, format_instructions='')
-                item.update(result)
-            return eval_args
-        except Exception as e:
-            last_exception = e
-    if last_exception:
-        raise last_exception
+    budget = math.ceil(failure_budget * len(eval_args))
+    failures = 0
+    attempts = []
+    pending = list(eval_args)
+
+    for attempt in range(1, max_attempts + 1):
+        if not pending:
+            break
+        if attempt > 1:
+            await asyncio.sleep(retry_delay * 2 ** (attempt - 2))
+
+        async for index, result in chain.abatch_as_completed(
+            pending, return_exceptions=True
+        ):
+            item = pending[index]
+            item['attempts'] = attempt
+            item['prompt_tokens'] = count_tokens(
+                PROMPT.format(**item, format_instructions=FORMAT_INSTRUCTIONS)
+            )
+            try:
+                feedback = _validate_feedback(result)
+            except Exception as e:
+                item['error'] = repr(e)
+                continue
+            item.pop('error', None)
+            # Guarda o prompt formatado para debug/log
+            item['prompt'] = PROMPT.format(**item, format_instructions='')
+            item.update(feedback)
+            if on_result:
+                await on_result(item)
+
+        failed = [item for item in pending if 'error' in item]
+        attempts.append({
+            'attempt': attempt,
+            'evaluated': [item.get('id') for item in pending],
+            'failed': [item.get('id') for item in failed],
+            'prompt_tokens': sum(item['prompt_tokens'] for item in pending),
+        })
+        logger.info(
+            'Tentativa %s: %s ramos avaliados, %s falharam',
+            attempt,
+            len(pending),
+            len(failed),
+        )
+
+        pending = failed
+        failures += len(failed)
+        if failures > budget:
+            logger.warning(
+                'Orçamento de falhas esgotado (%s de %s)', failures, budget
+            )
+            break
+
+    return attempts
 
 
 def generate_description_prompt(eval_args: list[dict]) -> str:
@@ -1,37 +1,208 @@
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
 from typing import Optional
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from redis import Redis
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from iaEditais.core.cache import topic_channel
 from iaEditais.core.dependencies import Model, VStore
+from iaEditais.core.eval_cache import EvalCache, model_name
+from iaEditais.core.settings import Settings
+from iaEditais.core.ws_replay import publish_event
 from iaEditais.models import (
     AppliedBranch,
     AppliedSource,
     AppliedTaxonomy,
+    AppliedTaxonomySource,
     AppliedTypification,
+    AppliedTypificationSource,
     DocumentRelease,
+    Taxonomy,
+    Typification,
 )
 from iaEditais.repositories import release_repo
 from iaEditais.schemas.common import WSMessage
-from iaEditais.schemas.document_release import DocumentReleasePublic
+from iaEditais.schemas.document_release import (
+    DocumentReleaseStatus,
+    ReleaseBranchEvaluated,
+    ReleasePipelineStage,
+)
 from iaEditais.services import (
     release_logic_service,
     tree_service,
     vector_service,
 )
 
+SETTINGS = Settings()
+
+logger = logging.getLogger(__name__)
+
 
 # --- WebSocket Helper ---
-async def _ws_update(redis: Redis, db_release: DocumentRelease, message: str):
-    release_public = DocumentReleasePublic.model_validate(db_release)
-    payload = release_public.model_dump(mode='json')
+async def _ws_publish(
+    redis: Redis, db_release: DocumentRelease, ws_message: WSMessage
+):
+    # Publicada só nos tópicos do documento e da unidade (quem não assinou
+    # nenhum deles não recebe nada) e guardada no stream de replay de cada um
+    db_doc = db_release.history.document
+    for channel_id in (
+        topic_channel('doc', db_doc.id),
+        topic_channel('unit', db_doc.unit_id),
+    ):
+        await publish_event(redis, channel_id, ws_message)
+
+
+async def _ws_update(
+    redis: Redis,
+    db_release: DocumentRelease,
+    message: str,
+    eval_args: Optional[list[dict]] = None,
+):
+    # Só o estado resumido: o custo da mensagem não cresce com a árvore,
+    # que o cliente busca em GET /doc/{doc_id}/release/{release_id}
+    eval_args = eval_args or []
+    status = DocumentReleaseStatus(
+        id=db_release.id,
+        document_id=db_release.history.document_id,
+        status=message,
+        pipeline_stage=db_release.pipeline_stage,
+        branches_total=len(eval_args),
+        branches_evaluated=sum('score' in item for item in eval_args),
+        created_at=db_release.created_at,
+        emitted_at=datetime.now(timezone.utc),
+    )
     ws_message = WSMessage(
         event='doc.release.update',
         message=message,
-        payload=payload,
+        payload=status.model_dump(mode='json'),
     )
-    await redis.publish('ws:broadcast', ws_message.model_dump_json())
+    await _ws_publish(redis, db_release, ws_message)
+
+
+def _ws_branch_notifier(
+    redis: Redis, db_release: DocumentRelease, eval_args: list[dict]
+) -> release_logic_service.OnResult:
+    # Um evento pequeno por ramo, emitido assim que a resposta chega
+    progress = {
+        'evaluated': sum('score' in item for item in eval_args),
+        'total': len(eval_args),
+    }
+
+    async def notify(item: dict):
+        progress['evaluated'] += 1
+        payload = ReleaseBranchEvaluated(
+            release_id=db_release.id,
+            document_id=db_release.history.document_id,
+            branch_id=item['id'],
+            score=item['score'],
+            fulfilled=item['fulfilled'],
+            **progress,
+        )
+        ws_message = WSMessage(
+            event='doc.release.branch_evaluated',
+            message='branch_evaluated',
+            payload=payload.model_dump(mode='json'),
+        )
+        # O progresso é só informativo: uma falha do Redis não pode
+        # interromper as avaliações já pagas
+        try:
+            await _ws_publish(redis, db_release, ws_message)
+        except RedisError as e:
+            logger.warning('Branch progress event not published: %s', e)
+
+    return notify
+
+
+# --- Persistência dos resultados ---
+# Ordem dos INSERTs em massa, respeitando as chaves estrangeiras
+INSERT_ORDER = (
+    AppliedTypification,
+    AppliedTaxonomy,
+    AppliedSource,
+    AppliedTypificationSource,
+    AppliedTaxonomySource,
+    AppliedBranch,
+)
+
+# Coluna que aponta para o dono da fonte em cada tabela de associação
+SOURCE_LINK_KEYS = {
+    AppliedTypificationSource: 'typification_id',
+    AppliedTaxonomySource: 'taxonomy_id',
+}
+
+Rows = dict[type, list[dict]]
+
+
+def _add_sources(
+    rows: Rows,
+    sources: list,
+    link_model: type,
+    owner_id: UUID,
+    user_id: Optional[UUID],
+):
+    link_key = SOURCE_LINK_KEYS[link_model]
+    for src in sources:
+        source_id = uuid4()
+        rows[AppliedSource].append({
+            'id': source_id,
+            'name': src.name,
+            'description': src.description,
+            'original_id': src.id,
+            'created_by': user_id,
+        })
+        rows[link_model].append({
+            link_key: owner_id,
+            'source_id': source_id,
+            'created_by': user_id,
+        })
+
+
+def _ensure_typification(
+    rows: Rows,
+    applied_typs: dict[UUID, UUID],
+    typ: Typification,
+    release_id: UUID,
+    user_id: Optional[UUID],
+) -> UUID:
+    if typ.id in applied_typs:
+        return applied_typs[typ.id]
+    typ_id = applied_typs[typ.id] = uuid4()
+    rows[AppliedTypification].append({
+        'id': typ_id,
+        'name': typ.name,
+        'applied_release_id': release_id,
+        'original_id': typ.id,
+        'created_by': user_id,
+    })
+    _add_sources(rows, typ.sources, AppliedTypificationSource, typ_id, user_id)
+    return typ_id
+
+
+def _ensure_taxonomy(
+    rows: Rows,
+    applied_taxes: dict[tuple[UUID, UUID], UUID],
+    tax: Taxonomy,
+    typ_id: UUID,
+    user_id: Optional[UUID],
+) -> UUID:
+    if (typ_id, tax.id) in applied_taxes:
+        return applied_taxes[typ_id, tax.id]
+    tax_id = applied_taxes[typ_id, tax.id] = uuid4()
+    rows[AppliedTaxonomy].append({
+        'id': tax_id,
+        'title': tax.title,
+        'description': tax.description,
+        'applied_typification_id': typ_id,
+        'original_id': tax.id,
+        'created_by': user_id,
+    })
+    _add_sources(rows, tax.sources, AppliedTaxonomySource, tax_id, user_id)
+    return tax_id
 
 
 async def _save_eval_results(
@@ -40,92 +211,126 @@ async def _save_eval_results(
     release_id: UUID,
     user_id: Optional[UUID] = None,
 ):
-    applied_typs: dict[UUID, AppliedTypification] = {}
-    applied_taxes: dict[UUID, AppliedTaxonomy] = {}
+    # Leituras em lote e linhas montadas em memória com UUIDs gerados aqui:
+    # o custo em idas ao banco não depende do tamanho da árvore
+    branch_ids = [item['id'] for item in eval_args if item.get('id')]
+    branches = {
+        branch.id: branch
+        for branch in await release_repo.get_full_branches(session, branch_ids)
+    }
+    applied_typs = await release_repo.get_applied_typification_ids(
+        session, release_id
+    )
+    applied_taxes = await release_repo.get_applied_taxonomy_ids(
+        session, release_id
+    )
+    rows: Rows = defaultdict(list)
 
     for branch_data in eval_args:
-        branch_id = branch_data.get('id')
-        if not branch_id:
-            continue
-
-        original_branch = await release_repo.get_full_branch(
-            session, branch_id
-        )
+        original_branch = branches.get(branch_data.get('id'))
         if not original_branch:
             continue
 
-        # Hierarquia
         tax = original_branch.taxonomy
-        typ = tax.typification
-
-        # Applied Typification
-        app_typ = applied_typs.get(typ.id)
-        if not app_typ:
-            app_typ = await release_repo.get_applied_typification(
-                session, typ.id, release_id
-            )
-            if not app_typ:
-                app_typ = AppliedTypification(
-                    name=typ.name,
-                    applied_release_id=release_id,
-                    original_id=typ.id,
-                    created_by=user_id,
-                )
-                for src in typ.sources:
-                    app_typ.sources.append(
-                        AppliedSource(
-                            name=src.name,
-                            description=src.description,
-                            original_id=src.id,
-                            created_by=user_id,
-                        )
-                    )
-                release_repo.add_applied_entity(session, app_typ)
-                await session.flush()
-            applied_typs[typ.id] = app_typ
-
-        # Applied Taxonomy
-        app_tax = applied_taxes.get(tax.id)
-        if not app_tax:
-            app_tax = await release_repo.get_applied_taxonomy(
-                session, tax.id, app_typ.id
-            )
-            if not app_tax:
-                app_tax = AppliedTaxonomy(
-                    title=tax.title,
-                    description=tax.description,
-                    applied_typification_id=app_typ.id,
-                    original_id=tax.id,
-                    created_by=user_id,
-                )
-                for src in tax.sources:
-                    app_tax.sources.append(
-                        AppliedSource(
-                            name=src.name,
-                            description=src.description,
-                            original_id=src.id,
-                            created_by=user_id,
-                        )
-                    )
-                release_repo.add_applied_entity(session, app_tax)
-                await session.flush()
-            applied_taxes[tax.id] = app_tax
-
-        # Applied Branch
-        applied_branch = AppliedBranch(
-            title=original_branch.title,
-            description=original_branch.description,
-            applied_taxonomy_id=app_tax.id,
-            original_id=original_branch.id,
-            created_by=user_id,
-            fulfilled=branch_data.get('fulfilled'),
-            score=branch_data.get('score'),
-            feedback=branch_data.get('feedback'),
-            presidio_mapping=str(branch_data.get('presidio_mapping')),
+        typ_id = _ensure_typification(
+            rows, applied_typs, tax.typification, release_id, user_id
         )
-        release_repo.add_applied_entity(session, applied_branch)
+        tax_id = _ensure_taxonomy(rows, applied_taxes, tax, typ_id, user_id)
+
+        mapping = branch_data.get('presidio_mapping')
+        rows[AppliedBranch].append({
+            'id': uuid4(),
+            'title': original_branch.title,
+            'description': original_branch.description,
+            'applied_taxonomy_id': tax_id,
+            'original_id': original_branch.id,
+            'created_by': user_id,
+            'fulfilled': branch_data.get('fulfilled'),
+            'score': branch_data.get('score'),
+            'feedback': branch_data.get('feedback'),
+            'presidio_mapping': json.dumps(mapping) if mapping else None,
+            'cache_hit': bool(branch_data.get('cache_hit')),
+            'prompt_tokens': branch_data.get('prompt_tokens'),
+        })
+
+    for model in INSERT_ORDER:
+        await release_repo.bulk_insert(session, model, rows[model])
+
+
+# --- Checkpoints ---
+STAGES = list(ReleasePipelineStage)
+
+
+def _stage_done(
+    db_release: DocumentRelease, stage: ReleasePipelineStage
+) -> bool:
+    if not db_release.pipeline_stage:
+        return False
+    current = ReleasePipelineStage(db_release.pipeline_stage)
+    return STAGES.index(current) >= STAGES.index(stage)
+
+
+def _dump_state(eval_args: list[dict], eval_attempts: list[dict]) -> dict:
+    state = {'eval_args': eval_args, 'eval_attempts': eval_attempts}
+    return json.loads(json.dumps(state, default=str))
+
+
+def _load_eval_attempts(db_release: DocumentRelease) -> list[dict]:
+    return list((db_release.pipeline_state or {}).get('eval_attempts', []))
+
+
+def _load_eval_args(db_release: DocumentRelease) -> list[dict]:
+    # Cópias: o estado carregado não pode ser alterado no lugar, senão o
+    # SQLAlchemy não enxerga a mudança no próximo checkpoint
+    eval_args = []
+    for stored in (db_release.pipeline_state or {}).get('eval_args', []):
+        item = dict(stored)
+        if item.get('id'):
+            item['id'] = UUID(str(item['id']))
+        eval_args.append(item)
+    return eval_args
+
+
+async def _checkpoint(
+    session: AsyncSession,
+    db_release: DocumentRelease,
+    stage: ReleasePipelineStage,
+    state: Optional[dict] = None,
+):
+    db_release.pipeline_stage = stage.value
+    if state is not None:
+        db_release.pipeline_state = state
+    await session.commit()
+
+
+async def _evaluate(
+    db_release: DocumentRelease,
+    eval_args: list[dict],
+    model: Model,
+    redis: Redis,
+) -> list[dict]:
+    # Ramos já avaliados com as mesmas entradas vêm do cache; só o resto
+    # vai para o modelo
+    cache = EvalCache(
+        redis,
+        model_name(model),
+        release_logic_service.PROMPT_VERSION,
+        SETTINGS.EVAL_CACHE_TTL,
+    )
+    pending = [item for item in eval_args if 'score' not in item]
+    misses = await cache.apply(pending)
+    chain = release_logic_service.get_chain(model)
+    attempts = await release_logic_service.apply_tree(
+        chain,
+        misses,
+        on_result=_ws_branch_notifier(redis, db_release, eval_args),
+    )
+    await cache.store(misses)
 
-    await session.flush()
+    # Registro por execução, para o operador ver o custo dos retries
+    eval_attempts = _load_eval_attempts(db_release)
+    run = len({record['run'] for record in eval_attempts}) + 1
+    return eval_attempts + [{'run': run, **record} for record in attempts]
 
 
 async def process_release_pipeline(
@@ -135,6 +340,15 @@ async def process_release_pipeline(
     vstore: VStore,
     redis: Redis,
 ) -> dict:
+    """
+    Executa o pipeline da release a partir da última etapa concluída.
+
+    Cada etapa grava seu resultado em `pipeline_stage`/`pipeline_state` e
+    faz commit, então uma nova tentativa (retry da fila ou
+    `resume_release`) não repete vetorização, recuperação, avaliações já
+    respondidas pelo modelo nem o salvamento dos resultados. Ao final,
+    `pipeline_state` guarda apenas o registro das tentativas de avaliação.
+    """
     db_release = await release_repo.get_release_with_details(
         session, release_id
     )
@@ -143,33 +357,71 @@ async def process_release_pipeline(
 
     db_doc = db_release.history.document
 
-    try:
+    if not _stage_done(db_release, ReleasePipelineStage.VECTORIZED):
         await _ws_update(redis, db_release, 'creating_vectors')
-        await vector_service.create_vectors(db_release.file_path, vstore)
+        previous_release = await release_repo.get_previous_release(
+            session, db_release
+        )
+        await vector_service.create_vectors(
+            db_release.file_path,
+            vstore,
+            previous_release.file_path if previous_release else None,
+        )
+        await _checkpoint(session, db_release, ReleasePipelineStage.VECTORIZED)
+
+    if not _stage_done(db_release, ReleasePipelineStage.EVALUATED):
+        await _ws_update(
+            redis, db_release, 'evaluating', _load_eval_args(db_release)
+        )
 
-        await _ws_update(redis, db_release, 'evaluating')
+    if not _stage_done(db_release, ReleasePipelineStage.RETRIEVED):
         tree = await tree_service.get_tree_by_release(session, db_release)
         args = await release_logic_service.get_eval_args(
             vstore, tree, db_release
         )
-        simplified_args = await release_logic_service.simplify_eval_args(args)
-        chain = release_logic_service.get_chain(model)
-        await release_logic_service.apply_tree(chain, simplified_args)
+        eval_args = await release_logic_service.simplify_eval_args(args)
+        await _checkpoint(
+            session,
+            db_release,
+            ReleasePipelineStage.RETRIEVED,
+            _dump_state(eval_args, []),
+        )
+
+    eval_args = _load_eval_args(db_release)
 
-        print(simplified_args)
-        await _save_eval_results(session, simplified_args, db_release.id)
+    if not _stage_done(db_release, ReleasePipelineStage.EVALUATED):
+        eval_attempts = await _evaluate(db_release, eval_args, model, redis)
 
-        prompt = release_logic_service.generate_description_prompt(
-            simplified_args
+        # Mesmo com falhas, as respostas obtidas ficam salvas e a próxima
+        # tentativa reavalia apenas os ramos restantes
+        failed = [item for item in eval_args if 'score' not in item]
+        await _checkpoint(
+            session,
+            db_release,
+            ReleasePipelineStage.RETRIEVED
+            if failed
+            else ReleasePipelineStage.EVALUATED,
+            _dump_state(eval_args, eval_attempts),
         )
-        desc_response = model.invoke(prompt)
-        print(desc_response)
-        db_release.description = desc_response.content.strip()
-        await session.commit()
+        if failed:
+            raise RuntimeError(
+                f'{len(failed)} ramos sem avaliação na release {release_id}.'
+            )
 
-        await _ws_update(redis, db_release, 'complete')
+    if not _stage_done(db_release, ReleasePipelineStage.SAVED):
+        # Resultados e checkpoint no mesmo commit: não há ramos duplicados
+        await _save_eval_results(session, eval_args, db_release.id)
+        await _checkpoint(session, db_release, ReleasePipelineStage.SAVED)
+
+    if not _stage_done(db_release, ReleasePipelineStage.COMPLETED):
+        prompt = release_logic_service.generate_description_prompt(eval_args)
+        desc_response = await model.ainvoke(prompt)
+        db_release.description = desc_response.content.strip()
+        db_release.pipeline_state = {
+            'eval_attempts': _load_eval_attempts(db_release)
+        }
+        await _checkpoint(session, db_release, ReleasePipelineStage.COMPLETED)
 
-        return {'doc': db_doc, 'release': db_release, 'status': 'success'}
+    await _ws_update(redis, db_release, 'complete', eval_args)
 
-    except Exception as e:
-        raise e
+    return {'doc': db_doc, 'release': db_release, 'status': 'success'}
@@ -14,7 +14,7 @@ from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer
 from sqlalchemy import select
 
 from iaEditais.models import DocumentRelease
-from iaEditais.schemas.document_release import DocumentReleasePublic
+from iaEditais.services import deanonymization_service
 
 
 def get_custom_styles():
@@ -438,7 +438,7 @@ async def generate_document_release_pdf(session, document_release_id: UUID):
     if not obj:
         return None
 
-    payload = DocumentReleasePublic.model_validate(obj).model_dump()
+    payload = deanonymization_service.release_to_public(obj).model_dump()
 
     report_path = document_release_report(payload)
 
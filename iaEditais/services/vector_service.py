@@ -1,7 +1,9 @@
+import hashlib
+import hmac
 import os
 import re
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from langchain_community.document_loaders import (
     Docx2txtLoader,
@@ -13,7 +15,8 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from iaEditais.core.dependencies import VStore
 from iaEditais.core.settings import Settings
-from iaEditais.utils.PresidioAnonymizer import PresidioAnonymizer
+from iaEditais.repositories import chunk_repo
+from iaEditais.services import anonymization_service
 
 SETTINGS = Settings()
 
@@ -23,6 +26,21 @@ SPLITTER = RecursiveCharacterTextSplitter(
 )
 
 
+def content_hash(text: str) -> str:
+    # O texto ainda não foi anonimizado: com HMAC o digest gravado ao lado
+    # do chunk não pode ser revertido por força bruta (CPFs, telefones)
+    return hmac.new(
+        SETTINGS.SECRET_KEY.encode('utf-8'),
+        text.encode('utf-8'),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+def get_source_path(file_path: Path | str) -> str:
+    unique_filename = str(file_path).split('/')[-1]
+    return os.path.join(SETTINGS.UPLOAD_DIRECTORY, unique_filename)
+
+
 def _clean_and_format_documents(documents: List[Document]) -> List[Document]:
     chunks = SPLITTER.split_documents(documents)
     for i, chunk in enumerate(chunks):
@@ -35,6 +53,7 @@ def _clean_and_format_documents(documents: List[Document]) -> List[Document]:
             chunk.page_content = text
 
         chunk.metadata['chunk_index'] = i
+        chunk.metadata['content_hash'] = content_hash(chunk.page_content)
         if 'source' not in chunk.metadata:
             chunk.metadata['source'] = 'unknown'
     return chunks
@@ -67,15 +86,100 @@ def _split_by_sections(documents: List[Document]) -> List[Document]:
     return split_documents
 
 
-async def _anonymize_and_vectorize(chunks: List[Document], vstore: VStore):
-    if not chunks:
-        return
-    anonymizer = PresidioAnonymizer()
-    anonymized_chunks = anonymizer.anonymize_chunks(chunks)
-    await vstore.aadd_documents(anonymized_chunks)
+def _merge_mappings(mappings: List[dict]) -> dict:
+    merged = {}
+    for mapping in mappings:
+        for category, entities in (mapping or {}).items():
+            merged.setdefault(category, {}).update(entities)
+    return merged
 
 
-async def process_file(full_path: str, vstore: VStore) -> None:
+async def _anonymize_and_embed(
+    chunks: List[Document],
+    vstore: VStore,
+    existing_mapping: Optional[dict] = None,
+) -> List[tuple[Document, list[float]]]:
+    if not chunks:
+        return []
+    anonymized_chunks = await anonymization_service.anonymize_chunks(
+        chunks, existing_mapping
+    )
+    embeddings = await vstore.embeddings.aembed_documents([
+        chunk.page_content for chunk in anonymized_chunks
+    ])
+    return list(zip(anonymized_chunks, embeddings))
+
+
+async def _add_embedded_chunks(
+    rows: List[tuple[Document, list[float]]], vstore: VStore
+) -> None:
+    # Um único INSERT: ou a fonte fica com todos os chunks ou com nenhum,
+    # o que permite usar a existência de chunks como "já vetorizado"
+    if not rows:
+        return
+    await vstore.aadd_embeddings(
+        texts=[chunk.page_content for chunk, _ in rows],
+        embeddings=[embedding for _, embedding in rows],
+        metadatas=[chunk.metadata for chunk, _ in rows],
+    )
+
+
+async def _anonymize_and_vectorize(
+    chunks: List[Document],
+    vstore: VStore,
+    existing_mapping: Optional[dict] = None,
+):
+    rows = await _anonymize_and_embed(chunks, vstore, existing_mapping)
+    await _add_embedded_chunks(rows, vstore)
+
+
+def _diff_chunks(
+    chunks: List[Document],
+    previous_chunks: List[tuple[Document, list[float]]],
+) -> tuple[List[tuple[Document, list[float]]], List[Document]]:
+    previous_by_hash = {}
+    for previous, embedding in previous_chunks:
+        chunk_hash = previous.metadata.get('content_hash')
+        if chunk_hash:
+            previous_by_hash.setdefault(chunk_hash, (previous, embedding))
+
+    reused, changed = [], []
+    for chunk in chunks:
+        match = previous_by_hash.get(chunk.metadata['content_hash'])
+        if not match:
+            changed.append(chunk)
+            continue
+
+        previous, embedding = match
+        chunk.page_content = previous.page_content
+        chunk.metadata['presidio_mapping'] = previous.metadata.get(
+            'presidio_mapping'
+        )
+        chunk.metadata['anonymized'] = previous.metadata.get('anonymized')
+        reused.append((chunk, embedding))
+    return reused, changed
+
+
+async def _vectorize_incremental(
+    chunks: List[Document], vstore: VStore, previous_source: str
+):
+    previous_chunks = await chunk_repo.get_chunks_with_embeddings(
+        vstore, previous_source
+    )
+    reused, changed = _diff_chunks(chunks, previous_chunks)
+
+    # Os placeholders reaproveitados reservam seus índices para que as
+    # entidades novas não colidam com eles
+    existing_mapping = _merge_mappings([
+        chunk.metadata.get('presidio_mapping') for chunk, _ in reused
+    ])
+    embedded = await _anonymize_and_embed(changed, vstore, existing_mapping)
+    await _add_embedded_chunks(reused + embedded, vstore)
+
+
+async def process_file(
+    full_path: str, vstore: VStore, previous_source: Optional[str] = None
+) -> None:
     ext = os.path.splitext(full_path)[1].lower()
 
     if ext == '.pdf':
@@ -90,12 +194,33 @@ async def process_file(full_path: str, vstore: VStore) -> None:
     raw_documents = loader.load()
     section_documents = _split_by_sections(raw_documents)
     formatted_documents = _clean_and_format_documents(section_documents)
+
+    if previous_source:
+        await _vectorize_incremental(
+            formatted_documents, vstore, previous_source
+        )
+        return
+
     await _anonymize_and_vectorize(formatted_documents, vstore)
 
 
-async def create_vectors(file_path: Path, vstore: VStore) -> None:
-    unique_filename = str(file_path).split('/')[-1]
-    full_path = os.path.join(SETTINGS.UPLOAD_DIRECTORY, unique_filename)
+async def create_vectors(
+    file_path: Path,
+    vstore: VStore,
+    previous_file_path: Optional[str] = None,
+) -> None:
+    full_path = get_source_path(file_path)
     if not os.path.exists(full_path):
         return
-    await process_file(full_path, vstore)
+
+    previous_source = None
+    if previous_file_path:
+        previous_source = get_source_path(previous_file_path)
+
+    # Uploads são endereçados pelo hash do conteúdo: se o mesmo arquivo já
+    # foi vetorizado, os chunks e embeddings existentes são reaproveitados.
+    # O lock evita que dois workers vetorizem o mesmo arquivo ao mesmo tempo
+    async with chunk_repo.source_lock(vstore, full_path):
+        if await chunk_repo.has_chunks(vstore, full_path):
+            return
+        await process_file(full_path, vstore, previous_source)
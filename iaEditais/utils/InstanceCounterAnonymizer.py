@@ -11,22 +11,31 @@ class InstanceCounterAnonymizer(Operator):
 
         entity_mapping: Dict[Dict:str] = params['entity_mapping']
 
+        # Próximo índice livre por tipo, mantido entre chamadas. Sem ele
+        # (ou para tipos ainda não vistos, como mapeamentos já gravados nos
+        # metadados dos chunks) o índice é recalculado uma única vez a
+        # partir dos placeholders existentes.
+        entity_counters: Dict[str, int] = params.get('entity_counters')
+        if entity_counters is None:
+            entity_counters = {}
+
         entity_mapping_for_type = entity_mapping.get(entity_type)
         if not entity_mapping_for_type:
-            new_text = self.REPLACING_FORMAT.format(
-                entity_type=entity_type, index=0
-            )
+            index = 0
             entity_mapping[entity_type] = {}
 
         else:
             if text in entity_mapping_for_type:
                 return entity_mapping_for_type[text]
 
-            previous_index = self._get_last_index(entity_mapping_for_type)
-            new_text = self.REPLACING_FORMAT.format(
-                entity_type=entity_type, index=previous_index + 1
-            )
+            index = entity_counters.get(entity_type)
+            if index is None:
+                index = self._get_last_index(entity_mapping_for_type) + 1
 
+        new_text = self.REPLACING_FORMAT.format(
+            entity_type=entity_type, index=index
+        )
+        entity_counters[entity_type] = index + 1
         entity_mapping[entity_type][text] = new_text
         return new_text
 
@@ -1,42 +0,0 @@
-from typing import Dict
-
-from presidio_anonymizer.operators import Operator, OperatorType
-
-
-class InstanceCounterDeanonymizer(Operator):
-    def operate(self, text: str, params: Dict = None) -> str:
-        entity_type: str = params['entity_type']
-
-        entity_mapping: Dict[Dict:str] = params['entity_mapping']
-
-        if entity_type not in entity_mapping:
-            raise ValueError(
-                f'Entity type {entity_type} not found in entity mapping!'
-            )
-        if text not in entity_mapping[entity_type].values():
-            raise ValueError(
-                f'Text {text} not found in entity mapping for entity type {entity_type}!'
-            )
-
-        return self._find_key_by_value(entity_mapping[entity_type], text)
-
-    @staticmethod
-    def _find_key_by_value(entity_mapping, value):
-        for key, val in entity_mapping.items():
-            if val == value:
-                return key
-        return None
-
-    def validate(self, params: Dict = None) -> None:
-        if 'entity_mapping' not in params:
-            raise ValueError(
-                'An input Dict called `entity_mapping` is required.'
-            )
-        if 'entity_type' not in params:
-            raise ValueError('An entity_type param is required.')
-
-    def operator_name(self) -> str:
-        return 'entity_counter_deanonymizer'
-
-    def operator_type(self) -> OperatorType:
-        return OperatorType.Deanonymize
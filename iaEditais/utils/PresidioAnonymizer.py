@@ -1,9 +1,38 @@
+from functools import lru_cache
+from typing import Optional, Union
+
 from langchain_core.documents import Document
-from presidio_analyzer import AnalyzerEngine, Pattern, PatternRecognizer
+from presidio_analyzer import (
+    AnalyzerEngine,
+    BatchAnalyzerEngine,
+    Pattern,
+    PatternRecognizer,
+)
 from presidio_analyzer.nlp_engine import NlpEngineProvider
 from presidio_anonymizer import AnonymizerEngine, OperatorConfig
 
+from iaEditais.core.settings import Settings
 from iaEditais.utils.InstanceCounterAnonymizer import InstanceCounterAnonymizer
+from iaEditais.utils.RegexAnalyzer import RegexAnalyzer
+
+SETTINGS = Settings()
+
+ANALYZER_BATCH_SIZE = 64
+
+# Nenhum recognizer registrado usa entidades, lemas ou palavras de contexto
+# do spaCy: basta o tokenizer para montar os NlpArtifacts.
+UNUSED_PIPES = (
+    'tok2vec',
+    'morphologizer',
+    'parser',
+    'lemmatizer',
+    'attribute_ruler',
+    'ner',
+    'senter',
+)
+
+Analyzer = Union[AnalyzerEngine, RegexAnalyzer]
+BatchAnalyzer = Union[BatchAnalyzerEngine, RegexAnalyzer]
 
 
 class PresidioAnonymizer:
@@ -14,16 +43,30 @@ class PresidioAnonymizer:
 
     def __init__(self):
         """Inicializa o anonimizador Presidio com recognizers customizados."""
-        self.analyzer = self._setup_analyzer()
-
         self.engine = AnonymizerEngine()
 
         self.engine.add_anonymizer(InstanceCounterAnonymizer)
 
         self.existing_presidio_mapping = {}
 
-    def _setup_analyzer(self):
-        """Configura o analisador com reconhecedores customizados para dados brasileiros."""
+    @property
+    def existing_presidio_mapping(self) -> dict:
+        return self._existing_presidio_mapping
+
+    @existing_presidio_mapping.setter
+    def existing_presidio_mapping(self, mapping: dict):
+        # Os contadores de índice só valem para o mapeamento de onde vieram
+        self._existing_presidio_mapping = mapping
+        self.entity_counters = {}
+
+    @property
+    def analyzer(self) -> Analyzer:
+        """Analisador compartilhado, carregado uma única vez por processo."""
+        return get_analyzer()
+
+    @staticmethod
+    def _setup_recognizers() -> list[PatternRecognizer]:
+        """Cria os reconhecedores customizados para dados brasileiros."""
 
         cpf_pattern = Pattern(
             name='cpf_pattern',
@@ -170,6 +213,25 @@ class PresidioAnonymizer:
             supported_language='pt',
         )
 
+        return [
+            custom_recognizer_celular,
+            custom_recognizer_cpf,
+            custom_recognizer_cnpj,
+            custom_recognizer_rg,
+            custom_recognizer_institutions,
+            custom_recognizer_valor_reais,
+            custom_recognizer_numero_processo,
+            custom_recognizer_numero_edital,
+            custom_recognizer_email,
+            custom_recognizer_data,
+            custom_recognizer_hora,
+            custom_recognizer_cep,
+        ]
+
+    @staticmethod
+    def _setup_analyzer():
+        """Configura o analisador com reconhecedores customizados para dados brasileiros."""
+
         configuration = {
             'nlp_engine_name': 'spacy',
             'models': [{'lang_code': 'pt', 'model_name': 'pt_core_news_lg'}],
@@ -178,6 +240,11 @@ class PresidioAnonymizer:
         provider = NlpEngineProvider(nlp_configuration=configuration)
         nlp_engine_with_portuguese = provider.create_engine()
 
+        nlp = nlp_engine_with_portuguese.nlp['pt']
+        for pipe in UNUSED_PIPES:
+            if pipe in nlp.pipe_names:
+                nlp.disable_pipe(pipe)
+
         analyzer = AnalyzerEngine(
             nlp_engine=nlp_engine_with_portuguese, supported_languages=['pt']
         )
@@ -188,22 +255,14 @@ class PresidioAnonymizer:
         for recognizer in recognizers:
             analyzer.registry.remove_recognizer(recognizer.name)
 
-        analyzer.registry.add_recognizer(custom_recognizer_celular)
-        analyzer.registry.add_recognizer(custom_recognizer_cpf)
-        analyzer.registry.add_recognizer(custom_recognizer_cnpj)
-        analyzer.registry.add_recognizer(custom_recognizer_rg)
-        analyzer.registry.add_recognizer(custom_recognizer_institutions)
-        analyzer.registry.add_recognizer(custom_recognizer_valor_reais)
-        analyzer.registry.add_recognizer(custom_recognizer_numero_processo)
-        analyzer.registry.add_recognizer(custom_recognizer_numero_edital)
-        analyzer.registry.add_recognizer(custom_recognizer_email)
-        analyzer.registry.add_recognizer(custom_recognizer_data)
-        analyzer.registry.add_recognizer(custom_recognizer_hora)
-        analyzer.registry.add_recognizer(custom_recognizer_cep)
+        for recognizer in PresidioAnonymizer._setup_recognizers():
+            analyzer.registry.add_recognizer(recognizer)
 
         return analyzer
 
-    def _anonymize_text(self, text, verbose=False, existing_mapping=None):
+    def _anonymize_text(
+        self, text, verbose=False, existing_mapping=None, analyzer_results=None
+    ):
         """
         Anonimiza o texto usando Presidio.
 
@@ -211,11 +270,13 @@ class PresidioAnonymizer:
             text (str): Texto a ser anonimizado
             verbose (bool): Se True, imprime informações de debug
             existing_mapping (dict): Mapeamento existente para manter consistência
+            analyzer_results (list): Entidades já detectadas para o texto
 
         Returns:
             tuple: (texto_anonimizado, mapeamento_entidades)
         """
-        results_portuguese = self.analyzer.analyze(text=text, language='pt')
+        if analyzer_results is None:
+            analyzer_results = self.analyzer.analyze(text=text, language='pt')
 
         if verbose:
             print(f'Texto a ser anonimizado: {text}')
@@ -223,13 +284,22 @@ class PresidioAnonymizer:
         entity_mapping = (
             existing_mapping.copy() if existing_mapping else dict()
         )
+        entity_counters = (
+            self.entity_counters
+            if existing_mapping is self.existing_presidio_mapping
+            else {}
+        )
 
         anonymization_result = self.engine.anonymize(
             text=text,
-            analyzer_results=results_portuguese,
+            analyzer_results=analyzer_results,
             operators={
                 'DEFAULT': OperatorConfig(
-                    'entity_counter', {'entity_mapping': entity_mapping}
+                    'entity_counter',
+                    {
+                        'entity_mapping': entity_mapping,
+                        'entity_counters': entity_counters,
+                    },
                 )
             },
         )
@@ -244,17 +314,30 @@ class PresidioAnonymizer:
         self,
         chunks: list[Document],
         verbose=False,
+        analyzer_results=None,
     ):
         """
         Anonimiza os chunks usando Presidio.
+
+        Se `analyzer_results` for informado (uma lista por chunk), a etapa
+        de análise é pulada e apenas a substituição é feita, em ordem, para
+        manter o mapeamento entre chunks consistente. Caso contrário, todos
+        os chunks são analisados numa única passada em lote (nlp.pipe).
         """
+        if analyzer_results is None:
+            analyzer_results = analyze_texts([
+                chunk.page_content for chunk in chunks
+            ])
 
         for index, chunk in enumerate(chunks):
             if verbose:
                 print(f'Anonimizando chunk {index}')
 
             anonymized_text, entity_mapping = self._anonymize_text(
-                chunk.page_content, verbose, self.existing_presidio_mapping
+                chunk.page_content,
+                verbose,
+                self.existing_presidio_mapping,
+                analyzer_results[index],
             )
             self.existing_presidio_mapping.update(entity_mapping)
             chunk.page_content = anonymized_text
@@ -262,3 +345,37 @@ class PresidioAnonymizer:
             chunk.metadata['anonymized'] = True
 
         return chunks
+
+
+def get_analyzer(engine: Optional[str] = None) -> Analyzer:
+    return _load_analyzer(engine or SETTINGS.ANONYMIZER_ENGINE)
+
+
+def get_batch_analyzer(engine: Optional[str] = None) -> BatchAnalyzer:
+    return _load_batch_analyzer(engine or SETTINGS.ANONYMIZER_ENGINE)
+
+
+@lru_cache
+def _load_analyzer(engine: str) -> Analyzer:
+    if engine == 'REGEX':
+        return RegexAnalyzer(PresidioAnonymizer._setup_recognizers())
+    return PresidioAnonymizer._setup_analyzer()
+
+
+@lru_cache
+def _load_batch_analyzer(engine: str) -> BatchAnalyzer:
+    analyzer = _load_analyzer(engine)
+    # O RegexAnalyzer não tem etapa de NLP para agrupar em lotes
+    if isinstance(analyzer, RegexAnalyzer):
+        return analyzer
+    return BatchAnalyzerEngine(analyzer_engine=analyzer)
+
+
+def analyze_texts(
+    texts: list[str],
+    batch_size: int = ANALYZER_BATCH_SIZE,
+    engine: Optional[str] = None,
+):
+    return get_batch_analyzer(engine).analyze_iterator(
+        texts, language='pt', batch_size=batch_size
+    )
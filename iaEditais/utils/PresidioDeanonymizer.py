@@ -1,67 +1,53 @@
-from typing import Dict
-
-from presidio_anonymizer import DeanonymizeEngine, OperatorConfig
-from presidio_anonymizer.entities import OperatorResult
-
-from iaEditais.utils.InstanceCounterDeanonymizer import (
-    InstanceCounterDeanonymizer,
-)
+import ast
+import json
+import re
+from typing import Dict, Optional
+
+# Todo placeholder gerado pelo InstanceCounterAnonymizer tem o formato
+# <TIPO_N>, então uma única expressão encontra todos numa passada pelo
+# texto, sem depender do tamanho do mapeamento.
+PLACEHOLDER_PATTERN = re.compile(r'<[A-Z][A-Z0-9_]*_\d+>')
+
+
+def parse_mapping(raw) -> Dict:
+    """Lê o presidio_mapping salvo, em JSON ou no antigo formato str(dict)."""
+    if not raw:
+        return {}
+    if isinstance(raw, dict):
+        return raw
+    try:
+        mapping = json.loads(raw)
+    except ValueError:
+        try:
+            mapping = ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            return {}
+    return mapping if isinstance(mapping, dict) else {}
 
 
 class PresidioDeanonymizer:
-    def __init__(self):
-        self.engine = DeanonymizeEngine()
+    def __init__(self, presidio_mapping: Optional[Dict] = None):
+        self.placeholders: Dict[str, str] = {}
+        if presidio_mapping:
+            self.add_mapping(presidio_mapping)
 
-        self.engine.add_deanonymizer(InstanceCounterDeanonymizer)
-
-    def _deanonymize_presidio_entities(
-        self, text: str, presidio_mapping: Dict
-    ) -> str:
-        if not presidio_mapping:
-            return text
-
-        anonymized_entities = []
-
-        for entity_type, entities in presidio_mapping.items():
+    def add_mapping(self, presidio_mapping: Dict) -> None:
+        for entities in presidio_mapping.values():
             for original_text, anonymized_identifier in entities.items():
-                start_pos = 0
-                while True:
-                    pos = text.find(anonymized_identifier, start_pos)
-                    if pos == -1:
-                        break
+                self.placeholders[anonymized_identifier] = original_text
 
-                    anonymized_entities.append(
-                        OperatorResult(
-                            start=pos,
-                            end=pos + len(anonymized_identifier),
-                            entity_type=entity_type,
-                        )
-                    )
-                    start_pos = pos + 1
+    def _replace(self, match: re.Match) -> str:
+        return self.placeholders.get(match.group(0), match.group(0))
 
-        if not anonymized_entities:
+    def deanonymize(self, text: Optional[str]) -> Optional[str]:
+        if not text or not self.placeholders:
             return text
+        return PLACEHOLDER_PATTERN.sub(self._replace, text)
 
-        deanonymized_result = self.engine.deanonymize(
-            text=text,
-            entities=anonymized_entities,
-            operators={
-                'DEFAULT': OperatorConfig(
-                    'entity_counter_deanonymizer',
-                    params={'entity_mapping': presidio_mapping},
-                )
-            },
-        )
-        return deanonymized_result.text
-
-    def deanonymize_feedback_object(
-        self, feedback_obj: Dict, presidio_mapping: Dict
-    ) -> Dict:
+    def deanonymize_feedback_object(self, feedback_obj: Dict) -> Dict:
         result = feedback_obj.copy()
 
         if 'feedback' in result:
-            result['feedback'] = self._deanonymize_presidio_entities(
-                result['feedback'], presidio_mapping
-            )
+            result['feedback'] = self.deanonymize(result['feedback'])
 
         return result
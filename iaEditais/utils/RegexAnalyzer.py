@@ -0,0 +1,55 @@
+import re
+from typing import Iterable, List, Optional
+
+from presidio_analyzer import (
+    EntityRecognizer,
+    PatternRecognizer,
+    RecognizerResult,
+)
+
+
+class RegexAnalyzer:
+    """
+    Analisador sem NLP para os recognizers de padrão/deny-list.
+
+    Todos os padrões são compilados uma única vez e varridos diretamente
+    sobre o texto, sem carregar o spaCy nem montar NlpArtifacts. O
+    resultado é o mesmo do AnalyzerEngine: cada padrão é avaliado de forma
+    independente (um mesmo trecho pode casar com mais de um tipo) e as
+    sobreposições são resolvidas por `EntityRecognizer.remove_duplicates`,
+    deixando o restante dos conflitos para o AnonymizerEngine, como antes.
+    """
+
+    def __init__(self, recognizers: List[PatternRecognizer]):
+        self.scanners = [
+            (
+                recognizer.supported_entities[0],
+                re.compile(pattern.regex, flags=recognizer.global_regex_flags),
+                pattern.score,
+            )
+            for recognizer in recognizers
+            for pattern in recognizer.patterns
+        ]
+
+    def analyze(
+        self, text: str, language: str = 'pt', **kwargs
+    ) -> List[RecognizerResult]:
+        results = []
+        for entity_type, compiled, score in self.scanners:
+            for match in compiled.finditer(text):
+                start, end = match.span()
+                if start == end:
+                    continue
+                results.append(
+                    RecognizerResult(entity_type, start, end, score)
+                )
+        return EntityRecognizer.remove_duplicates(results)
+
+    def analyze_iterator(
+        self,
+        texts: Iterable[str],
+        language: str = 'pt',
+        batch_size: Optional[int] = None,
+        **kwargs,
+    ) -> List[List[RecognizerResult]]:
+        return [self.analyze(str(text), language) for text in texts]
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import signal
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from iaEditais.core.database import async_session
+from iaEditais.core.job_queue import get_job_queue
+from iaEditais.core.llm import model
+from iaEditais.core.settings import Settings
+from iaEditais.core.vectorstore import vectorstore
+from iaEditais.repositories import chunk_repo
+from iaEditais.services import anonymization_service
+from iaEditais.workers.docs.releases import release_pipeline
+from iaEditais.workers.runner import run_worker
+
+SETTINGS = Settings()
+
+logging.basicConfig(
+    level=SETTINGS.LOG_LEVEL, format='%(levelname)s: %(message)s'
+)
+
+
+async def main() -> None:
+    redis = Redis.from_url(SETTINGS.CACHE_URL)
+    # O índice de janelas de chunks depende das tabelas do PGVector
+    await chunk_repo.ensure_indexes(vectorstore)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async def handle_release_job(payload: dict) -> None:
+        # Cada job tem sua própria sessão, independente de qualquer request
+        async with async_session() as session:
+            await release_pipeline(
+                release_id=UUID(payload['release_id']),
+                session=session,
+                model=model,
+                vstore=vectorstore,
+                redis=redis,
+            )
+
+    try:
+        await run_worker(
+            get_job_queue(),
+            handle_release_job,
+            concurrency=SETTINGS.WORKER_CONCURRENCY,
+            stop=stop,
+        )
+    finally:
+        anonymization_service.shutdown()
+        await redis.aclose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import socket
+from typing import Awaitable, Callable, Optional
+from uuid import uuid4
+
+from redis.exceptions import RedisError
+
+from iaEditais.core.job_queue import Job, JobQueue
+
+logger = logging.getLogger(__name__)
+
+FETCH_RETRY_DELAY = 1
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+def default_consumer_name() -> str:
+    return f'{socket.gethostname()}-{uuid4().hex[:8]}'
+
+
+async def _heartbeat(queue: JobQueue, job: Job, consumer: str) -> None:
+    # Renova a visibilidade enquanto o job ainda está sendo processado
+    while True:
+        await asyncio.sleep(queue.visibility_timeout / 3)
+        await queue.touch(job, consumer)
+
+
+async def process_job(
+    queue: JobQueue, handler: Handler, job: Job, consumer: str
+) -> None:
+    heartbeat = asyncio.create_task(_heartbeat(queue, job, consumer))
+    try:
+        await handler(job.payload)
+    except Exception as e:
+        logger.exception('Job %s falhou (tentativa %s)', job.id, job.attempts)
+        await queue.retry(job, repr(e))
+    else:
+        await queue.ack(job)
+    finally:
+        heartbeat.cancel()
+
+
+async def run_worker(
+    queue: JobQueue,
+    handler: Handler,
+    concurrency: int,
+    stop: Optional[asyncio.Event] = None,
+    block: float = 5,
+) -> None:
+    consumer = default_consumer_name()
+    stop = stop or asyncio.Event()
+    tasks: set[asyncio.Task] = set()
+
+    while not stop.is_set():
+        free = concurrency - len(tasks)
+        if free <= 0:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            continue
+
+        # Uma falha do Redis (failover, restart) não derruba o worker
+        try:
+            jobs = await queue.fetch(consumer, count=free, block=block)
+        except RedisError as e:
+            logger.warning('Job queue fetch failed: %s', e)
+            await asyncio.sleep(FETCH_RETRY_DELAY)
+            continue
+
+        for job in jobs:
+            task = asyncio.create_task(
+                process_job(queue, handler, job, consumer)
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    # Jobs em andamento terminam antes do worker sair
+    if tasks:
+        await asyncio.gather(*tasks)
@@ -0,0 +1,45 @@
+"""indice de janela de chunks
+
+Revision ID: 5f2c8e1a9b3d
+Revises: 949464c31090
+Create Date: 2026-10-18 10:12:41.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f2c8e1a9b3d'
+down_revision: Union[str, Sequence[str], None] = '949464c31090'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # langchain_pg_embedding é criada pelo langchain_postgres sob demanda
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF to_regclass('langchain_pg_embedding') IS NOT NULL THEN
+                CREATE INDEX IF NOT EXISTS
+                    ix_langchain_pg_embedding_source_chunk_index
+                ON langchain_pg_embedding (
+                    (cmetadata ->> 'source'),
+                    ((cmetadata ->> 'chunk_index')::integer)
+                );
+            END IF;
+        END $$;
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        'DROP INDEX IF EXISTS ix_langchain_pg_embedding_source_chunk_index'
+    )
@@ -0,0 +1,46 @@
+"""checkpoint do pipeline de releases
+
+Revision ID: 7a3d9c4e2f10
+Revises: 5f2c8e1a9b3d
+Create Date: 2026-10-18 14:03:27.215904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3d9c4e2f10'
+down_revision: Union[str, Sequence[str], None] = '5f2c8e1a9b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'document_releases',
+        sa.Column('pipeline_stage', sa.String(), nullable=True),
+    )
+    op.add_column(
+        'document_releases',
+        sa.Column(
+            'pipeline_state',
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=True,
+        ),
+    )
+    # Releases que já têm descrição passaram por todo o pipeline
+    op.execute(
+        "UPDATE document_releases SET pipeline_stage = 'COMPLETED' "
+        'WHERE description IS NOT NULL'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('document_releases', 'pipeline_state')
+    op.drop_column('document_releases', 'pipeline_stage')
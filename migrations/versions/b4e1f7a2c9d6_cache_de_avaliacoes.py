@@ -0,0 +1,36 @@
+"""cache de avaliacoes
+
+Revision ID: b4e1f7a2c9d6
+Revises: 7a3d9c4e2f10
+Create Date: 2026-10-18 16:41:09.337152
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e1f7a2c9d6'
+down_revision: Union[str, Sequence[str], None] = '7a3d9c4e2f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'applied_branches',
+        sa.Column(
+            'cache_hit',
+            sa.Boolean(),
+            server_default=sa.false(),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('applied_branches', 'cache_hit')
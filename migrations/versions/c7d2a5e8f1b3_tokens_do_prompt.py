@@ -0,0 +1,31 @@
+"""tokens do prompt
+
+Revision ID: c7d2a5e8f1b3
+Revises: b4e1f7a2c9d6
+Create Date: 2026-10-18 18:22:51.604731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2a5e8f1b3'
+down_revision: Union[str, Sequence[str], None] = 'b4e1f7a2c9d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'applied_branches',
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('applied_branches', 'prompt_tokens')
@@ -0,0 +1,31 @@
+"""nome original da release
+
+Revision ID: d1e4b7c2a9f5
+Revises: c7d2a5e8f1b3
+Create Date: 2026-10-18 21:05:13.284610
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1e4b7c2a9f5'
+down_revision: Union[str, Sequence[str], None] = 'c7d2a5e8f1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'document_releases',
+        sa.Column('original_filename', sa.String(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('document_releases', 'original_filename')
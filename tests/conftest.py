@@ -29,6 +29,7 @@ from iaEditais.core.cache import (
     get_socket_manager,
 )
 from iaEditais.core.database import get_session
+from iaEditais.core.job_queue import MemoryJobQueue, get_job_queue
 from iaEditais.core.llm import get_model
 from iaEditais.core.security import (
     create_access_token,
@@ -47,6 +48,7 @@ from iaEditais.models import (
     Typification,
     table_registry,
 )
+from iaEditais.repositories import doc_repo
 from iaEditais.schemas import DocumentStatus, MessageEntityType
 from tests.factories import (
     BranchFactory,
@@ -99,8 +101,13 @@ async def session(engine):
         await conn.run_sync(table_registry.metadata.drop_all)
 
 
+@pytest.fixture
+def job_queue():
+    return MemoryJobQueue()
+
+
 @pytest_asyncio.fixture
-async def client(session, engine, cache):
+async def client(session, engine, cache, job_queue):
     async def get_vstore_override():
         vectorstore = PGVector(
             embeddings=FakeEmbeddings(size=256),
@@ -156,6 +163,7 @@ async def client(session, engine, cache):
             get_socket_manager_override
         )
         app.dependency_overrides[get_redis] = get_redis_override
+        app.dependency_overrides[get_job_queue] = lambda: job_queue
 
         yield client
 
@@ -193,6 +201,30 @@ def mock_db_time():
     return _mock_db_time
 
 
+@pytest.fixture
+def count_queries(engine):
+    # Registra os SQL emitidos no bloco (inclusive pelas rotas do `client`)
+    @contextmanager
+    def _count_queries():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sync_engine = engine.sync_engine
+        event.listen(
+            sync_engine, 'before_cursor_execute', before_cursor_execute
+        )
+        try:
+            yield statements
+        finally:
+            event.remove(
+                sync_engine, 'before_cursor_execute', before_cursor_execute
+            )
+
+    return _count_queries
+
+
 @pytest_asyncio.fixture
 def create_unit(session):
     async def _create_unit(**kwargs):
@@ -324,8 +356,7 @@ def create_doc(session, create_unit):
             doc.typifications = [typ for typ in typifications.all()]
 
         await session.commit()
-        await session.refresh(doc)
-        return doc
+        return await doc_repo.get_by_id(session, doc.id)
 
     return _create_doc
 
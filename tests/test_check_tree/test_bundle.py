@@ -3,8 +3,11 @@ from http import HTTPStatus
 
 import pytest
 
+from iaEditais.models import DocumentHistory, DocumentMessage, Unit
 from iaEditais.schemas.bundle import BundlePublic
 
+BUNDLE_DOCS = 5
+
 
 @pytest.mark.asyncio
 async def test_create_bundle(logged_client):
@@ -377,3 +380,67 @@ async def test_generate_bundle_documents_conflict(
     assert response.json() == {
         'detail': 'Doc with identifier "EXP-EDITAL" already exists.'
     }
+
+
+@pytest.mark.asyncio
+async def test_generate_bundle_documents_loads_only_public_fields(
+    logged_client, count_queries, create_bundle
+):
+    client, *_ = await logged_client()
+    bundle = await create_bundle()
+    client.post(
+        f'/bundle/{bundle.id}/document',
+        json={'name': 'Edital', 'typification_ids': []},
+    )
+
+    with count_queries() as queries:
+        response = client.post(
+            f'/bundle/{bundle.id}/generate-documents',
+            json={
+                'base_name': 'Reforma',
+                'base_identifier': 'REF',
+                'base_description': 'Descricao padrao',
+            },
+        )
+
+    assert response.status_code == HTTPStatus.CREATED
+    assert response.json()[0]['history'][0]['status'] == 'PENDING'
+    for table in (DocumentMessage.__tablename__, Unit.__tablename__):
+        assert not any(f'FROM {table}' in query for query in queries)
+
+
+@pytest.mark.asyncio
+async def test_generate_bundle_documents_reload_does_not_grow(
+    logged_client, count_queries, create_bundle
+):
+    client, *_ = await logged_client()
+
+    async def _generate(n_docs: int, base_identifier: str) -> list[str]:
+        bundle = await create_bundle()
+        for i in range(n_docs):
+            client.post(
+                f'/bundle/{bundle.id}/document',
+                json={'name': f'Documento {i}', 'typification_ids': []},
+            )
+
+        with count_queries() as queries:
+            response = client.post(
+                f'/bundle/{bundle.id}/generate-documents',
+                json={
+                    'base_name': 'Reforma',
+                    'base_identifier': base_identifier,
+                    'base_description': 'Descricao padrao',
+                },
+            )
+        assert response.status_code == HTTPStatus.CREATED
+        assert len(response.json()) == n_docs
+        return queries
+
+    one_doc = await _generate(1, 'ONE')
+    many_docs = await _generate(BUNDLE_DOCS, 'MANY')
+
+    # Os documentos gerados são recarregados de uma vez, não um a um
+    table = f'FROM {DocumentHistory.__tablename__}'
+    assert sum(table in query for query in many_docs) == sum(
+        table in query for query in one_doc
+    )
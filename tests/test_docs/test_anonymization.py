@@ -0,0 +1,218 @@
+import copy
+
+import pytest
+from langchain_core.documents import Document
+
+from iaEditais.services import anonymization_service
+from iaEditais.utils import PresidioAnonymizer as presidio
+from iaEditais.utils.InstanceCounterAnonymizer import InstanceCounterAnonymizer
+from iaEditais.utils.PresidioAnonymizer import PresidioAnonymizer
+from iaEditais.utils.RegexAnalyzer import RegexAnalyzer
+
+TEXTS = [
+    'CPF 123.456.789-09 em 01/02/2024, valor de R$ 1.000,00.',
+    'A Fiocruz, CEP 21040-360, confirmou o CPF 123.456.789-09.',
+    'Trecho sem dados sensíveis.',
+    'Contato: edital@fiocruz.br às 10:30 ou (21) 98765-4321.',
+]
+
+OVERLAPPING_TEXTS = [
+    # CPF x RG x telefone no mesmo trecho numérico
+    'Documento 12.345.678-9, CPF 12345678909 e fone 12345678909.',
+    # Processo x edital x data sobrepostos
+    'Processo 25380.000123/2024-11, Edital 123/2024 de 31/12/2024.',
+    'CNPJ 33.781.055/0001-35, Fundação Oswaldo Cruz e FIOCRUZ.',
+    'Ministério da Saúde/ANVISA: R$ 12.345,67 até 23:59, CEP 21040360.',
+]
+
+
+def _chunks() -> list[Document]:
+    return [Document(page_content=text) for text in TEXTS]
+
+
+def _dump(chunks: list[Document]) -> list[tuple[str, dict]]:
+    return [(chunk.page_content, chunk.metadata) for chunk in chunks]
+
+
+def _spans(results) -> list[tuple]:
+    return sorted((r.entity_type, r.start, r.end, r.score) for r in results)
+
+
+def _anonymize_per_chunk(
+    chunks: list[Document], engine: str = 'SPACY'
+) -> list[Document]:
+    anonymizer = PresidioAnonymizer()
+    analyzer = presidio.get_analyzer(engine)
+    for chunk in chunks:
+        text, mapping = anonymizer._anonymize_text(
+            chunk.page_content,
+            existing_mapping=anonymizer.existing_presidio_mapping,
+            analyzer_results=analyzer.analyze(
+                text=chunk.page_content, language='pt'
+            ),
+        )
+        anonymizer.existing_presidio_mapping.update(mapping)
+        chunk.page_content = text
+        chunk.metadata['presidio_mapping'] = mapping
+        chunk.metadata['anonymized'] = True
+    return chunks
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('backend', ['THREAD', 'PROCESS'])
+@pytest.mark.parametrize('engine', ['SPACY', 'REGEX'])
+async def test_anonymization_backends_match_sequential(
+    monkeypatch, backend, engine
+):
+    monkeypatch.setattr(
+        anonymization_service.SETTINGS, 'ANONYMIZER_BACKEND', backend
+    )
+    monkeypatch.setattr(
+        anonymization_service.SETTINGS, 'ANONYMIZER_ENGINE', engine
+    )
+    expected = _anonymize_per_chunk(_chunks())
+
+    try:
+        result = await anonymization_service.anonymize_chunks(_chunks())
+    finally:
+        anonymization_service.shutdown()
+
+    assert _dump(result) == _dump(expected)
+
+
+def test_analyzer_is_shared_between_instances():
+    assert PresidioAnonymizer().analyzer is PresidioAnonymizer().analyzer
+
+
+def test_batch_analysis_runs_one_nlp_pass(monkeypatch):
+    chunks = [
+        Document(page_content=TEXTS[i % len(TEXTS)] * 8) for i in range(400)
+    ]
+    nlp_engine = presidio.get_analyzer('SPACY').nlp_engine
+    calls = {'process_text': 0, 'process_batch': 0}
+
+    def count(name):
+        method = getattr(nlp_engine, name)
+
+        def _counted(*args, **kwargs):
+            calls[name] += 1
+            return method(*args, **kwargs)
+
+        monkeypatch.setattr(nlp_engine, name, _counted)
+
+    count('process_text')
+    count('process_batch')
+
+    expected = _anonymize_per_chunk([c.model_copy(deep=True) for c in chunks])
+    # Uma passada do spaCy por chunk no loop antigo
+    assert calls == {'process_text': len(chunks), 'process_batch': 0}
+
+    calls.update(process_text=0, process_batch=0)
+    result = PresidioAnonymizer().anonymize_chunks(
+        [c.model_copy(deep=True) for c in chunks],
+        analyzer_results=presidio.analyze_texts(
+            [c.page_content for c in chunks], engine='SPACY'
+        ),
+    )
+    assert calls == {'process_text': 0, 'process_batch': 1}
+
+    assert _dump(result) == _dump(expected)
+
+
+@pytest.mark.parametrize('text', TEXTS + OVERLAPPING_TEXTS)
+def test_regex_engine_matches_presidio(text):
+    spacy_results = presidio.get_analyzer('SPACY').analyze(
+        text=text, language='pt'
+    )
+    regex_results = presidio.get_analyzer('REGEX').analyze(
+        text=text, language='pt'
+    )
+    assert _spans(regex_results) == _spans(spacy_results)
+
+    chunks = [Document(page_content=text)]
+    assert _dump(_anonymize_per_chunk(chunks, 'REGEX')) == _dump(
+        _anonymize_per_chunk([Document(page_content=text)], 'SPACY')
+    )
+
+
+@pytest.mark.asyncio
+async def test_regex_engine_does_not_load_spacy(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('spaCy não deveria ser carregado')
+
+    monkeypatch.setattr(presidio, 'NlpEngineProvider', fail)
+    monkeypatch.setattr(
+        anonymization_service.SETTINGS, 'ANONYMIZER_ENGINE', 'REGEX'
+    )
+
+    result = await anonymization_service.anonymize_chunks(_chunks())
+
+    assert isinstance(presidio.get_analyzer('REGEX'), RegexAnalyzer)
+    assert all(chunk.metadata['anonymized'] for chunk in result)
+
+
+def test_regex_engine_matches_spacy_in_bulk():
+    samples = TEXTS + OVERLAPPING_TEXTS
+    texts = [samples[i % len(samples)] * 8 for i in range(400)]
+
+    expected = presidio.analyze_texts(texts, engine='SPACY')
+    result = presidio.analyze_texts(texts, engine='REGEX')
+
+    assert [_spans(r) for r in result] == [_spans(r) for r in expected]
+
+
+def _add_entities(entity_mapping, texts, entity_counters=None) -> dict:
+    operator = InstanceCounterAnonymizer()
+    for text in texts:
+        params = {'entity_type': 'DATE', 'entity_mapping': entity_mapping}
+        if entity_counters is not None:
+            params['entity_counters'] = entity_counters
+        operator.operate(text, params)
+    return entity_mapping
+
+
+def test_entity_counter_scans_mapping_once(monkeypatch):
+    total = 12_000
+    base = _add_entities({}, [f'{i:05d}' for i in range(total)], {})
+
+    scans = []
+    get_last_index = InstanceCounterAnonymizer._get_last_index
+
+    def counting_get_last_index(entity_mapping_for_type):
+        scans.append(len(entity_mapping_for_type))
+        return get_last_index(entity_mapping_for_type)
+
+    monkeypatch.setattr(
+        InstanceCounterAnonymizer,
+        '_get_last_index',
+        staticmethod(counting_get_last_index),
+    )
+
+    # Sem contadores cada entidade nova percorre todo o mapeamento do tipo
+    extra = [f'extra-{i}' for i in range(200)]
+    expected = _add_entities(copy.deepcopy(base), extra)
+    assert len(scans) == len(extra)
+
+    scans.clear()
+    result = _add_entities(copy.deepcopy(base), extra, {})
+    assert scans == [total]
+
+    assert result == expected
+    assert result['DATE']['extra-199'] == f'<DATE_{total + len(extra) - 1}>'
+
+
+def test_entity_counter_resumes_stored_mapping():
+    # Mapeamento legado, gravado nos metadados sem contadores
+    stored = {'CPF': {'111': '<CPF_0>', '222': '<CPF_7>'}}
+    anonymizer = PresidioAnonymizer()
+    anonymizer.existing_presidio_mapping = stored
+
+    anonymizer.anonymize_chunks(
+        [Document(page_content='CPF 123.456.789-09 e 987.654.321-00.')],
+        analyzer_results=presidio.analyze_texts(
+            ['CPF 123.456.789-09 e 987.654.321-00.'], engine='REGEX'
+        ),
+    )
+
+    assert anonymizer.entity_counters == {'CPF': 10}
+    assert set(stored['CPF'].values()) >= {'<CPF_8>', '<CPF_9>'}
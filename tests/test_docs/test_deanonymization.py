@@ -0,0 +1,85 @@
+import json
+from types import SimpleNamespace
+from uuid import uuid4
+
+from iaEditais.schemas import ReleasePipelineStage
+from iaEditais.services import deanonymization_service
+from iaEditais.utils.PresidioDeanonymizer import (
+    PresidioDeanonymizer,
+    parse_mapping,
+)
+
+MAPPING = {
+    'CPF': {'123.456.789-09': '<CPF_0>', '987.654.321-00': '<CPF_1>'},
+    'DATE': {'01/02/2024': '<DATE_0>'},
+}
+
+
+def test_deanonymize_restores_every_placeholder():
+    deanonymizer = PresidioDeanonymizer(MAPPING)
+
+    text = 'CPF <CPF_1> e <CPF_0> em <DATE_0>; <CPF_1> de novo, <CPF_9>.'
+
+    assert deanonymizer.deanonymize(text) == (
+        'CPF 987.654.321-00 e 123.456.789-09 em 01/02/2024; '
+        '987.654.321-00 de novo, <CPF_9>.'
+    )
+
+
+def test_parse_mapping_accepts_json_and_legacy_repr():
+    assert parse_mapping('{"CPF": {"1": "<CPF_0>"}}') == {
+        'CPF': {'1': '<CPF_0>'}
+    }
+    assert parse_mapping(str(MAPPING)) == MAPPING
+    assert parse_mapping('None') == {}
+    assert parse_mapping(None) == {}
+
+
+def test_deanonymize_large_mapping_matches_scan():
+    total = 12_000
+    mapping = {'DATE': {f'{i:05d}': f'<DATE_{i}>' for i in range(total)}}
+    text = ' '.join(f'<DATE_{i}>' for i in range(0, total, 7)) * 4
+    deanonymizer = PresidioDeanonymizer(mapping)
+
+    # Referência: uma busca no texto inteiro por entidade mapeada
+    expected = text
+    for original_text, placeholder in mapping['DATE'].items():
+        if placeholder in expected:
+            expected = expected.replace(placeholder, original_text)
+
+    assert deanonymizer.deanonymize(text) == expected
+
+
+def _release(stage: ReleasePipelineStage, mapping: dict) -> SimpleNamespace:
+    branch = SimpleNamespace(presidio_mapping=json.dumps(mapping))
+    taxonomy = SimpleNamespace(branches=[branch])
+    return SimpleNamespace(
+        id=uuid4(),
+        pipeline_stage=stage.value,
+        check_tree=[SimpleNamespace(taxonomies=[taxonomy])],
+    )
+
+
+def test_release_deanonymizer_cached_by_release_and_stage():
+    release = _release(ReleasePipelineStage.COMPLETED, MAPPING)
+    deanonymizer = deanonymization_service.get_release_deanonymizer(release)
+
+    assert deanonymizer.deanonymize('<DATE_0>') == '01/02/2024'
+    assert (
+        deanonymization_service.get_release_deanonymizer(release)
+        is deanonymizer
+    )
+
+
+def test_release_deanonymizer_not_cached_while_processing():
+    release = _release(ReleasePipelineStage.SAVED, MAPPING)
+    first = deanonymization_service.get_release_deanonymizer(release)
+
+    # O ramo reavaliado ganha um mapeamento novo antes de concluir
+    release.check_tree[0].taxonomies[0].branches[
+        0
+    ].presidio_mapping = json.dumps({'CPF': {'111.111.111-11': '<CPF_0>'}})
+    second = deanonymization_service.get_release_deanonymizer(release)
+
+    assert second is not first
+    assert second.deanonymize('<CPF_0>') == '111.111.111-11'
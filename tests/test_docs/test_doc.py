@@ -4,8 +4,26 @@ from uuid import uuid4
 
 import pytest
 
+from iaEditais.models import Bundle, DocumentMessage, Unit
 from iaEditais.schemas import DocumentPublic
 
+DOCS = 5
+# Relacionamentos do documento fora do DocumentPublic
+UNLOADED_TABLES = (
+    DocumentMessage.__tablename__,
+    Unit.__tablename__,
+    Bundle.__tablename__,
+)
+
+
+def _loaded_tables(queries):
+    return {
+        table
+        for table in UNLOADED_TABLES
+        for query in queries
+        if f'FROM {table}' in query
+    }
+
 
 @pytest.mark.asyncio
 async def test_create_doc(logged_client):
@@ -94,6 +112,55 @@ async def test_read_doc_by_id(client, create_doc):
     assert data['name'] == 'Doc Specific'
 
 
+@pytest.mark.asyncio
+async def test_read_docs_query_count_does_not_grow(
+    logged_client,
+    session,
+    count_queries,
+    create_doc,
+    create_typification,
+    create_message,
+):
+    client, *_, user = await logged_client()
+    typification = await create_typification()
+    doc = await create_doc(typification_ids=[typification.id])
+    await create_message(doc, author_id=user.id)
+
+    # A rota usa a mesma sessão; sem expirar, os documentos já carregados
+    # pelas fixtures não disparariam consultas
+    session.expire_all()
+    with count_queries() as one_doc:
+        response = client.get('/doc')
+    assert len(response.json()['documents']) == 1
+
+    for _ in range(DOCS - 1):
+        doc = await create_doc(typification_ids=[typification.id])
+        await create_message(doc, author_id=user.id)
+
+    session.expire_all()
+    with count_queries() as many_docs:
+        response = client.get('/doc')
+    assert len(response.json()['documents']) == DOCS
+
+    assert len(many_docs) == len(one_doc)
+    assert not _loaded_tables(many_docs)
+
+
+@pytest.mark.asyncio
+async def test_read_doc_by_id_loads_only_public_fields(
+    client, count_queries, create_doc, create_typification
+):
+    typification = await create_typification()
+    doc = await create_doc(typification_ids=[typification.id])
+
+    with count_queries() as queries:
+        response = client.get(f'/doc/{doc.id}')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['typifications'][0]['id'] == str(typification.id)
+    assert not _loaded_tables(queries)
+
+
 def test_read_nonexistent_doc(client):
     response = client.get(f'/doc/{uuid.uuid4()}')
     assert response.status_code == HTTPStatus.NOT_FOUND
@@ -4,6 +4,10 @@ from http import HTTPStatus
 
 import pytest
 
+from iaEditais.models import DocumentMessage, Unit
+
+HISTORY_AFTER_UPDATE = 2
+
 
 @pytest.mark.asyncio
 async def test_set_status_pending(logged_client, create_doc):
@@ -77,3 +81,20 @@ async def test_set_status_on_deleted_doc(logged_client, create_doc, session):
 
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert response.json() == {'detail': 'Document not found'}
+
+
+@pytest.mark.asyncio
+async def test_set_status_loads_only_public_fields(
+    logged_client, count_queries, create_doc, create_message
+):
+    client, *_, user = await logged_client()
+    doc = await create_doc(name='Doc Kanban', identifier='ST-QUERY')
+    await create_message(doc, author_id=user.id)
+
+    with count_queries() as queries:
+        response = client.put(f'/doc/{doc.id}/status/under-construction')
+
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.json()['history']) == HISTORY_AFTER_UPDATE
+    for table in (DocumentMessage.__tablename__, Unit.__tablename__):
+        assert not any(f'FROM {table}' in query for query in queries)
@@ -1,8 +1,23 @@
 import io
+import json
 import uuid
 from http import HTTPStatus
 
 import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from iaEditais.models import (
+    AppliedBranch,
+    AppliedTaxonomy,
+    AppliedTypification,
+    Bundle,
+    DocumentMessage,
+    Unit,
+)
+from iaEditais.schemas import (
+    DocumentProcessingStatus,
+    ReleasePipelineStage,
+)
 
 
 @pytest.mark.asyncio
@@ -37,11 +52,72 @@ async def test_create_release(
     data = response.json()
     assert 'id' in data
     assert 'file_path' in data
+    assert data['original_filename'] == 'test_release.txt'
     assert data['file_path'].endswith('.txt')
 
     # WIP - Voltar pra testar se salvou o arquivo no lugar certo
 
 
+@pytest.mark.asyncio
+async def test_create_release_enqueues_pipeline_job(
+    logged_client, create_doc, create_typification, job_queue
+):
+    typification = await create_typification()
+    client, *_ = await logged_client()
+    doc = await create_doc(
+        name='Doc na fila',
+        identifier='REL-QUEUE',
+        typification_ids=[typification.id],
+    )
+
+    response = client.post(
+        f'/doc/{doc.id}/release',
+        files={'file': ('fila.txt', io.BytesIO(b'conteudo da fila'))},
+    )
+
+    assert response.status_code == HTTPStatus.CREATED
+    [job] = job_queue.ready
+    assert job.payload == {'release_id': response.json()['id']}
+
+
+@pytest.mark.asyncio
+async def test_create_release_enqueue_failure_marks_failed(
+    logged_client,
+    session,
+    create_doc,
+    create_typification,
+    job_queue,
+    monkeypatch,
+):
+    typification = await create_typification()
+    client, *_ = await logged_client()
+    doc = await create_doc(
+        name='Doc sem fila',
+        identifier='REL-NO-QUEUE',
+        typification_ids=[typification.id],
+    )
+
+    async def fail(payload):
+        raise RedisConnectionError('redis fora do ar')
+
+    monkeypatch.setattr(job_queue, 'enqueue', fail)
+    response = client.post(
+        f'/doc/{doc.id}/release',
+        files={'file': ('fila.txt', io.BytesIO(b'conteudo da fila'))},
+    )
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    await session.refresh(doc)
+    assert doc.processing_status == DocumentProcessingStatus.FAILED
+
+    # Com a fila de volta a release pode ser retomada
+    monkeypatch.undo()
+    [release] = client.get(f'/doc/{doc.id}/release').json()['releases']
+    response = client.post(f'/doc/{doc.id}/release/{release["id"]}/resume')
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert len(job_queue.ready) == 1
+
+
 @pytest.mark.asyncio
 async def test_create_release_doc_not_found(logged_client):
     client, *_ = await logged_client()
@@ -154,3 +230,294 @@ async def test_delete_release_from_wrong_doc(
     assert response.json() == {
         'detail': 'File not found or does not belong to this document.'
     }
+
+
+@pytest.mark.asyncio
+async def test_read_releases_restores_placeholders(
+    logged_client, session, create_doc, create_release, create_typification
+):
+    client, *_ = await logged_client()
+    typification = await create_typification()
+    doc = await create_doc(
+        name='Doc Anonimizado',
+        identifier='REL-ANON',
+        typification_ids=[typification.id],
+    )
+    release = await create_release(doc)
+
+    app_typ = AppliedTypification(name='Typ', applied_release_id=release.id)
+    session.add(app_typ)
+    await session.flush()
+    app_tax = AppliedTaxonomy(
+        title='Tax', description='Desc', applied_typification_id=app_typ.id
+    )
+    session.add(app_tax)
+    await session.flush()
+    session.add_all([
+        AppliedBranch(
+            title='Novo',
+            description='Mapeamento em JSON',
+            applied_taxonomy_id=app_tax.id,
+            feedback='CPF <CPF_0> citado.',
+            fulfilled=True,
+            score=10,
+            presidio_mapping=json.dumps({
+                'CPF': {'123.456.789-09': '<CPF_0>'}
+            }),
+        ),
+        AppliedBranch(
+            title='Legado',
+            description='Mapeamento salvo como str(dict)',
+            applied_taxonomy_id=app_tax.id,
+            feedback='Prazo em <DATE_0>.',
+            fulfilled=False,
+            score=0,
+            presidio_mapping=str({'DATE': {'01/02/2024': '<DATE_0>'}}),
+        ),
+    ])
+    await session.commit()
+
+    response = client.get(f'/doc/{doc.id}/release')
+
+    assert response.status_code == HTTPStatus.OK
+    [release_data] = response.json()['releases']
+    branches = release_data['check_tree'][0]['taxonomies'][0]['branches']
+    feedbacks = {b['title']: b['evaluation']['feedback'] for b in branches}
+    assert feedbacks == {
+        'Novo': 'CPF 123.456.789-09 citado.',
+        'Legado': 'Prazo em 01/02/2024.',
+    }
+
+
+@pytest.mark.asyncio
+async def test_resume_release_enqueues_pipeline_job(
+    logged_client,
+    session,
+    create_doc,
+    create_release,
+    create_typification,
+    job_queue,
+):
+    client, *_ = await logged_client()
+    typification = await create_typification()
+    doc = await create_doc(
+        name='Doc com falha',
+        identifier='REL-RESUME',
+        typification_ids=[typification.id],
+    )
+    release = await create_release(doc)
+    release.pipeline_stage = ReleasePipelineStage.RETRIEVED.value
+    doc.processing_status = DocumentProcessingStatus.FAILED
+    await session.commit()
+
+    response = client.post(f'/doc/{doc.id}/release/{release.id}/resume')
+
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert response.json()['pipeline_stage'] == 'RETRIEVED'
+    [job] = job_queue.ready
+    assert job.payload == {'release_id': str(release.id)}
+    await session.refresh(doc)
+    assert doc.processing_status == DocumentProcessingStatus.QUEUED
+
+
+@pytest.mark.asyncio
+async def test_resume_completed_release(
+    logged_client, session, create_doc, create_release, create_typification
+):
+    client, *_ = await logged_client()
+    typification = await create_typification()
+    doc = await create_doc(
+        name='Doc completo',
+        identifier='REL-DONE',
+        typification_ids=[typification.id],
+    )
+    release = await create_release(doc)
+    release.pipeline_stage = ReleasePipelineStage.COMPLETED.value
+    await session.commit()
+
+    response = client.post(f'/doc/{doc.id}/release/{release.id}/resume')
+
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert response.json() == {'detail': 'Release already processed.'}
+
+
+@pytest.mark.asyncio
+async def test_resume_release_already_queued(
+    logged_client,
+    session,
+    create_doc,
+    create_release,
+    create_typification,
+    job_queue,
+):
+    client, *_ = await logged_client()
+    typification = await create_typification()
+    doc = await create_doc(
+        name='Doc na fila',
+        identifier='REL-QUEUED',
+        typification_ids=[typification.id],
+    )
+    release = await create_release(doc)
+    release.pipeline_stage = ReleasePipelineStage.RETRIEVED.value
+    doc.processing_status = DocumentProcessingStatus.FAILED
+    await session.commit()
+
+    response = client.post(f'/doc/{doc.id}/release/{release.id}/resume')
+    assert response.status_code == HTTPStatus.ACCEPTED
+
+    response = client.post(f'/doc/{doc.id}/release/{release.id}/resume')
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert response.json() == {
+        'detail': 'Release is already queued or processing.'
+    }
+    assert len(job_queue.ready) == 1
+
+
+@pytest.mark.asyncio
+async def test_read_release_caches_completed_tree(
+    logged_client, session, create_doc, create_release, create_typification
+):
+    client, *_ = await logged_client()
+    typification = await create_typification()
+    doc = await create_doc(
+        name='Doc em cache',
+        identifier='REL-CACHE',
+        typification_ids=[typification.id],
+    )
+    release = await create_release(doc)
+    release.pipeline_stage = ReleasePipelineStage.COMPLETED.value
+    release.description = 'Primeira versão'
+    await session.commit()
+
+    response = client.get(f'/doc/{doc.id}/release/{release.id}')
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['description'] == 'Primeira versão'
+    assert response.json()['check_tree'] == []
+
+    # A segunda leitura vem do cache, sem voltar ao banco
+    release.description = 'Alterada direto no banco'
+    await session.commit()
+    response = client.get(f'/doc/{doc.id}/release/{release.id}')
+    assert response.json()['description'] == 'Primeira versão'
+
+    client.delete(f'/doc/{doc.id}/release/{release.id}')
+    response = client.get(f'/doc/{doc.id}/release/{release.id}')
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_read_release_caches_anonymized_tree(
+    logged_client,
+    session,
+    cache,
+    create_doc,
+    create_release,
+    create_typification,
+):
+    client, *_ = await logged_client()
+    typification = await create_typification()
+    doc = await create_doc(
+        name='Doc em cache anonimizado',
+        identifier='REL-CACHE-ANON',
+        typification_ids=[typification.id],
+    )
+    release = await create_release(doc)
+    release.pipeline_stage = ReleasePipelineStage.COMPLETED.value
+    app_typ = AppliedTypification(name='Typ', applied_release_id=release.id)
+    session.add(app_typ)
+    await session.flush()
+    app_tax = AppliedTaxonomy(
+        title='Tax', description='Desc', applied_typification_id=app_typ.id
+    )
+    session.add(app_tax)
+    await session.flush()
+    session.add(
+        AppliedBranch(
+            title='Ramo',
+            description='Desc',
+            applied_taxonomy_id=app_tax.id,
+            feedback='CPF <CPF_0> citado.',
+            fulfilled=True,
+            score=10,
+            presidio_mapping=json.dumps({
+                'CPF': {'123.456.789-09': '<CPF_0>'}
+            }),
+        )
+    )
+    await session.commit()
+
+    def feedback(response):
+        [typ] = response.json()['check_tree']
+        return typ['taxonomies'][0]['branches'][0]['evaluation']['feedback']
+
+    key = f'release_tree:{doc.id}:{release.id}'
+    expected = 'CPF 123.456.789-09 citado.'
+    assert feedback(client.get(f'/doc/{doc.id}/release/{release.id}')) == (
+        expected
+    )
+
+    # O Redis só guarda placeholders; a resposta do cache é restaurada
+    cached = await cache.get(key)
+    assert b'<CPF_0>' in cached
+    assert b'123.456.789-09' not in cached
+    assert feedback(client.get(f'/doc/{doc.id}/release/{release.id}')) == (
+        expected
+    )
+
+    client.delete(f'/doc/{doc.id}')
+    assert await cache.get(key) is None
+
+
+@pytest.mark.asyncio
+async def test_read_release_from_wrong_doc(
+    logged_client, create_doc, create_release, create_typification
+):
+    client, *_ = await logged_client()
+    typification = await create_typification()
+    doc = await create_doc(
+        name='Doc certo',
+        identifier='REL-OWNER',
+        typification_ids=[typification.id],
+    )
+    other = await create_doc(
+        name='Doc errado',
+        identifier='REL-OTHER',
+        typification_ids=[typification.id],
+    )
+    release = await create_release(doc)
+
+    response = client.get(f'/doc/{other.id}/release/{release.id}')
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_create_release_loads_only_needed_relationships(
+    logged_client,
+    session,
+    count_queries,
+    create_doc,
+    create_typification,
+    create_message,
+):
+    client, *_, user = await logged_client()
+    typification = await create_typification()
+    doc = await create_doc(
+        name='Doc consultas',
+        identifier='REL-QUERY',
+        typification_ids=[typification.id],
+    )
+    await create_message(doc, author_id=user.id)
+    file = {'file': ('test_release.txt', io.BytesIO(b'Arquivo de teste.'))}
+
+    session.expire_all()
+    with count_queries() as queries:
+        response = client.post(f'/doc/{doc.id}/release', files=file)
+
+    assert response.status_code == HTTPStatus.CREATED
+    for table in (
+        DocumentMessage.__tablename__,
+        Unit.__tablename__,
+        Bundle.__tablename__,
+    ):
+        assert not any(f'FROM {table}' in query for query in queries)
@@ -0,0 +1,344 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.runnables import RunnableLambda
+
+from iaEditais.services import release_logic_service
+
+SEARCH_LATENCY = 0.01
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    async def aembed_query(self, text: str) -> list[float]:
+        self.calls += 1
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        return self.embed_documents(texts)
+
+
+class FakeVectorStore:
+    def __init__(self, latency: float = SEARCH_LATENCY):
+        self.embeddings = CountingEmbedding(size=16)
+        self.latency = latency
+        self.searches = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @staticmethod
+    def _docs_for(embedding: list[float], k: int) -> list[Document]:
+        seed = int(abs(sum(embedding)) * 1000)
+        return [
+            Document(
+                page_content=f'chunk {seed + i}',
+                metadata={'chunk_index': (seed + i) % 100},
+            )
+            for i in range(k)
+        ]
+
+    async def asimilarity_search(self, query, k=4, filter=None):
+        embedding = await self.embeddings.aembed_query(query)
+        return await self.asimilarity_search_by_vector(embedding, k, filter)
+
+    async def asimilarity_search_by_vector(self, embedding, k=4, filter=None):
+        self.searches += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+        return self._docs_for(embedding, k)
+
+
+def _eval_args(n_branches: int) -> dict:
+    return {
+        'typifications': [
+            {
+                'taxonomies': [
+                    {
+                        'title': f'Taxonomia {t}',
+                        'branches': [
+                            {'title': f'Ramo {t}.{b}', 'description': 'D'}
+                            for b in range(n_branches // 4)
+                        ],
+                    }
+                    for t in range(4)
+                ]
+            }
+        ]
+    }
+
+
+def _sessions(eval_args: dict) -> list[list[str]]:
+    return [
+        [doc.page_content for doc in branch['sessions']]
+        for branch, _ in release_logic_service.iter_branch_queries(eval_args)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batched_branch_sessions_match_sequential():
+    vstore = FakeVectorStore(latency=0)
+    sequential, batched = _eval_args(40), _eval_args(40)
+
+    await release_logic_service.get_branch_sessions(
+        vstore, sequential, {}, batched=False
+    )
+    await release_logic_service.get_branch_sessions(
+        vstore, batched, {}, batched=True
+    )
+
+    assert _sessions(batched) == _sessions(sequential)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('n_branches', [40, 200])
+async def test_batched_branch_sessions_round_trips(n_branches):
+    sequential, batched = FakeVectorStore(), FakeVectorStore()
+    await release_logic_service.get_branch_sessions(
+        sequential, _eval_args(n_branches), {}, batched=False
+    )
+    await release_logic_service.get_branch_sessions(
+        batched, _eval_args(n_branches), {}, batched=True
+    )
+
+    assert sequential.embeddings.calls == n_branches
+    assert sequential.max_in_flight == 1
+    # Um único embed para a árvore inteira e buscas concorrentes limitadas
+    assert batched.embeddings.calls == 1
+    assert batched.searches == n_branches
+    assert batched.max_in_flight == (
+        release_logic_service.MAX_CONCURRENT_SEARCHES
+    )
+
+
+@pytest.mark.asyncio
+async def test_expand_branch_sessions_single_lookup(monkeypatch):
+    source = 'iaEditais/storage/uploads/edital.pdf'
+    calls = []
+
+    async def fake_get_chunks_by_keys(vstore, keys):
+        calls.append(keys)
+        return {
+            key: Document(
+                page_content=f'chunk {key[1]}',
+                metadata={'source': key[0], 'chunk_index': key[1]},
+            )
+            for key in keys
+        }
+
+    monkeypatch.setattr(
+        release_logic_service.chunk_repo,
+        'get_chunks_by_keys',
+        fake_get_chunks_by_keys,
+    )
+
+    def hit(index):
+        return Document(
+            page_content='', metadata={'source': source, 'chunk_index': index}
+        )
+
+    branch_a = {'sessions': [hit(5)]}
+    branch_b = {'sessions': [hit(6)]}
+    eval_args = {
+        'typifications': [{'taxonomies': [{'branches': [branch_a, branch_b]}]}]
+    }
+
+    await release_logic_service.expand_branch_sessions(None, eval_args)
+
+    assert len(calls) == 1
+    assert calls[0] == {(source, i) for i in range(3, 9)}
+    assert [d.metadata['chunk_index'] for d in branch_a['sessions']] == [
+        3,
+        4,
+        5,
+        6,
+        7,
+    ]
+    # Janelas 3..7 e 4..8: os chunks 4..7 são os mesmos objetos
+    for doc_a, doc_b in zip(branch_a['sessions'][1:], branch_b['sessions']):
+        assert doc_a is doc_b
+
+
+FEEDBACK = {'feedback': 'ok', 'fulfilled': True, 'score': 5}
+
+
+def _flaky_chain(failures: dict[str, int], calls: dict[str, int]):
+    # Cada ramo falha `failures[id]` vezes antes de responder
+    def evaluate(item: dict) -> dict:
+        calls[item['id']] = calls.get(item['id'], 0) + 1
+        if calls[item['id']] <= failures.get(item['id'], 0):
+            raise ValueError('JSON inválido')
+        return FEEDBACK
+
+    return RunnableLambda(evaluate)
+
+
+def _branches(*ids: str) -> list[dict]:
+    return [
+        {
+            'id': i,
+            'document': 'Trecho',
+            'source': '',
+            'requirement': f'Critério {i}',
+            'expected_session': '',
+            'query': f'Critério {i}',
+        }
+        for i in ids
+    ]
+
+
+@pytest.mark.asyncio
+async def test_apply_tree_retries_only_failed_branches():
+    calls = {}
+    chain = _flaky_chain({'b': 1}, calls)
+    eval_args = _branches('a', 'b', 'c')
+
+    attempts = await release_logic_service.apply_tree(
+        chain, eval_args, retry_delay=0, failure_budget=1
+    )
+
+    assert calls == {'a': 1, 'b': 2, 'c': 1}
+    assert [item['attempts'] for item in eval_args] == [1, 2, 1]
+    assert all(item['score'] == FEEDBACK['score'] for item in eval_args)
+    assert not any('error' in item for item in eval_args)
+    assert [
+        (record['attempt'], record['evaluated'], record['failed'])
+        for record in attempts
+    ] == [(1, ['a', 'b', 'c'], ['b']), (2, ['b'], [])]
+
+
+@pytest.mark.asyncio
+async def test_apply_tree_stops_when_failure_budget_is_spent():
+    calls = {}
+    chain = _flaky_chain({'a': 10, 'b': 10}, calls)
+    eval_args = _branches('a', 'b', 'c', 'd')
+
+    attempts = await release_logic_service.apply_tree(
+        chain, eval_args, max_attempts=5, retry_delay=0, failure_budget=0.5
+    )
+
+    # Orçamento de 2 falhas: a segunda rodada já o estoura
+    assert [record['failed'] for record in attempts] == [['a', 'b']] * 2
+    assert calls == {'a': 2, 'b': 2, 'c': 1, 'd': 1}
+    score = FEEDBACK['score']
+    assert [item.get('score') for item in eval_args] == [None, None] + [
+        score
+    ] * 2
+    assert 'JSON inválido' in eval_args[0]['error']
+
+
+@pytest.mark.asyncio
+async def test_apply_tree_treats_malformed_feedback_as_failure():
+    responses = iter([{'feedback': 'sem nota'}, FEEDBACK])
+    chain = RunnableLambda(lambda item: next(responses))
+    [item] = _branches('a')
+
+    attempts = await release_logic_service.apply_tree(
+        chain, [item], retry_delay=0
+    )
+
+    assert [record['failed'] for record in attempts] == [['a'], []]
+    assert item['score'] == FEEDBACK['score']
+    assert item['attempts'] == len(attempts)
+
+
+SOURCE = 'iaEditais/storage/uploads/edital.pdf'
+CONTEXT_BUDGET = 60
+
+
+def _chunk(index: int, text: str, section: str = 'Habilitação') -> Document:
+    return Document(
+        page_content=f'SECTION: {section}\n\n{text}',
+        metadata={
+            'source': SOURCE,
+            'chunk_index': index,
+            'section_title': section,
+        },
+    )
+
+
+def test_pack_context_merges_overlapping_neighbours():
+    chunks = [
+        _chunk(1, 'a empresa deve apresentar certidão negativa de débitos'),
+        _chunk(2, 'certidão negativa de débitos emitida há menos de 30 dias'),
+        _chunk(1, 'a empresa deve apresentar certidão negativa de débitos'),
+    ]
+
+    context = release_logic_service.pack_context(chunks)
+
+    assert context == (
+        '## CONTEXTO DA SESSÃO: Habilitação\n'
+        'a empresa deve apresentar certidão negativa de débitos '
+        'emitida há menos de 30 dias'
+    )
+
+
+def test_pack_context_separates_sections_and_gaps():
+    chunks = [
+        _chunk(1, 'primeiro trecho'),
+        _chunk(4, 'trecho distante'),
+        _chunk(5, 'outra seção', section='Prazos'),
+    ]
+
+    context = release_logic_service.pack_context(chunks)
+
+    assert 'SECTION:' not in context
+    assert context.count('## CONTEXTO DA SESSÃO: Habilitação') == 1
+    assert 'primeiro trecho\n\n[...]\n\ntrecho distante' in context
+    assert '---\n\n## CONTEXTO DA SESSÃO: Prazos\noutra seção' in context
+
+
+def test_pack_context_drops_farthest_neighbours_first():
+    chunks = [_chunk(i, f'trecho {i} ' * 10) for i in range(10)]
+    hit_keys = {(SOURCE, 5)}
+
+    context = release_logic_service.pack_context(
+        chunks, hit_keys, max_tokens=CONTEXT_BUDGET
+    )
+
+    assert release_logic_service.count_tokens(context) <= CONTEXT_BUDGET
+    assert 'trecho 5' in context
+    assert 'trecho 0' not in context
+    assert 'trecho 9' not in context
+
+
+@pytest.mark.asyncio
+async def test_apply_tree_reports_prompt_tokens():
+    calls = {}
+    items = _branches('a', 'b')
+
+    attempts = await release_logic_service.apply_tree(
+        _flaky_chain({}, calls), items, max_attempts=1, retry_delay=0
+    )
+
+    assert all(item['prompt_tokens'] > 0 for item in items)
+    assert attempts[0]['prompt_tokens'] == sum(
+        item['prompt_tokens'] for item in items
+    )
+
+
+@pytest.mark.asyncio
+async def test_apply_tree_streams_each_evaluated_branch():
+    calls, streamed = {}, []
+    eval_args = _branches('a', 'b', 'c')
+
+    async def on_result(item: dict):
+        streamed.append((item['id'], item['attempts'], item['score']))
+
+    await release_logic_service.apply_tree(
+        _flaky_chain({'b': 1}, calls),
+        eval_args,
+        retry_delay=0,
+        failure_budget=1,
+        on_result=on_result,
+    )
+
+    score = FEEDBACK['score']
+    # Falhas não geram evento; o ramo repetido aparece ao ser avaliado
+    assert sorted(streamed[:2]) == [('a', 1, score), ('c', 1, score)]
+    assert streamed[2:] == [('b', 2, score)]
@@ -0,0 +1,295 @@
+import json
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+from redis.exceptions import RedisError
+
+from iaEditais.core.cache import topic_channel
+from iaEditais.models import AppliedBranch, DocumentRelease
+from iaEditais.repositories import release_repo
+from iaEditais.schemas import ReleasePipelineStage
+from iaEditais.services import (
+    release_logic_service,
+    release_orchestrator,
+    vector_service,
+)
+
+SCORE = 7
+TAXONOMIES = 3
+BRANCHES_PER_TAXONOMY = 4
+
+
+async def _fail(*args, **kwargs):
+    raise AssertionError('etapa já concluída não deveria rodar de novo')
+
+
+@pytest.mark.asyncio
+async def test_pipeline_resumes_from_last_stage(
+    session,
+    cache,
+    monkeypatch,
+    create_doc,
+    create_release,
+    create_typification,
+    create_taxonomy,
+    create_branch,
+):
+    typification = await create_typification()
+    taxonomy = await create_taxonomy(typification_id=typification.id)
+    branch = await create_branch(taxonomy_id=taxonomy.id)
+    doc = await create_doc(
+        name='Doc retomado',
+        identifier='REL-CKPT',
+        typification_ids=[typification.id],
+    )
+    release = await create_release(doc)
+
+    # Falhou depois da avaliação: respostas do modelo já estão no estado
+    evaluated = {
+        'id': branch.id,
+        'query': 'Critério',
+        'document': 'Trecho',
+        'feedback': 'Atende',
+        'fulfilled': True,
+        'score': SCORE,
+    }
+    release.pipeline_stage = ReleasePipelineStage.EVALUATED.value
+    release.pipeline_state = release_orchestrator._dump_state([evaluated], [])
+    await session.commit()
+
+    monkeypatch.setattr(vector_service, 'create_vectors', _fail)
+    monkeypatch.setattr(release_logic_service, 'get_eval_args', _fail)
+    monkeypatch.setattr(release_logic_service, 'apply_tree', _fail)
+    model = FakeListChatModel(responses=['Resumo da release'])
+
+    await release_orchestrator.process_release_pipeline(
+        session, release.id, model, None, cache
+    )
+
+    db_release = await session.get(DocumentRelease, release.id)
+    assert db_release.pipeline_stage == ReleasePipelineStage.COMPLETED
+    assert db_release.pipeline_state == {'eval_attempts': []}
+    assert db_release.description == 'Resumo da release'
+    [app_typ] = db_release.check_tree
+    [app_branch] = app_typ.taxonomies[0].branches
+    assert isinstance(app_branch, AppliedBranch)
+    assert app_branch.original_id == branch.id
+    assert app_branch.score == SCORE
+
+    # Uma nova execução não repete nada nem duplica resultados
+    await release_orchestrator.process_release_pipeline(
+        session, release.id, model, None, cache
+    )
+    db_release = await release_repo.get_release_with_details(
+        session, release.id
+    )
+    assert len(db_release.check_tree[0].taxonomies[0].branches) == 1
+
+
+@pytest.mark.asyncio
+async def test_save_eval_results_round_trips_do_not_grow_with_tree(
+    session,
+    count_queries,
+    create_doc,
+    create_release,
+    create_source,
+    create_typification,
+    create_taxonomy,
+    create_branch,
+):
+    sources = await create_source(), await create_source()
+    typification = await create_typification(
+        source_ids=[s.id for s in sources]
+    )
+    branches = []
+    for _ in range(TAXONOMIES):
+        taxonomy = await create_taxonomy(typification_id=typification.id)
+        for _ in range(BRANCHES_PER_TAXONOMY):
+            branches.append(await create_branch(taxonomy_id=taxonomy.id))
+    doc = await create_doc(
+        name='Doc em lote',
+        identifier='REL-BULK',
+        typification_ids=[typification.id],
+    )
+    small, large = await create_release(doc), await create_release(doc)
+
+    def eval_args(tree):
+        return [{'id': b.id, 'feedback': 'ok', 'score': SCORE} for b in tree]
+
+    with count_queries() as small_queries:
+        await release_orchestrator._save_eval_results(
+            session, eval_args(branches[:1]), small.id
+        )
+    with count_queries() as large_queries:
+        await release_orchestrator._save_eval_results(
+            session, eval_args(branches), large.id
+        )
+    await session.commit()
+
+    assert len(large_queries) == len(small_queries)
+
+    db_release = await release_repo.get_release_with_details(session, large.id)
+    await session.refresh(db_release)
+    [app_typ] = db_release.check_tree
+    assert len(app_typ.sources) == len(sources)
+    assert len(app_typ.taxonomies) == TAXONOMIES
+    assert sorted(
+        branch.original_id
+        for taxonomy in app_typ.taxonomies
+        for branch in taxonomy.branches
+    ) == sorted(b.id for b in branches)
+
+
+async def _ws_messages(pubsub) -> list[dict]:
+    messages = []
+    while message := await pubsub.get_message(
+        ignore_subscribe_messages=True, timeout=1
+    ):
+        messages.append(json.loads(message['data']))
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_pipeline_streams_branch_evaluated_events(
+    session,
+    cache,
+    monkeypatch,
+    create_doc,
+    create_release,
+    create_typification,
+    create_taxonomy,
+    create_branch,
+):
+    typification = await create_typification()
+    taxonomy = await create_taxonomy(typification_id=typification.id)
+    branches = [
+        await create_branch(taxonomy_id=taxonomy.id)
+        for _ in range(BRANCHES_PER_TAXONOMY)
+    ]
+    doc = await create_doc(
+        name='Doc com progresso',
+        identifier='REL-PROGRESS',
+        typification_ids=[typification.id],
+    )
+    release = await create_release(doc)
+
+    eval_args = [
+        {
+            'id': branch.id,
+            'document': f'Trecho {branch.id}',
+            'source': '',
+            'requirement': branch.title,
+            'expected_session': taxonomy.title,
+            'query': branch.title,
+        }
+        for branch in branches
+    ]
+    release.pipeline_stage = ReleasePipelineStage.RETRIEVED.value
+    release.pipeline_state = release_orchestrator._dump_state(eval_args, [])
+    await session.commit()
+
+    feedback = {'feedback': 'Atende', 'fulfilled': True, 'score': SCORE}
+    monkeypatch.setattr(
+        release_logic_service,
+        'get_chain',
+        lambda model: RunnableLambda(lambda item: feedback),
+    )
+    model = FakeListChatModel(responses=['Resumo da release'])
+
+    pubsub = cache.pubsub()
+    await pubsub.subscribe(topic_channel('doc', doc.id))
+    await release_orchestrator.process_release_pipeline(
+        session, release.id, model, None, cache
+    )
+    messages = await _ws_messages(pubsub)
+    await pubsub.unsubscribe()
+
+    progress = [
+        m['payload']
+        for m in messages
+        if m['event'] == 'doc.release.branch_evaluated'
+    ]
+    assert sorted(p['branch_id'] for p in progress) == sorted(
+        str(branch.id) for branch in branches
+    )
+    assert [p['evaluated'] for p in progress] == list(
+        range(1, len(branches) + 1)
+    )
+    assert {p['total'] for p in progress} == {len(branches)}
+    assert {p['score'] for p in progress} == {SCORE}
+    assert {p['document_id'] for p in progress} == {str(doc.id)}
+    # Mensagens de estado são resumidas; a árvore fica no GET da release
+    status = messages[-1]
+    assert status['message'] == 'complete'
+    assert status['payload']['pipeline_stage'] == 'COMPLETED'
+    assert status['payload']['branches_total'] == len(branches)
+    assert status['payload']['branches_evaluated'] == len(branches)
+    assert all('check_tree' not in m['payload'] for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_survives_branch_event_failures(
+    session,
+    cache,
+    monkeypatch,
+    create_doc,
+    create_release,
+    create_typification,
+    create_taxonomy,
+    create_branch,
+):
+    typification = await create_typification()
+    taxonomy = await create_taxonomy(typification_id=typification.id)
+    branches = [
+        await create_branch(taxonomy_id=taxonomy.id)
+        for _ in range(BRANCHES_PER_TAXONOMY)
+    ]
+    doc = await create_doc(
+        name='Doc sem progresso',
+        identifier='REL-NO-PROGRESS',
+        typification_ids=[typification.id],
+    )
+    release = await create_release(doc)
+    eval_args = [
+        {
+            'id': branch.id,
+            'document': f'Trecho {branch.id}',
+            'source': '',
+            'requirement': branch.title,
+            'expected_session': taxonomy.title,
+            'query': branch.title,
+        }
+        for branch in branches
+    ]
+    release.pipeline_stage = ReleasePipelineStage.RETRIEVED.value
+    release.pipeline_state = release_orchestrator._dump_state(eval_args, [])
+    await session.commit()
+
+    feedback = {'feedback': 'Atende', 'fulfilled': True, 'score': SCORE}
+    monkeypatch.setattr(
+        release_logic_service,
+        'get_chain',
+        lambda model: RunnableLambda(lambda item: feedback),
+    )
+    publish_event = release_orchestrator.publish_event
+
+    async def flaky_publish(client, channel_id, message):
+        if message.event == 'doc.release.branch_evaluated':
+            raise RedisError('connection lost')
+        return await publish_event(client, channel_id, message)
+
+    monkeypatch.setattr(release_orchestrator, 'publish_event', flaky_publish)
+    model = FakeListChatModel(responses=['Resumo da release'])
+
+    await release_orchestrator.process_release_pipeline(
+        session, release.id, model, None, cache
+    )
+
+    db_release = await release_repo.get_release_with_details(
+        session, release.id
+    )
+    assert db_release.pipeline_stage == ReleasePipelineStage.COMPLETED
+    applied = db_release.check_tree[0].taxonomies[0].branches
+    assert {branch.score for branch in applied} == {SCORE}
+    assert len(applied) == len(branches)
@@ -0,0 +1,120 @@
+import hashlib
+from contextlib import asynccontextmanager
+
+import pytest
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_core.documents import Document
+from langchain_postgres import PGVector
+from sqlalchemy import text
+
+from iaEditais.repositories import chunk_repo
+from iaEditais.services import vector_service
+
+
+def _chunks(texts: list[str]) -> list[Document]:
+    docs = [
+        Document(page_content=text, metadata={'source': 'new.txt'})
+        for text in texts
+    ]
+    return vector_service._clean_and_format_documents(docs)
+
+
+def test_diff_chunks_reuses_unchanged_chunks():
+    previous = _chunks(['primeira parte', 'segunda parte'])
+    previous_rows = []
+    for index, chunk in enumerate(previous):
+        chunk.page_content = f'<ANON_{index}>'
+        chunk.metadata['presidio_mapping'] = {'CPF': {str(index): 'x'}}
+        previous_rows.append((chunk, [float(index)]))
+
+    current = _chunks(['primeira parte', 'parte alterada'])
+    reused, changed = vector_service._diff_chunks(current, previous_rows)
+
+    assert [chunk.page_content for chunk, _ in reused] == ['<ANON_0>']
+    assert [embedding for _, embedding in reused] == [[0.0]]
+    assert reused[0][0].metadata['source'] == 'new.txt'
+    assert [chunk.page_content for chunk in changed] == ['parte alterada']
+
+
+def test_content_hash_is_keyed(monkeypatch):
+    cpf = 'CPF 123.456.789-09'
+    digest = vector_service.content_hash(cpf)
+
+    assert digest != hashlib.sha256(cpf.encode('utf-8')).hexdigest()
+    monkeypatch.setattr(vector_service.SETTINGS, 'SECRET_KEY', 'outra')
+    assert vector_service.content_hash(cpf) != digest
+
+
+def test_diff_chunks_without_hashes_recomputes_everything():
+    legacy = Document(page_content='primeira parte', metadata={})
+    current = _chunks(['primeira parte'])
+
+    reused, changed = vector_service._diff_chunks(current, [(legacy, [0.0])])
+
+    assert reused == []
+    assert changed == current
+
+
+def test_merge_mappings_keeps_every_placeholder():
+    merged = vector_service._merge_mappings([
+        {'CPF': {'111': '<CPF_0>'}},
+        {'CPF': {'222': '<CPF_1>'}, 'DATE': {'01/01/2024': '<DATE_0>'}},
+        None,
+    ])
+
+    assert merged == {
+        'CPF': {'111': '<CPF_0>', '222': '<CPF_1>'},
+        'DATE': {'01/01/2024': '<DATE_0>'},
+    }
+
+
+@pytest.mark.asyncio
+async def test_create_vectors_reuses_chunks_of_same_content(
+    monkeypatch, tmp_path
+):
+    (tmp_path / 'abc.txt').write_text('conteúdo já vetorizado')
+    monkeypatch.setattr(
+        vector_service.SETTINGS, 'UPLOAD_DIRECTORY', str(tmp_path)
+    )
+    sources, locked = [], []
+
+    async def has_chunks(vstore, source):
+        sources.append(source)
+        return True
+
+    async def process_file(*args, **kwargs):
+        raise AssertionError('o arquivo não deveria ser reprocessado')
+
+    @asynccontextmanager
+    async def source_lock(vstore, source):
+        locked.append(source)
+        yield
+
+    monkeypatch.setattr(vector_service.chunk_repo, 'has_chunks', has_chunks)
+    monkeypatch.setattr(vector_service.chunk_repo, 'source_lock', source_lock)
+    monkeypatch.setattr(vector_service, 'process_file', process_file)
+
+    await vector_service.create_vectors('/uploads/abc.txt', vstore=None)
+
+    assert sources == [str(tmp_path / 'abc.txt')]
+    assert locked == sources
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_creates_chunk_window_index(session, engine):
+    vstore = PGVector(
+        embeddings=FakeEmbeddings(size=256),
+        connection=engine.url.render_as_string(hide_password=False),
+        use_jsonb=True,
+        async_mode=True,
+    )
+
+    # Idempotente: roda a cada inicialização do worker
+    await chunk_repo.ensure_indexes(vstore)
+    await chunk_repo.ensure_indexes(vstore)
+
+    index = await session.scalar(
+        text('SELECT to_regclass(:name)'),
+        {'name': 'ix_langchain_pg_embedding_source_chunk_index'},
+    )
+    assert index is not None
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import time
+from uuid import uuid4
+
+import ormsgpack
+import pytest
+
+from iaEditais.core import ws_replay
+from iaEditais.core.cache import (
+    SLOW_CONSUMER_CLOSE_CODE,
+    SocketConnection,
+    WebSocketManager,
+)
+from iaEditais.core.ws_events import MSGPACK, WSEvent
+from iaEditais.core.ws_replay import publish_event
+from iaEditais.schemas import WSMessage
+
+N_SOCKETS = 2000
+N_MESSAGES = 50
+MAX_QUEUE = 8
+SLOW_SEND = 5
+DELIVERY_TIMEOUT = 30
+BATCH_WINDOW = 0.05
+N_REPLAYED = 3
+# Acima de um nó do stream (stream-node-max-entries = 100), para que o
+# MAXLEN aproximado chegue a aparar o início
+N_TRIMMED = 250
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.received = []
+        self.close_code = None
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, data: str):
+        await asyncio.sleep(self.delay)
+        self.received.append(data)
+
+    async def send_bytes(self, data: bytes):
+        self.received.append(data)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+async def _wait_for(predicate, timeout: float = DELIVERY_TIMEOUT):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        assert time.perf_counter() < deadline, 'mensagens não entregues'
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_fan_out_to_thousands_of_sockets(cache):
+    manager = WebSocketManager(cache, max_queue=MAX_QUEUE)
+    channel_id = f'ws:test:{uuid4()}'
+    sockets = [FakeWebSocket() for _ in range(N_SOCKETS)]
+    slow = FakeWebSocket(delay=SLOW_SEND)
+    for websocket in [slow, *sockets]:
+        await manager.add_user_to_channel(channel_id, websocket)
+
+    for i in range(N_MESSAGES):
+        await manager.broadcast_to_channel(channel_id, f'mensagem {i}')
+    await _wait_for(
+        lambda: all(len(s.received) == N_MESSAGES for s in sockets)
+    )
+
+    # O cliente lento é desconectado sem atrasar os outros
+    assert slow.close_code == SLOW_CONSUMER_CLOSE_CODE
+    assert slow not in manager.channels[channel_id]
+    assert all(
+        s.received == [f'mensagem {i}' for i in range(N_MESSAGES)]
+        for s in sockets
+    )
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_single_reader_shared_between_channels(cache):
+    manager = WebSocketManager(cache)
+    channels = [f'ws:test:{uuid4()}' for _ in range(3)]
+    sockets = [FakeWebSocket() for _ in channels]
+
+    for channel_id, websocket in zip(channels, sockets):
+        await manager.add_user_to_channel(channel_id, websocket)
+    reader, pubsub = manager._reader, manager.pubsub_client.pubsub
+    for channel_id in channels:
+        await manager.broadcast_to_channel(channel_id, channel_id)
+    await _wait_for(lambda: all(s.received for s in sockets))
+
+    assert manager._reader is reader
+    assert manager.pubsub_client.pubsub is pubsub
+    assert [s.received for s in sockets] == [[c] for c in channels]
+
+    # Sair do último canal não encerra o socket; só o disconnect encerra
+    await manager.remove_user_from_channel(channels[0], sockets[0])
+    assert channels[0] not in manager.channels
+    assert sockets[0] in manager.connections
+    await manager.disconnect(sockets[0])
+    assert sockets[0] not in manager.connections
+    await manager.close()
+
+
+def _event(event: str, release_id: str, message: str) -> dict:
+    return {'event': event, 'message': message, 'payload': {'id': release_id}}
+
+
+BURST = [
+    _event('doc.release.update', 'A', 'creating_vectors'),
+    _event('doc.release.branch_evaluated', 'A', 'branch_evaluated'),
+    _event('doc.release.update', 'B', 'evaluating'),
+    _event('doc.release.update', 'A', 'evaluating'),
+    _event('doc.release.branch_evaluated', 'A', 'branch_evaluated'),
+    _event('doc.release.update', 'A', 'complete'),
+]
+
+# Só a última atualização de cada release sobrevive; o progresso não
+COALESCED = [BURST[1], BURST[2], BURST[4], BURST[5]]
+
+
+@pytest.mark.asyncio
+async def test_batch_window_coalesces_and_drops_superseded_events():
+    websocket = FakeWebSocket()
+    connection = SocketConnection(
+        websocket, MAX_QUEUE, batch_window=BATCH_WINDOW
+    )
+    for message in BURST:
+        connection.push(WSEvent(json.dumps(message)))
+
+    await _wait_for(lambda: websocket.received)
+    await connection.close()
+
+    assert len(websocket.received) == 1
+    assert json.loads(websocket.received[0]) == COALESCED
+
+
+@pytest.mark.asyncio
+async def test_msgpack_frames():
+    websocket = FakeWebSocket()
+    batched = SocketConnection(
+        websocket, MAX_QUEUE, batch_window=BATCH_WINDOW, encoding=MSGPACK
+    )
+    for message in BURST:
+        batched.push(WSEvent(json.dumps(message)))
+    await _wait_for(lambda: websocket.received)
+    await batched.close()
+
+    single = SocketConnection(websocket, MAX_QUEUE, encoding=MSGPACK)
+    single.push(WSEvent(json.dumps(BURST[0])))
+    await _wait_for(lambda: len(websocket.received) > 1)
+    await single.close()
+
+    frame, single_frame = websocket.received
+    assert ormsgpack.unpackb(frame) == COALESCED
+    assert ormsgpack.unpackb(single_frame) == BURST[0]
+
+
+def _ws_message(i: int) -> WSMessage:
+    return WSMessage(
+        event='doc.release.branch_evaluated', message=str(i), payload={}
+    )
+
+
+@pytest.mark.asyncio
+async def test_resume_channel_replays_missed_events(cache):
+    manager = WebSocketManager(cache)
+    channel_id = f'ws:doc:{uuid4()}'
+    ids = [
+        await publish_event(cache, channel_id, _ws_message(i))
+        for i in range(N_REPLAYED + 2)
+    ]
+    websocket = FakeWebSocket()
+
+    replayed, complete = await manager.resume_channel(
+        channel_id, websocket, ids[1]
+    )
+    await publish_event(cache, channel_id, _ws_message(len(ids)))
+    await _wait_for(lambda: len(websocket.received) == N_REPLAYED + 1)
+    await manager.close()
+
+    messages = [json.loads(data) for data in websocket.received]
+    assert (replayed, complete) == (N_REPLAYED, True)
+    assert [m['message'] for m in messages] == ['2', '3', '4', '5']
+    assert [m['id'] for m in messages[:3]] == ids[2:]
+    assert {m['topic'] for m in messages} == {channel_id.removeprefix('ws:')}
+
+
+@pytest.mark.asyncio
+async def test_resume_expired_channel_is_incomplete(cache):
+    manager = WebSocketManager(cache)
+    websocket = FakeWebSocket()
+
+    replayed, complete = await manager.resume_channel(
+        f'ws:doc:{uuid4()}', websocket, '1-0'
+    )
+    await manager.close()
+
+    assert (replayed, complete) == (0, False)
+
+
+@pytest.mark.asyncio
+async def test_resume_trimmed_channel_is_incomplete(cache, monkeypatch):
+    monkeypatch.setattr(ws_replay.SETTINGS, 'WS_REPLAY_MAXLEN', 1)
+    manager = WebSocketManager(cache)
+    channel_id = f'ws:doc:{uuid4()}'
+    first_id = await publish_event(cache, channel_id, _ws_message(0))
+    for i in range(1, N_TRIMMED):
+        await publish_event(cache, channel_id, _ws_message(i))
+    websocket = FakeWebSocket()
+
+    replayed, complete = await manager.resume_channel(
+        channel_id, websocket, first_id
+    )
+    await manager.close()
+
+    assert complete is False
+    assert 0 < replayed < N_TRIMMED - 1
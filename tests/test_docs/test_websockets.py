@@ -1,11 +1,20 @@
+import json
 from uuid import uuid4
 
 import pytest
 
+from iaEditais.core.cache import topic_channel
+from iaEditais.core.ws_replay import publish_event
+from iaEditais.schemas import WSMessage
+
+
+def _command(action: str, topic: str, **kwargs) -> str:
+    return json.dumps({'action': action, 'topic': topic, **kwargs})
+
 
 def test_websocket_connection_and_broadcast(client):
     subscriber_id = str(uuid4())
-    channel_id = 'ws:broadcast'
+    channel_id = f'ws:user:{subscriber_id}'
     message = f'User {subscriber_id} connected to channel - {channel_id}'
     with client.websocket_connect(f'/ws/{subscriber_id}') as websocket:
         data = websocket.receive_json()
@@ -14,45 +23,107 @@ def test_websocket_connection_and_broadcast(client):
 
 
 @pytest.mark.asyncio
-async def test_websocket_echo_broadcast(client):
-    subscriber_id = str(uuid4())
-    test_payload = 'Olá, esta é uma mensagem de teste'
+async def test_websocket_subscribe_to_document(client, cache):
+    doc_a, doc_b = uuid4(), uuid4()
+
+    with client.websocket_connect(f'/ws/{uuid4()}') as ws1:
+        ws1.receive_json()
+        with client.websocket_connect(f'/ws/{uuid4()}') as ws2:
+            ws2.receive_json()
+            ws1.send_text(_command('subscribe', f'doc:{doc_a}'))
+            ws2.send_text(_command('subscribe', f'doc:{doc_b}'))
+            assert ws1.receive_json()['event'] == 'ws.subscribed'
+            assert ws2.receive_json()['event'] == 'ws.subscribed'
+
+            await cache.publish(topic_channel('doc', doc_a), 'evento A')
+            await cache.publish(topic_channel('doc', doc_b), 'evento B')
+
+            # Cada socket recebe apenas o tópico que assinou
+            assert ws1.receive_text() == 'evento A'
+            assert ws2.receive_text() == 'evento B'
+
+
+@pytest.mark.asyncio
+async def test_websocket_unsubscribe(client, cache):
+    subscriber_id, doc_id = uuid4(), uuid4()
 
     with client.websocket_connect(f'/ws/{subscriber_id}') as websocket:
-        websocket.receive_text()
-        websocket.send_text(test_payload)
+        websocket.receive_json()
+        websocket.send_text(_command('subscribe', f'doc:{doc_id}'))
+        websocket.receive_json()
+        websocket.send_text(_command('unsubscribe', f'doc:{doc_id}'))
         response = websocket.receive_json()
-        assert response['event'] == 'user.connect'
-        assert response['message'] == test_payload
+        assert response['event'] == 'ws.unsubscribed'
+        assert response['payload'] == {'topic': f'doc:{doc_id}'}
+
+        await cache.publish(topic_channel('doc', doc_id), 'ignorado')
+        await cache.publish(topic_channel('user', subscriber_id), 'pessoal')
+
+        assert websocket.receive_text() == 'pessoal'
 
 
 @pytest.mark.asyncio
-async def test_websocket_multiple_users_broadcast(client):
-    user1_id = str(uuid4())
-    user2_id = str(uuid4())
+async def test_websocket_resubscribe_after_leaving_every_topic(client, cache):
+    subscriber_id, doc_id = uuid4(), uuid4()
+    own_topic = f'user:{subscriber_id}'
+
+    with client.websocket_connect(f'/ws/{subscriber_id}') as websocket:
+        websocket.receive_json()
+        websocket.send_text(_command('unsubscribe', own_topic))
+        assert websocket.receive_json()['event'] == 'ws.unsubscribed'
+
+        websocket.send_text(_command('subscribe', f'doc:{doc_id}'))
+        assert websocket.receive_json()['event'] == 'ws.subscribed'
 
-    with client.websocket_connect(f'/ws/{user1_id}') as ws1:
-        ws1.receive_text()
-        with client.websocket_connect(f'/ws/{user2_id}') as ws2:
-            ws2.receive_text()
-            msg_for_user1 = ws1.receive_json()
-            assert f'User {user2_id} connected' in msg_for_user1['message']
-            ws2.send_text('Mensagem do User 2')
-            msg_recebida_user1 = ws1.receive_json()
-            assert msg_recebida_user1['message'] == 'Mensagem do User 2'
+        await cache.publish(topic_channel('doc', doc_id), 'evento')
+        assert websocket.receive_text() == 'evento'
 
 
 @pytest.mark.asyncio
-async def test_websocket_disconnect_broadcast(client):
-    user_staying = str(uuid4())
-    user_leaving = str(uuid4())
+@pytest.mark.parametrize(
+    'payload',
+    [
+        'texto livre',
+        _command('subscribe', 'kanban:geral'),
+        _command('subscribe', 'doc:nao-e-uuid'),
+        _command('subscribe', f'user:{uuid4()}'),
+    ],
+)
+async def test_websocket_rejects_invalid_subscription(client, payload):
+    with client.websocket_connect(f'/ws/{uuid4()}') as websocket:
+        websocket.receive_json()
+        websocket.send_text(payload)
+        response = websocket.receive_json()
+        assert response['event'] == 'ws.error'
+
 
-    with client.websocket_connect(f'/ws/{user_staying}') as ws_monitor:
-        ws_monitor.receive_text()
+@pytest.mark.asyncio
+async def test_websocket_resume_from_last_event(client, cache):
+    doc_id = uuid4()
+    channel_id = topic_channel('doc', doc_id)
+    ids = [
+        await publish_event(
+            cache,
+            channel_id,
+            WSMessage(event='doc.release.update', message=m, payload={}),
+        )
+        for m in ('creating_vectors', 'evaluating', 'complete')
+    ]
 
-        with client.websocket_connect(f'/ws/{user_leaving}'):
-            ws_monitor.receive_text()
+    with client.websocket_connect(f'/ws/{uuid4()}') as websocket:
+        websocket.receive_json()
+        websocket.send_text(
+            _command('subscribe', f'doc:{doc_id}', last_event_id=ids[0])
+        )
 
-        msg_exit = ws_monitor.receive_json()
-        assert 'disconnected to channel' in msg_exit['message']
-        assert user_leaving in msg_exit['message']
+        missed = [websocket.receive_json() for _ in ids[1:]]
+        assert [m['id'] for m in missed] == ids[1:]
+        assert [m['message'] for m in missed] == ['evaluating', 'complete']
+
+        response = websocket.receive_json()
+        assert response['event'] == 'ws.subscribed'
+        assert response['payload'] == {
+            'topic': f'doc:{doc_id}',
+            'replayed': len(ids) - 1,
+            'complete': True,
+        }
@@ -0,0 +1,52 @@
+from http import HTTPStatus
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from iaEditais.core.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    async def aembed_documents(self, texts):
+        self.calls += len(texts)
+        return self.embed_documents(texts)
+
+
+@pytest.mark.asyncio
+async def test_embedding_cache_only_embeds_changed_chunks(cache):
+    underlying = CountingEmbeddings(size=8)
+    embeddings = CachedEmbeddings(
+        underlying=underlying, model_name='fake', client=cache
+    )
+
+    release_v1 = ['a', 'b', 'c']
+    release_v2 = ['a', 'b  ', 'd']
+
+    first = await embeddings.aembed_documents(release_v1)
+    second = await embeddings.aembed_documents(release_v2)
+
+    # Apenas o chunk 'd' é novo na segunda versão
+    assert underlying.calls == len(release_v1) + 1
+    assert second[:2] == first[:2]
+    assert embeddings.hits == len(release_v2) - 1
+    assert embeddings.misses == len(release_v1) + 1
+
+
+@pytest.mark.asyncio
+async def test_embedding_cache_key_depends_on_model(cache):
+    a = CachedEmbeddings(
+        DeterministicFakeEmbedding(size=8), model_name='m1', client=cache
+    )
+    b = CachedEmbeddings(
+        DeterministicFakeEmbedding(size=8), model_name='m2', client=cache
+    )
+    assert a.key_for('texto') != b.key_for('texto')
+    assert a.key_for(' texto\n') == a.key_for('texto')
+
+
+def test_embedding_cache_stats(client):
+    response = client.get('/stats/embedding-cache')
+    assert response.status_code == HTTPStatus.OK
+    assert set(response.json()) == {'hits', 'misses', 'hit_rate'}
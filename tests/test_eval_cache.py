@@ -0,0 +1,86 @@
+import pytest
+from langchain_core.language_models import FakeListChatModel
+
+from iaEditais.core.eval_cache import EvalCache, model_name
+from iaEditais.core.llm_limiter import (
+    AdaptiveLimiter,
+    RateLimitedChatModel,
+    TokenBucket,
+)
+from iaEditais.services import release_logic_service
+
+FEEDBACK = {'feedback': 'Atende', 'fulfilled': True, 'score': 8}
+
+
+def _branch(**kwargs) -> dict:
+    return {
+        'id': 'ramo',
+        'document': 'Trecho do edital com <CPF_0>',
+        'source': 'Lei 14.133',
+        'requirement': 'Prazo: prazo de impugnação',
+        'expected_session': 'Impugnação',
+        'query': "Analise o item 'Prazo' na seção 'Impugnação'.",
+        'presidio_mapping': {'CPF': {'123.456.789-09': '<CPF_0>'}},
+        **kwargs,
+    }
+
+
+def _cache(client=None, **kwargs) -> EvalCache:
+    return EvalCache(
+        client,
+        kwargs.get('model_name', 'gpt'),
+        kwargs.get('prompt_version', release_logic_service.PROMPT_VERSION),
+    )
+
+
+def test_eval_cache_key_depends_on_prompt_inputs():
+    cache = _cache()
+    key = cache.key_for(_branch())
+
+    # Identificador do ramo e mapeamento do Presidio não entram na chave
+    assert cache.key_for(_branch(id='outro', presidio_mapping={})) == key
+    assert cache.key_for(_branch(document='Outro trecho')) != key
+    assert cache.key_for(_branch(requirement='Outro requisito')) != key
+    assert _cache(model_name='outro').key_for(_branch()) != key
+    assert _cache(prompt_version='v2').key_for(_branch()) != key
+
+
+def test_eval_cache_model_name_unwraps_limiter():
+    underlying = FakeListChatModel(responses=[])
+    model = RateLimitedChatModel(
+        underlying=underlying,
+        limiter=AdaptiveLimiter(
+            TokenBucket(60), TokenBucket(60), max_concurrency=1
+        ),
+    )
+
+    assert model_name(model) == model_name(underlying)
+    assert model_name(underlying) == underlying._llm_type
+
+
+@pytest.mark.asyncio
+async def test_eval_cache_reuses_unchanged_branches(cache):
+    eval_cache = _cache(cache, prompt_version='test-reuse')
+    first = [_branch(id='a'), _branch(id='b', document='Outro trecho')]
+
+    assert await eval_cache.apply(first) == first
+    for item in first:
+        item.update(FEEDBACK)
+    await eval_cache.store(first)
+
+    resubmitted = [_branch(id='a'), _branch(id='c', document='Novo trecho')]
+    misses = await eval_cache.apply(resubmitted)
+
+    assert [item['id'] for item in misses] == ['c']
+    assert resubmitted[0]['cache_hit'] is True
+    assert {k: resubmitted[0][k] for k in FEEDBACK} == FEEDBACK
+
+
+@pytest.mark.asyncio
+async def test_eval_cache_skips_failed_branches(cache):
+    eval_cache = _cache(cache, prompt_version='test-failed')
+    failed = _branch(error='JSON inválido')
+
+    await eval_cache.store([failed])
+
+    assert await eval_cache.apply([_branch()]) == [_branch()]
@@ -0,0 +1,183 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from iaEditais.core.job_queue import MemoryJobQueue, RedisJobQueue
+from iaEditais.workers import runner
+from iaEditais.workers.runner import process_job, run_worker
+
+QUEUE_OPTIONS = {'visibility_timeout': 0.2, 'max_attempts': 3}
+FETCH_FAILURES = 2
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def make_queue(request):
+    cache = None
+    if request.param == 'redis':
+        cache = request.getfixturevalue('cache')
+
+    def _make_queue():
+        options = {**QUEUE_OPTIONS, 'retry_delay': 0}
+        if cache is None:
+            return MemoryJobQueue(**options)
+        return RedisJobQueue(cache, stream=f'jobs:test:{uuid4()}', **options)
+
+    return _make_queue
+
+
+async def _run_until(queue, handler, condition, concurrency=2):
+    stop = asyncio.Event()
+    worker = asyncio.create_task(
+        run_worker(queue, handler, concurrency, stop=stop, block=0.05)
+    )
+    async with asyncio.timeout(5):
+        while not condition():
+            await asyncio.sleep(0.01)
+    stop.set()
+    await worker
+
+
+@pytest.mark.asyncio
+async def test_worker_acks_processed_jobs(make_queue):
+    queue = make_queue()
+    done = []
+
+    async def handler(payload):
+        done.append(payload['release_id'])
+
+    expected = [str(index) for index in range(5)]
+    for release_id in expected:
+        await queue.enqueue({'release_id': release_id})
+
+    await _run_until(queue, handler, lambda: len(done) == len(expected))
+
+    assert sorted(done) == expected
+    assert await queue.fetch('w1', count=10, block=0.05) == []
+    assert await queue.dead_letters() == []
+
+
+@pytest.mark.asyncio
+async def test_worker_retries_then_dead_letters(make_queue):
+    queue = make_queue()
+    calls = []
+
+    async def handler(payload):
+        calls.append(payload)
+        raise RuntimeError('LLM timeout')
+
+    await queue.enqueue({'release_id': 'x'})
+
+    await _run_until(queue, handler, lambda: len(calls) == queue.max_attempts)
+    async with asyncio.timeout(5):
+        while not await queue.dead_letters():
+            await asyncio.sleep(0.01)
+
+    [dead] = await queue.dead_letters()
+    assert dead.payload == {'release_id': 'x'}
+    assert dead.attempts == queue.max_attempts
+    assert 'LLM timeout' in dead.last_error
+
+
+@pytest.mark.asyncio
+async def test_retry_succeeds_on_second_attempt(make_queue):
+    queue = make_queue()
+    attempts = []
+
+    async def handler(payload):
+        attempts.append(payload)
+        if len(attempts) == 1:
+            raise RuntimeError('falha transitória')
+
+    await queue.enqueue({'release_id': 'y'})
+    await _run_until(queue, handler, lambda: len(attempts) > 1)
+
+    assert await queue.dead_letters() == []
+    assert len(attempts) == len(['falha', 'sucesso'])
+
+
+@pytest.mark.asyncio
+async def test_unacked_job_is_redelivered_after_visibility_timeout(
+    make_queue,
+):
+    queue = make_queue()
+    await queue.enqueue({'release_id': 'z'})
+
+    # Worker que recebeu o job e morreu sem confirmar
+    [lost] = await queue.fetch('morto', count=1, block=0.05)
+    await asyncio.sleep(queue.visibility_timeout + 0.05)
+
+    redelivered = []
+    async with asyncio.timeout(5):
+        while not redelivered:
+            redelivered = await queue.fetch('w1', count=1, block=0.05)
+
+    [job] = redelivered
+    assert job.payload == lost.payload
+    assert job.attempts == lost.attempts + 1
+    assert job.last_error == 'visibility timeout'
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_keeps_long_job_visible(make_queue):
+    queue = make_queue()
+    await queue.enqueue({'release_id': 'longo'})
+    [job] = await queue.fetch('w1', count=1, block=0.05)
+
+    async def slow_handler(payload):
+        await asyncio.sleep(queue.visibility_timeout * 3)
+
+    await process_job(queue, slow_handler, job, 'w1')
+
+    assert await queue.fetch('w2', count=1, block=0.05) == []
+    assert await queue.dead_letters() == []
+
+
+@pytest.mark.asyncio
+async def test_worker_respects_concurrency():
+    queue = MemoryJobQueue(**QUEUE_OPTIONS)
+    concurrency = 3
+    jobs = list(range(10))
+    running, peak, done = set(), [0], []
+
+    async def handler(payload):
+        running.add(payload['n'])
+        peak[0] = max(peak[0], len(running))
+        await asyncio.sleep(0.02)
+        running.discard(payload['n'])
+        done.append(payload['n'])
+
+    for n in jobs:
+        await queue.enqueue({'n': n})
+
+    await _run_until(
+        queue, handler, lambda: len(done) == len(jobs), concurrency
+    )
+
+    assert peak[0] == concurrency
+
+
+@pytest.mark.asyncio
+async def test_worker_survives_fetch_errors(monkeypatch):
+    monkeypatch.setattr(runner, 'FETCH_RETRY_DELAY', 0)
+    queue = MemoryJobQueue(**QUEUE_OPTIONS)
+    fetch = queue.fetch
+    failures = []
+    done = []
+
+    async def flaky_fetch(*args, **kwargs):
+        if len(failures) < FETCH_FAILURES:
+            failures.append(True)
+            raise RedisConnectionError('failover')
+        return await fetch(*args, **kwargs)
+
+    async def handler(payload):
+        done.append(payload['release_id'])
+
+    monkeypatch.setattr(queue, 'fetch', flaky_fetch)
+    await queue.enqueue({'release_id': 'r1'})
+
+    await _run_until(queue, handler, lambda: done == ['r1'])
+
+    assert len(failures) == FETCH_FAILURES
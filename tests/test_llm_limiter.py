@@ -0,0 +1,221 @@
+import asyncio
+import time
+from http import HTTPStatus
+from uuid import uuid4
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from iaEditais.core.llm_limiter import (
+    AdaptiveLimiter,
+    RateLimitedChatModel,
+    RedisTokenBucket,
+    TokenBucket,
+)
+
+MAX_CONCURRENCY = 8
+PER_MINUTE = 600
+REFILL_WAIT = 0.2
+
+
+class TooManyRequests(Exception):
+    status_code = HTTPStatus.TOO_MANY_REQUESTS
+
+
+class BadGateway(Exception):
+    status_code = HTTPStatus.BAD_GATEWAY
+
+
+class ConnectionLost(Exception):
+    pass
+
+
+class FlakyChatModel(BaseChatModel):
+    rate_limited: int = 0
+    error: type[Exception] = TooManyRequests
+    latency: float = 0
+    calls: int = 0
+    running: int = 0
+    peak: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'flaky'
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kw):
+        self.calls += 1
+        if self.calls <= self.rate_limited:
+            raise self.error()
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(self.latency)
+        self.running -= 1
+        message = AIMessage(content='ok')
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _limiter(**kwargs) -> AdaptiveLimiter:
+    return AdaptiveLimiter(
+        TokenBucket(PER_MINUTE),
+        TokenBucket(PER_MINUTE * 100),
+        max_concurrency=MAX_CONCURRENCY,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_limiter_aimd():
+    limiter = _limiter()
+    initial = limiter.limit
+
+    started_at = await limiter.acquire(1)
+    await limiter.release(started_at)
+    assert limiter.limit >= initial + 1 / initial
+
+    # Uma rajada de 429 da mesma janela derruba o limite uma vez só
+    burst = [await limiter.acquire(1) for _ in range(3)]
+    for started_at in burst:
+        await limiter.release(started_at, rate_limited=True)
+    assert limiter.limit == (initial + 1 / initial) / 2
+
+    started_at = await limiter.acquire(1)
+    await limiter.release(started_at, rate_limited=True)
+    assert limiter.limit == (initial + 1 / initial) / 4
+
+
+@pytest.mark.asyncio
+async def test_limiter_slow_responses_reduce_concurrency():
+    limiter = _limiter(latency_target=0)
+    initial = limiter.limit
+
+    started_at = await limiter.acquire(1)
+    await asyncio.sleep(0.01)
+    await limiter.release(started_at)
+
+    assert limiter.limit >= initial / 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_caps_concurrency_and_reports_queue():
+    limiter = _limiter()
+    underlying = FlakyChatModel(latency=0.05)
+    model = RateLimitedChatModel(underlying=underlying, limiter=limiter)
+    calls = int(limiter.limit) * 3
+
+    tasks = [asyncio.create_task(model.ainvoke('oi')) for _ in range(calls)]
+    await asyncio.sleep(0.01)
+    stats = limiter.stats()
+    await asyncio.gather(*tasks)
+
+    assert stats['in_flight'] == stats['concurrency_limit']
+    assert stats['queued'] == calls - stats['in_flight']
+    assert underlying.peak <= int(limiter.limit)
+    assert limiter.stats()['in_flight'] == limiter.stats()['queued'] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_model_retries_after_429():
+    limiter = _limiter()
+    initial = limiter.limit
+    underlying = FlakyChatModel(rate_limited=1)
+    model = RateLimitedChatModel(
+        underlying=underlying, limiter=limiter, retry_delay=0
+    )
+
+    response = await model.ainvoke('oi')
+
+    assert response.content == 'ok'
+    assert underlying.calls == 1 + underlying.rate_limited
+    assert limiter.limit < initial
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_model_gives_up_after_max_retries():
+    underlying = FlakyChatModel(rate_limited=10)
+    model = RateLimitedChatModel(
+        underlying=underlying, limiter=_limiter(), retry_delay=0
+    )
+
+    with pytest.raises(TooManyRequests):
+        await model.ainvoke('oi')
+    assert underlying.calls == model.max_retries + 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('error', [BadGateway, ConnectionLost])
+async def test_rate_limited_model_retries_transient_errors(error):
+    limiter = _limiter()
+    initial = limiter.limit
+    underlying = FlakyChatModel(rate_limited=2, error=error)
+    model = RateLimitedChatModel(
+        underlying=underlying,
+        limiter=limiter,
+        retry_delay=0,
+        retry_on=(ConnectionLost,),
+    )
+
+    response = await model.ainvoke('oi')
+
+    assert response.content == 'ok'
+    assert underlying.calls == 1 + underlying.rate_limited
+    # Falhas transitórias não são sinal de sobrecarga
+    assert limiter.limit >= initial
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_model_does_not_retry_other_errors():
+    underlying = FlakyChatModel(rate_limited=1, error=ConnectionLost)
+    model = RateLimitedChatModel(
+        underlying=underlying, limiter=_limiter(), retry_delay=0
+    )
+
+    with pytest.raises(ConnectionLost):
+        await model.ainvoke('oi')
+    assert underlying.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(PER_MINUTE)
+    await bucket.acquire(PER_MINUTE)
+
+    amount = PER_MINUTE / 60 * REFILL_WAIT
+    start = time.perf_counter()
+    await bucket.acquire(amount)
+
+    assert time.perf_counter() - start >= REFILL_WAIT / 2
+
+
+@pytest.mark.asyncio
+async def test_redis_token_bucket_is_shared(cache):
+    name = f'test-{uuid4()}'
+    worker_a = RedisTokenBucket(cache, name, PER_MINUTE)
+    worker_b = RedisTokenBucket(cache, name, PER_MINUTE)
+    await worker_a.acquire(PER_MINUTE)
+
+    amount = PER_MINUTE / 60 * REFILL_WAIT
+    start = time.perf_counter()
+    await worker_b.acquire(amount)
+
+    assert time.perf_counter() - start >= REFILL_WAIT / 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_stats_endpoint(client, cache):
+    limiter = _limiter(client=cache)
+    await limiter.acquire(1)
+
+    response = client.get('/stats/llm-limiter')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'in_flight': 1,
+        'queued': 0,
+        'concurrency_limit': int(limiter.limit),
+        'processes': 1,
+    }
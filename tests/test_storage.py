@@ -0,0 +1,86 @@
+import hashlib
+import io
+import tracemalloc
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from iaEditais.core.storage_provider import LocalStorage
+
+BUFFER_SIZE = 64 * 1024
+
+
+class CountingReader(io.BytesIO):
+    reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+@pytest.mark.asyncio
+async def test_local_storage_streams_and_hashes(tmp_path):
+    content = b'edital ' * 3_000_000
+    storage = LocalStorage(storage_dir=tmp_path, buffer_size=BUFFER_SIZE)
+    upload = UploadFile(file=io.BytesIO(content), filename='edital.pdf')
+
+    tracemalloc.start()
+    stored = await storage.store(upload, 'edital.pdf')
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert stored.url == '/uploads/edital.pdf'
+    assert stored.size == len(content)
+    assert stored.sha256 == hashlib.sha256(content).hexdigest()
+    assert (tmp_path / 'edital.pdf').read_bytes() == content
+    # Memória proporcional ao buffer, não ao arquivo
+    assert peak < len(content) // 4
+
+
+@pytest.mark.asyncio
+async def test_local_storage_aborts_when_file_is_too_large(tmp_path):
+    max_size = 4 * BUFFER_SIZE
+    storage = LocalStorage(
+        storage_dir=tmp_path, buffer_size=BUFFER_SIZE, max_size=max_size
+    )
+    reader = CountingReader(b'x' * (100 * BUFFER_SIZE))
+    upload = UploadFile(file=reader, filename='grande.pdf')
+
+    with pytest.raises(HTTPException) as exc:
+        await storage.store(upload, 'grande.pdf')
+
+    assert exc.value.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert reader.reads == max_size // BUFFER_SIZE + 1
+    assert not (tmp_path / 'grande.pdf').exists()
+
+
+@pytest.mark.asyncio
+async def test_local_storage_rejects_known_size_before_writing(tmp_path):
+    storage = LocalStorage(storage_dir=tmp_path, max_size=10)
+    reader = CountingReader(b'x' * 20)
+    upload = UploadFile(file=reader, filename='a.txt', size=20)
+
+    with pytest.raises(HTTPException):
+        await storage.store(upload, 'a.txt')
+
+    assert reader.reads == 0
+    assert not (tmp_path / 'a.txt').exists()
+
+
+@pytest.mark.asyncio
+async def test_store_by_content_writes_each_file_once(tmp_path):
+    storage = LocalStorage(storage_dir=tmp_path)
+    content = b'mesmo edital'
+
+    first = await storage.store_by_content(
+        UploadFile(file=io.BytesIO(content), filename='a.PDF'), '.PDF'
+    )
+    second = await storage.store_by_content(
+        UploadFile(file=io.BytesIO(content), filename='b.pdf'), '.pdf'
+    )
+
+    digest = hashlib.sha256(content).hexdigest()
+    assert first == second
+    assert first.url == f'/uploads/{digest}.pdf'
+    assert [p.name for p in tmp_path.iterdir()] == [f'{digest}.pdf']